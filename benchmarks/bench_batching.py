@@ -0,0 +1,137 @@
+"""
+Batching of the alignment and coreference inputs on the maia en-de data, comparing
+batches of consecutive sentences (the previous behaviour, in file order) with
+batches of sentences of similar length, with and without a token budget
+(`--batch-tokens`).
+
+By default, only the padding overhead of the alignment batches is reported, with
+lengths approximated by whitespace tokens, so no model is needed. With
+`--time-models`, the aligner (`Aligner.align`) and the coreference model
+(`CorefResolver.antecedents`) are also timed with each batching, after being
+loaded and warmed up on the first batch.
+
+Usage (from the repository root):
+    python benchmarks/bench_batching.py --batch-size 32 --batch-tokens 2048 4096
+    python benchmarks/bench_batching.py --time-models --batch-tokens 2048
+"""
+
+import argparse
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from run_benchmarks import DATA_DIR, Corpus, read_corpus
+
+from muda.batching import length_batches, padded_tokens
+
+MAIA_DIR = os.path.join(DATA_DIR, "maia", "en-de")
+
+
+def read_split(split: str) -> Corpus:
+    return read_corpus(
+        *(os.path.join(MAIA_DIR, f"{split}.{ext}") for ext in ("en", "de", "docids"))
+    )
+
+
+def pair_lengths(split: str) -> List[int]:
+    srcs, tgts, _ = read_split(split)
+    return [len(src.split()) + len(tgt.split()) for src, tgt in zip(srcs, tgts)]
+
+
+def padding(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    """Padding overhead of the alignment batches of every batching."""
+    results: Dict[str, Dict[str, float]] = {}
+    for split in ("agent", "client"):
+        lengths = pair_lengths(split)
+        real = sum(lengths)
+        for budget in [None, *args.batch_tokens]:
+            for by_length in (False, True):
+                batches = length_batches(lengths, args.batch_size, budget, by_length)
+                results[f"{split}/{batching_name(by_length, budget)}"] = {
+                    "batches": len(batches),
+                    "padded_tokens": padded_tokens(lengths, batches),
+                    "padding_overhead": padded_tokens(lengths, batches) / real - 1,
+                }
+    return results
+
+
+def batching_name(by_length: bool, budget: Optional[int]) -> str:
+    name = "by_length" if by_length else "in_order"
+    return f"{name}_{budget}_tokens" if budget is not None else name
+
+
+def time_models(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    """Throughput of the aligner and of the coreference model with every batching,
+    on both splits."""
+    import spacy
+
+    from muda.aligner import Aligner
+    from muda.coref import CorefResolver
+
+    srcs: List[str] = []
+    tgts: List[str] = []
+    docids: List[int] = []
+    for split in ("agent", "client"):
+        split_srcs, split_tgts, split_docids = read_split(split)
+        offset = max(docids) + 1 if docids else 0
+        srcs.extend(split_srcs)
+        tgts.extend(split_tgts)
+        docids.extend(docid + offset for docid in split_docids)
+    pairs = [
+        (" ".join(src.split()), " ".join(tgt.split())) for src, tgt in zip(srcs, tgts)
+    ]
+    src_docs = list(spacy.blank("en").pipe(srcs))
+    # sentences sent to the coreference model (all but the first of each document)
+    coref_sents = sum(1 for i in range(1, len(docids)) if docids[i] == docids[i - 1])
+
+    aligner = Aligner(batch_size=args.batch_size)
+    coref = CorefResolver(batch_size=args.coref_batch_size)
+    aligner.align(pairs[: args.batch_size])
+    coref.antecedents(src_docs[: args.coref_batch_size], [0] * args.coref_batch_size)
+
+    results: Dict[str, Dict[str, float]] = {}
+    for budget in [None, *args.batch_tokens]:
+        for by_length in (False, True):
+            name = batching_name(by_length, budget)
+            aligner.max_tokens = coref.max_tokens = budget
+            aligner.batch_by_length = coref.batch_by_length = by_length
+
+            start = time.perf_counter()
+            aligner.align(pairs)
+            elapsed = time.perf_counter() - start
+            results[f"align/{name}"] = {
+                "seconds": elapsed,
+                "pairs_per_s": len(pairs) / elapsed,
+            }
+
+            start = time.perf_counter()
+            coref.antecedents(src_docs, docids)
+            elapsed = time.perf_counter() - start
+            results[f"coref/{name}"] = {
+                "seconds": elapsed,
+                "sentences_per_s": coref_sents / elapsed,
+            }
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--coref-batch-size", type=int, default=8)
+    parser.add_argument("--batch-tokens", type=int, nargs="*", default=[2048])
+    parser.add_argument(
+        "--time-models",
+        action="store_true",
+        help="Also time the aligner and the coreference model with each batching",
+    )
+    args = parser.parse_args()
+
+    results: Dict[str, Any] = {"padding": padding(args)}
+    if args.time_models:
+        results["throughput"] = time_models(args)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
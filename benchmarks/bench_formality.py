@@ -0,0 +1,142 @@
+"""
+Micro-benchmark of `Tagger.formality` on long documents, comparing it with the
+previous implementation (which rebuilt the formality word list for every document,
+scanned it linearly for each token, tried `_verb_formality` for every token and ran
+the normalization regex for every token, on spaCy tokens rather than extracted
+features).
+
+Usage:
+    python benchmarks/bench_formality.py --tgt-lang es --sentences 200 --tokens 50
+"""
+
+import argparse
+import json
+import random
+import re
+import time
+from typing import Any, Callable, Dict, List, Set
+
+import spacy
+
+from muda.langs import create_tagger
+from muda.tagger import Alignment, Tagger
+
+
+def legacy_verb_formality(
+    src: spacy.tokens.Doc,
+    tgt: spacy.tokens.Doc,
+    align: Dict[int, int],
+    prev_formality: Set[str],
+) -> List[bool]:
+    """The previous `Tagger._verb_formality`, which no tagger implemented."""
+    raise NotImplementedError
+
+
+def legacy_formality(
+    tagger: Tagger,
+    src_doc: List[spacy.tokens.Doc],
+    tgt_doc: List[spacy.tokens.Doc],
+    align_doc: Alignment,
+) -> List[List[bool]]:
+    doc_tags = []
+    formality_classes = {
+        word: formality
+        for formality, words in tagger.formality_classes.items()
+        for word in words
+    }
+    formality_words = list(formality_classes.keys())
+    prev_formality = set()
+    for src, tgt, align in zip(src_doc, tgt_doc, align_doc):
+        tags = []
+        for word in tgt:
+            norm_word = re.sub(r"^\W+|\W+$", "", word.text.lower())
+            if norm_word in formality_words:
+                if formality_classes[norm_word] in prev_formality:
+                    tags.append(True)
+                else:
+                    tags.append(False)
+                    prev_formality.add(formality_classes[norm_word])
+            else:
+                tags.append(False)
+
+            try:
+                verb_tags = legacy_verb_formality(src, tgt, align, prev_formality)
+                assert len(tags) == len(verb_tags)
+                tags = [a or b for a, b in zip(tags, verb_tags)]
+            except NotImplementedError:
+                pass
+
+        doc_tags.append(tags)
+    return doc_tags
+
+
+def best_time(fn: Callable[[], Any], repeats: int) -> float:
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tgt-lang", default="es")
+    parser.add_argument("--sentences", type=int, default=200)
+    parser.add_argument("--tokens", type=int, default=50, help="Tokens per sentence")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    tagger = create_tagger(args.tgt_lang)
+    rng = random.Random(args.seed)
+    formality_words = sorted(w for ws in tagger.formality_classes.values() for w in ws)
+    filler = [f"palabra{i}" for i in range(1000)]
+
+    nlp = spacy.blank("xx")
+    tgt_doc = [
+        nlp(
+            " ".join(
+                (
+                    rng.choice(formality_words)
+                    if formality_words and rng.random() < 0.05
+                    else rng.choice(filler)
+                )
+                for _ in range(args.tokens)
+            )
+        )
+        for _ in range(args.sentences)
+    ]
+    src_doc = [nlp("you") for _ in tgt_doc]
+    align_doc: Alignment = [{} for _ in tgt_doc]
+
+    src_features = [tagger.features(doc) for doc in src_doc]
+    tgt_features = [tagger.features(doc) for doc in tgt_doc]
+
+    legacy = legacy_formality(tagger, src_doc, tgt_doc, align_doc)
+    current = tagger.formality(src_features, tgt_features, align_doc)
+    assert legacy == current, "tags differ from the previous implementation"
+
+    legacy_s = best_time(
+        lambda: legacy_formality(tagger, src_doc, tgt_doc, align_doc), args.repeats
+    )
+    current_s = best_time(
+        lambda: tagger.formality(src_features, tgt_features, align_doc), args.repeats
+    )
+    print(
+        json.dumps(
+            {
+                "tgt_lang": args.tgt_lang,
+                "sentences": args.sentences,
+                "tokens_per_sentence": args.tokens,
+                "legacy_s": legacy_s,
+                "current_s": current_s,
+                "speedup": legacy_s / current_s,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Resident memory of the preprocessed sentences on the maia en-de data (both splits),
+scaled up by replicating its documents, comparing the spaCy `Doc`s that
+preprocessing used to keep for every source and target sentence (the previous
+behaviour) with the `SentenceFeatures` that replace them.
+
+Each representation is measured in a fresh interpreter: the pipelines are loaded
+and warmed up on the first document, then all source and target sentences are
+parsed and kept in that representation. The RSS growth (and the peak RSS) is
+printed as JSON.
+
+Usage (from the repository root):
+    python benchmarks/bench_memory.py --scale 100
+    python benchmarks/bench_memory.py --scale 100 --phenomena formality lexical_cohesion
+"""
+
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+from typing import Any, Dict, List
+
+from run_benchmarks import (
+    DATA_DIR,
+    Corpus,
+    first_document,
+    peak_rss_mb,
+    read_corpus,
+    scale_corpus,
+)
+
+from muda.langs import create_tagger
+from muda.tagger import PHENOMENA
+
+MODES = ("docs", "features")
+
+
+def maia_corpus() -> Corpus:
+    """Both maia en-de splits, as a single corpus."""
+    srcs: List[str] = []
+    tgts: List[str] = []
+    docids: List[int] = []
+    for split in ("agent", "client"):
+        split_srcs, split_tgts, split_docids = read_corpus(
+            *(
+                os.path.join(DATA_DIR, "maia", "en-de", f"{split}.{ext}")
+                for ext in ("en", "de", "docids")
+            )
+        )
+        offset = max(docids) + 1 if docids else 0
+        srcs.extend(split_srcs)
+        tgts.extend(split_tgts)
+        docids.extend(docid + offset for docid in split_docids)
+    return srcs, tgts, docids
+
+
+def rss_mb() -> float:
+    """Current RSS (the peak RSS where /proc is not available)."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return peak_rss_mb()
+
+
+def measure(mode: str, scale: int, phenomena: List[str]) -> Dict[str, Any]:
+    """Parses the corpus, keeping every sentence as a `Doc` or as `SentenceFeatures`,
+    and returns the RSS growth."""
+    tagger = create_tagger("de")
+    plan = tagger.plan(phenomena)
+    pipelines = (
+        tagger.pipeline(tagger.src_lang, plan.src_processors),
+        tagger.pipeline(tagger.tgt_lang, plan.tgt_processors),
+    )
+    corpus = maia_corpus()
+    srcs, tgts, _ = first_document(corpus)
+    for pipeline, sents in zip(pipelines, (srcs, tgts)):
+        for doc in tagger._parse(pipeline, sents):
+            tagger.features(doc)
+    srcs, tgts, _ = scale_corpus(corpus, scale)
+    gc.collect()
+    before = rss_mb()
+
+    kept: List[List[Any]] = []
+    for pipeline, sents in zip(pipelines, (srcs, tgts)):
+        if mode == "docs":
+            kept.append(list(tagger._parse(pipeline, sents)))
+        else:
+            kept.append(
+                [tagger.features(doc) for doc in tagger._parse(pipeline, sents)]
+            )
+    gc.collect()
+    after = rss_mb()
+    return {
+        "sentences": sum(len(sents) for sents in kept),
+        "rss_growth_mb": after - before,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--scale",
+        type=int,
+        default=100,
+        help="Number of times the documents are replicated. Default: 100",
+    )
+    parser.add_argument(
+        "--phenomena",
+        nargs="+",
+        default=list(PHENOMENA),
+        help="Phenomena whose preprocessing (pipeline processors) is used",
+    )
+    # measures a single representation, in the current interpreter
+    parser.add_argument("--mode", choices=MODES, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode is not None:
+        print(json.dumps(measure(args.mode, args.scale, args.phenomena)))
+        return
+
+    results: Dict[str, Any] = {"scale": args.scale, "phenomena": args.phenomena}
+    for mode in MODES:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--mode", mode]
+            + ["--scale", str(args.scale), "--phenomena", *args.phenomena],
+            check=True,
+            stdout=subprocess.PIPE,
+        ).stdout
+        results[mode] = json.loads(output)
+    results["rss_reduction"] = 1 - (
+        results["features"]["rss_growth_mb"] / results["docs"]["rss_growth_mb"]
+    )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
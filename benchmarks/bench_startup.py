@@ -0,0 +1,98 @@
+"""
+Startup-time regression benchmark for the paths that shouldn't load any NLP model or
+library: the CLI help (`python muda/main.py --help`) and importing `muda.metrics` to
+score existing tag dumps.
+
+Each path is run in a fresh interpreter several times. The benchmark fails (exit
+code 1) if any heavy library gets imported, or if the median time of a path exceeds
+`--max-seconds`.
+
+Usage (from the repository root):
+    python benchmarks/bench_startup.py --max-seconds 1.5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = [
+    "torch",
+    "transformers",
+    "allennlp",
+    "awesome_align",
+    "stanza",
+    "spacy_stanza",
+    "spacy",
+]
+
+PATHS: Dict[str, List[str]] = {
+    "main_help": [sys.executable, os.path.join("muda", "main.py"), "--help"],
+    "import_metrics": [sys.executable, "-c", "import muda.metrics"],
+}
+
+CHECK_IMPORTS = (
+    "import sys, runpy\n"
+    "sys.argv = ['main.py', '--help']\n"
+    "try:\n"
+    "    runpy.run_path('muda/main.py', run_name='__main__')\n"
+    "except SystemExit:\n"
+    "    pass\n"
+    "import muda.metrics\n"
+    f"heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+    "sys.stderr.write(repr(heavy))\n"
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument(
+        "--max-seconds",
+        type=float,
+        default=None,
+        help="Fail if the median startup time of any path exceeds this",
+    )
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [REPO_DIR, env.get("PYTHONPATH")]))
+
+    results: Dict[str, Dict[str, float]] = {}
+    for name, command in PATHS.items():
+        times = []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            subprocess.run(
+                command, cwd=REPO_DIR, env=env, check=True, stdout=subprocess.DEVNULL
+            )
+            times.append(time.perf_counter() - start)
+        results[name] = {"median_s": statistics.median(times), "min_s": min(times)}
+
+    check = subprocess.run(
+        [sys.executable, "-c", CHECK_IMPORTS],
+        cwd=REPO_DIR,
+        env=env,
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    heavy_imports = check.stderr.strip().splitlines()[-1]
+
+    print(json.dumps({"paths": results, "heavy_imports": heavy_imports}, indent=2))
+
+    failed = heavy_imports != "[]"
+    if args.max_seconds is not None:
+        failed |= any(r["median_s"] > args.max_seconds for r in results.values())
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
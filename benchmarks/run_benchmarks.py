@@ -0,0 +1,258 @@
+"""
+Stage-level throughput benchmark on the bundled example data.
+
+Every corpus (the maia en-de splits and the per-language test sets) is optionally
+scaled up by replicating its documents, and each stage of the tagging pipeline is
+timed on it: source/target parsing, feature extraction, alignment, coreference
+resolution, every phenomenon method and the metric computation (reference against itself). Models are
+loaded and warmed up on the first document before timing.
+
+Results (sentences per second and peak RSS after each stage) are printed as JSON.
+With `--compare`, throughputs are compared to those of a previous run, and the
+benchmark fails (exit code 1) if any stage got slower than `--tolerance`.
+
+Usage (from the repository root):
+    python benchmarks/run_benchmarks.py --scales 1 10 --output bench.json
+    python benchmarks/run_benchmarks.py --scales 1 10 --compare bench.json
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from muda.langs import create_tagger
+from muda.metrics import compute_metrics
+from muda.tagger import PHENOMENA, Tagger, build_docs
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(REPO_DIR, "example_data")
+
+Corpus = Tuple[List[str], List[str], List[int]]
+
+
+def corpora() -> Dict[str, Tuple[str, str, str, str]]:
+    """Bundled corpora, as name -> (target language, source, target, docids files)."""
+    maia = os.path.join(DATA_DIR, "maia", "en-de")
+    found = {
+        f"maia-{split}": (
+            "de",
+            os.path.join(maia, f"{split}.en"),
+            os.path.join(maia, f"{split}.de"),
+            os.path.join(maia, f"{split}.docids"),
+        )
+        for split in ("agent", "client")
+    }
+    tests_dir = os.path.join(DATA_DIR, "tests")
+    for lang in sorted(os.listdir(tests_dir)):
+        test_dir = os.path.join(tests_dir, lang)
+        tgt_file = os.path.join(test_dir, f"example.{lang}")
+        # some test sets (e.g. pronouns) are not named after a language
+        if os.path.exists(tgt_file):
+            found[f"tests-{lang}"] = (
+                lang,
+                os.path.join(test_dir, "example.en"),
+                tgt_file,
+                os.path.join(test_dir, "example.docids"),
+            )
+    return found
+
+
+def read_corpus(src_file: str, tgt_file: str, docids_file: str) -> Corpus:
+    with open(src_file, "r", encoding="utf-8") as src_f:
+        srcs = [line.strip() for line in src_f]
+    with open(tgt_file, "r", encoding="utf-8") as tgt_f:
+        tgts = [line.strip() for line in tgt_f]
+    with open(docids_file, "r", encoding="utf-8") as docids_f:
+        docids = [int(idx) for idx in docids_f]
+    return srcs, tgts, docids
+
+
+def scale_corpus(corpus: Corpus, scale: int) -> Corpus:
+    """Replicates the documents of a corpus `scale` times, as new documents."""
+    srcs, tgts, docids = corpus
+    num_docs = max(docids) + 1 if docids else 0
+    return (
+        srcs * scale,
+        tgts * scale,
+        [docid + copy * num_docs for copy in range(scale) for docid in docids],
+    )
+
+
+def first_document(corpus: Corpus) -> Corpus:
+    srcs, tgts, docids = corpus
+    end = next((i for i, d in enumerate(docids) if d != docids[0]), len(docids))
+    return srcs[:end], tgts[:end], docids[:end]
+
+
+def peak_rss_mb() -> float:
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macos
+    return maxrss / (2**20 if sys.platform == "darwin" else 2**10)
+
+
+def run_stages(
+    tagger: Tagger, corpus: Corpus, phenomena: List[str], repeats: int = 1
+) -> Dict[str, Dict[str, float]]:
+    """Runs (and times) every stage of the pipeline on a corpus, keeping the best
+    time of `repeats` runs of each stage."""
+    srcs, tgts, docids = corpus
+    plan = tagger.plan(phenomena)
+    results: Dict[str, Dict[str, float]] = {}
+    outputs: Dict[str, Any] = {}
+
+    def stage(name: str, fn: Callable[[], Any]) -> None:
+        elapsed = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            outputs[name] = fn()
+            elapsed = min(elapsed, time.perf_counter() - start)
+        results[name] = {
+            "seconds": elapsed,
+            "sentences_per_s": len(srcs) / max(elapsed, 1e-9),
+            "peak_rss_mb": peak_rss_mb(),
+        }
+
+    src_pipeline = tagger.pipeline(tagger.src_lang, plan.src_processors)
+    tgt_pipeline = tagger.pipeline(tagger.tgt_lang, plan.tgt_processors)
+    stage("src_parse", lambda: list(tagger._parse(src_pipeline, srcs)))
+    stage("tgt_parse", lambda: list(tagger._parse(tgt_pipeline, tgts)))
+    src_parsed, tgt_parsed = outputs["src_parse"], outputs["tgt_parse"]
+    stage(
+        "features",
+        lambda: (
+            [tagger.features(doc) for doc in src_parsed],
+            [tagger.features(doc) for doc in tgt_parsed],
+        ),
+    )
+    src_pproc, tgt_pproc = outputs["features"]
+    if plan.alignment:
+        stage("alignment", lambda: tagger._build_alignments(src_pproc, tgt_pproc))
+    if plan.coref:
+        stage("coref", lambda: tagger._build_corefs(src_parsed, docids))
+
+    docs = build_docs(  # type: ignore
+        docids,
+        src_pproc,
+        tgt_pproc,
+        outputs.get("coref", [[] for _ in srcs]),
+        outputs.get("alignment", [{} for _ in srcs]),
+    )
+    kwargs = [
+        dict(zip(("src_doc", "tgt_doc", "antecs_doc", "align_doc"), doc))
+        for doc in zip(*docs)
+    ]
+    for phenomenon in phenomena:
+        spec = tagger.phenomena[phenomenon]
+        stage(
+            phenomenon,
+            lambda: [spec.fn(**{k: doc[k] for k in spec.inputs}) for doc in kwargs],
+        )
+
+    tagged = [tagger.tag(*doc, phenomena=phenomena) for doc in zip(*docs)]
+    stage("compute_metrics", lambda: compute_metrics(tagged, tagged))
+    return results
+
+
+def compare(
+    results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float
+) -> List[str]:
+    """Returns the stages that are slower than in `baseline` by more than `tolerance`
+    (as a fraction of the baseline throughput)."""
+    regressions = []
+    for key, stages in results["runs"].items():
+        for stage, result in stages.items():
+            base = baseline["runs"].get(key, {}).get(stage)
+            if base is None:
+                continue
+            ratio = result["sentences_per_s"] / base["sentences_per_s"]
+            if ratio < 1 - tolerance:
+                regressions.append(f"{key} {stage}: {ratio:.2f}x of baseline")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--corpora",
+        nargs="+",
+        default=None,
+        help="Corpora to benchmark (default: all). Available: " + ", ".join(corpora()),
+    )
+    parser.add_argument(
+        "--scales",
+        nargs="+",
+        type=int,
+        default=[1],
+        help="Number of times the documents of each corpus are replicated",
+    )
+    parser.add_argument("--phenomena", nargs="+", default=list(PHENOMENA))
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=1,
+        help="Number of runs of each stage, keeping the fastest. Default: 1",
+    )
+    parser.add_argument(
+        "--batch-tokens",
+        type=int,
+        default=None,
+        help="Token budget of the alignment and coreference batches (see muda/main.py)",
+    )
+    parser.add_argument("--output", default=None, help="Also write the JSON here")
+    parser.add_argument(
+        "--compare", default=None, help="JSON of a previous run to compare against"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.1,
+        help="Allowed throughput drop w.r.t. the --compare run. Default: 0.1",
+    )
+    args = parser.parse_args()
+
+    available = corpora()
+    taggers: Dict[str, Tagger] = {}
+    warmup: Dict[str, float] = {}
+    runs: Dict[str, Dict[str, Dict[str, float]]] = {}
+    for name in args.corpora or available:
+        lang, *files = available[name]
+        corpus = read_corpus(*files)
+        if lang not in taggers:
+            start = time.perf_counter()
+            taggers[lang] = create_tagger(lang, batch_tokens=args.batch_tokens)
+            run_stages(taggers[lang], first_document(corpus), args.phenomena)
+            warmup[lang] = time.perf_counter() - start
+        for scale in args.scales:
+            print(f"{name}/x{scale}", file=sys.stderr)
+            runs[f"{name}/x{scale}"] = run_stages(
+                taggers[lang],
+                scale_corpus(corpus, scale),
+                args.phenomena,
+                repeats=args.repeats,
+            )
+
+    results = {
+        "batch_tokens": args.batch_tokens,
+        "warmup_s": warmup,
+        "runs": runs,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    print(json.dumps(results, indent=2))
+    if args.output is not None:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare is not None:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"regression: {regression}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 from .tagger import Tagger
 from .main import main
+from .evaluator import MudaEvaluator
 
-__all__ = ["Tagger", "main"]
+__all__ = ["Tagger", "main", "MudaEvaluator"]
@@ -0,0 +1,27 @@
+"""
+Entry point of `python -m muda`. The first argument can select a subcommand:
+    serve: runs the tagging service (see muda/server.py)
+    merge: merges the outputs of the shards of a run (see muda/sharding.py)
+otherwise, the arguments are those of the tagging/evaluation CLI (see muda/main.py).
+"""
+
+import sys
+
+
+def run() -> None:
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        from muda.server import cli
+
+        cli(sys.argv[2:])
+    elif len(sys.argv) > 1 and sys.argv[1] == "merge":
+        from muda.sharding import cli
+
+        cli(sys.argv[2:])
+    else:
+        from muda.main import main, parse_args
+
+        main(parse_args())
+
+
+if __name__ == "__main__":
+    run()
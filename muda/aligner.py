@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import itertools
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
+
+from muda.batching import length_batches
+
+if TYPE_CHECKING:
+    import torch
+
+
+class Aligner:
+    """
+    In-process awesome-align word aligner.
+
+    The model (and torch) is loaded on first use and kept in memory, so that a single
+    instance can align any number of corpora without paying the loading cost again.
+    Inputs are pairs of space-joined, pre-tokenized sentences (the same format as
+    the `src ||| tgt` lines of an awesome-align data file) and outputs are
+    dictionaries mapping source token indices to target token indices.
+
+    Pairs are batched by length (or in their original order, if not
+    `batch_by_length`), in batches of at most `batch_size` pairs and, if
+    `max_tokens` is set, of at most `max_tokens` (padded) subword tokens.
+    """
+
+    def __init__(
+        self,
+        model_name_or_path: str = "bert-base-multilingual-cased",
+        cache_dir: Optional[str] = None,
+        batch_size: int = 32,
+        max_tokens: Optional[int] = None,
+        extraction: str = "softmax",
+        align_layer: int = 8,
+        softmax_threshold: float = 0.001,
+        device: Optional[str] = None,
+        batch_by_length: bool = True,
+    ) -> None:
+        self.model_name_or_path = model_name_or_path
+        self.cache_dir = cache_dir
+        self.batch_size = batch_size
+        self.max_tokens = max_tokens
+        self.extraction = extraction
+        self.align_layer = align_layer
+        self.softmax_threshold = softmax_threshold
+        self.device = device
+        self.batch_by_length = batch_by_length
+
+        self._model: Optional[Any] = None
+        self._tokenizer: Optional[Any] = None
+
+    def load(self) -> None:
+        """Loads the alignment model and tokenizer, if not loaded yet."""
+        if self._model is not None:
+            return
+
+        import torch
+        from awesome_align import modeling  # type: ignore
+        from awesome_align.configuration_bert import BertConfig  # type: ignore
+        from awesome_align.modeling import BertForMaskedLM  # type: ignore
+        from awesome_align.tokenization_bert import BertTokenizer  # type: ignore
+
+        if self.device is None:
+            self.device = "cuda" if torch.cuda.is_available() else "cpu"
+
+        config = BertConfig.from_pretrained(
+            self.model_name_or_path, cache_dir=self.cache_dir
+        )
+        tokenizer = BertTokenizer.from_pretrained(
+            self.model_name_or_path, cache_dir=self.cache_dir
+        )
+        # awesome-align reads the special token ids from module-level globals
+        modeling.PAD_ID = tokenizer.pad_token_id
+        modeling.CLS_ID = tokenizer.cls_token_id
+        modeling.SEP_ID = tokenizer.sep_token_id
+
+        model = BertForMaskedLM.from_pretrained(
+            self.model_name_or_path, config=config, cache_dir=self.cache_dir
+        )
+        model.to(self.device)
+        model.eval()
+
+        self._tokenizer = tokenizer
+        self._model = model
+
+    def _encode(
+        self, src: str, tgt: str
+    ) -> Optional[Tuple[torch.Tensor, torch.Tensor, List[int], List[int]]]:
+        """Converts a sentence pair to model inputs, mirroring awesome-align's
+        data loader. Returns None for pairs awesome-align would skip."""
+        assert self._tokenizer is not None
+        tokenizer = self._tokenizer
+        sent_src, sent_tgt = src.strip().split(), tgt.strip().split()
+        if not sent_src or not sent_tgt:
+            return None
+
+        token_src = [tokenizer.tokenize(word) for word in sent_src]
+        token_tgt = [tokenizer.tokenize(word) for word in sent_tgt]
+        wid_src = [tokenizer.convert_tokens_to_ids(x) for x in token_src]
+        wid_tgt = [tokenizer.convert_tokens_to_ids(x) for x in token_tgt]
+
+        ids_src = tokenizer.prepare_for_model(
+            list(itertools.chain(*wid_src)),
+            return_tensors="pt",
+            max_length=tokenizer.max_len,
+        )["input_ids"][0]
+        ids_tgt = tokenizer.prepare_for_model(
+            list(itertools.chain(*wid_tgt)),
+            return_tensors="pt",
+            max_length=tokenizer.max_len,
+        )["input_ids"][0]
+        if len(ids_src) == 2 or len(ids_tgt) == 2:
+            return None
+
+        bpe2word_map_src = [i for i, wlist in enumerate(token_src) for _ in wlist]
+        bpe2word_map_tgt = [i for i, wlist in enumerate(token_tgt) for _ in wlist]
+        return ids_src, ids_tgt, bpe2word_map_src, bpe2word_map_tgt
+
+    def align(self, pairs: List[Tuple[str, str]]) -> List[Dict[int, int]]:
+        """Aligns a list of (source, target) sentence pairs.
+
+        Args:
+            pairs: list of pairs of space-joined source and target tokens
+        Returns:
+            list of alignments, one per pair, each mapping source token indices
+                to target token indices
+        """
+        if not pairs:
+            return []
+        self.load()
+        assert self._model is not None and self._tokenizer is not None
+        import torch
+        from torch.nn.utils.rnn import pad_sequence
+
+        alignments: List[Dict[int, int]] = [{} for _ in pairs]
+        encoded = [(i, self._encode(src, tgt)) for i, (src, tgt) in enumerate(pairs)]
+        examples = [(i, enc) for i, enc in encoded if enc is not None]
+
+        pad_id = self._tokenizer.pad_token_id
+        lengths = [len(enc[0]) + len(enc[1]) for _, enc in examples]
+        for batch_idx in length_batches(
+            lengths, self.batch_size, self.max_tokens, self.batch_by_length
+        ):
+            batch = [examples[b] for b in batch_idx]
+            indices = [i for i, _ in batch]
+            ids_src, ids_tgt, bpe2word_src, bpe2word_tgt = zip(
+                *[enc for _, enc in batch]
+            )
+            with torch.no_grad():
+                word_aligns_list = self._model.get_aligned_word(
+                    pad_sequence(ids_src, batch_first=True, padding_value=pad_id),
+                    pad_sequence(ids_tgt, batch_first=True, padding_value=pad_id),
+                    bpe2word_src,
+                    bpe2word_tgt,
+                    self.device,
+                    0,
+                    0,
+                    align_layer=self.align_layer,
+                    extraction=self.extraction,
+                    softmax_threshold=self.softmax_threshold,
+                    test=True,
+                )
+            for idx, word_aligns in zip(indices, word_aligns_list):
+                alignment = alignments[idx]
+                for src_idx, tgt_idx in word_aligns:
+                    alignment[int(src_idx)] = int(tgt_idx)
+
+        return alignments
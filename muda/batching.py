@@ -0,0 +1,47 @@
+from typing import List, Optional, Sequence
+
+
+def length_batches(
+    lengths: Sequence[int],
+    max_size: int,
+    max_tokens: Optional[int] = None,
+    by_length: bool = True,
+) -> List[List[int]]:
+    """Groups items of similar length into batches, to reduce padding.
+
+    Items are sorted by length and split into batches of at most `max_size` items
+    and, if `max_tokens` is set, of at most `max_tokens` padded tokens (number of
+    items times the length of the longest one). Items longer than `max_tokens` get
+    a batch of their own.
+
+    If not `by_length`, items are batched in their original order instead (with the
+    same limits), e.g. to measure the effect of sorting them.
+
+    Returns:
+        the indices of the items of every batch
+    """
+    batches: List[List[int]] = []
+    batch: List[int] = []
+    longest = 0
+    order: Sequence[int] = range(len(lengths))
+    if by_length:
+        order = sorted(order, key=lambda i: lengths[i])
+    for idx in order:
+        # if sorted, the current item is the longest of the batch
+        longest = max(longest, lengths[idx]) if batch else lengths[idx]
+        if batch and (
+            len(batch) == max_size
+            or (max_tokens is not None and (len(batch) + 1) * longest > max_tokens)
+        ):
+            batches.append(batch)
+            batch = []
+            longest = lengths[idx]
+        batch.append(idx)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def padded_tokens(lengths: Sequence[int], batches: List[List[int]]) -> int:
+    """Total number of (padded) tokens of a batching of items."""
+    return sum(len(batch) * max(lengths[i] for i in batch) for batch in batches)
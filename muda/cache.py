@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import spacy
+
+    from muda.aligner import Aligner
+
+
+class SqliteStore:
+    """
+    Key-value store of binary blobs backed by a SQLite database.
+
+    The store can be shared by concurrent runs (SQLite handles the locking) and is
+    capped in size: when the total size of the stored values exceeds `max_size`
+    bytes, the least recently used entries are evicted.
+    """
+
+    def __init__(self, path: str, max_size: Optional[int] = None) -> None:
+        self.path = path
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        # connections can't be shared with forked processes, so open one per process
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(
+                self.path, timeout=600, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries "
+                "(key TEXT PRIMARY KEY, value BLOB, size INTEGER, last_access REAL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS entries_access ON entries (last_access)"
+            )
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, bytes]:
+        """Returns the values found for the given keys, marking them as recently used."""
+        keys = list(keys)
+        found: Dict[str, bytes] = {}
+        with self._lock:
+            conn = self.conn
+            # stay well below SQLite's limit on the number of query parameters
+            for start in range(0, len(keys), 500):
+                chunk = keys[start : start + 500]
+                rows = conn.execute(
+                    "SELECT key, value FROM entries WHERE key IN (%s)"
+                    % ",".join("?" * len(chunk)),
+                    chunk,
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                conn.execute("BEGIN IMMEDIATE")
+                conn.executemany(
+                    "UPDATE entries SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                conn.execute("COMMIT")
+        return found
+
+    def put_many(self, items: Dict[str, bytes]) -> None:
+        """Stores the given values, evicting old entries if the store is full."""
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            conn = self.conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                    [(k, v, len(v), now) for k, v in items.items()],
+                )
+                if self.max_size is not None:
+                    self._evict(conn)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        (total,) = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()
+        assert self.max_size is not None
+        if total <= self.max_size:
+            return
+        evicted = []
+        for key, size in conn.execute(
+            "SELECT key, size FROM entries ORDER BY last_access"
+        ):
+            if total <= self.max_size:
+                break
+            evicted.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM entries WHERE key = ?", evicted)
+
+
+def hash_key(*parts: str) -> str:
+    """Builds a cache key from a sequence of strings."""
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def _stanza_models(snlp: Any) -> str:
+    """Identifies the models loaded by a stanza pipeline: the `resources.json` of
+    its model directory (which lists the checksum of every model of the release),
+    and the path, size and modification time of the model file of every processor
+    (which may have been replaced by hand)."""
+    parts = []
+    model_dir = getattr(snlp, "dir", None)
+    for name, processor in snlp.processors.items():
+        path = getattr(processor, "config", {}).get("model_path")
+        if path and os.path.exists(path):
+            stat = os.stat(path)
+            parts.append(f"{name}:{path}:{stat.st_size}:{stat.st_mtime_ns}")
+            if model_dir is None:
+                # models are stored in <dir>/<lang>/<processor>/<package>.pt
+                model_dir = os.path.dirname(os.path.dirname(os.path.dirname(path)))
+    if model_dir is not None:
+        resources = os.path.join(model_dir, "resources.json")
+        if os.path.exists(resources):
+            with open(resources, "rb") as f:
+                parts.append(hashlib.sha256(f.read()).hexdigest())
+    return hash_key(*parts)
+
+
+def pipeline_fingerprint(pipeline: spacy.language.Language) -> str:
+    """Identifies a (spacy-stanza) pipeline by language, processors and versions
+    (of the libraries and of the models)."""
+    import spacy.about
+
+    snlp = getattr(pipeline.tokenizer, "snlp", None)
+    if snlp is not None:
+        import stanza  # type: ignore
+
+        processors = ",".join(snlp.processors.keys())
+        version = f"stanza-{stanza.__version__}|models-{_stanza_models(snlp)}"
+    else:
+        processors = ",".join(pipeline.pipe_names)
+        version = f"{pipeline.meta.get('name')}-{pipeline.meta.get('version')}"
+    return f"{pipeline.lang}|{processors}|{version}|spacy-{spacy.about.__version__}"
+
+
+class ParseCache:
+    """
+    On-disk cache of parsed sentences, stored in spacy's `DocBin` format and keyed by
+    the pipeline fingerprint and a hash of the sentence.
+    """
+
+    def __init__(self, cache_dir: str, max_size_mb: Optional[int] = None) -> None:
+        os.makedirs(cache_dir, exist_ok=True)
+        self.store = SqliteStore(
+            os.path.join(cache_dir, "parses.sqlite"),
+            max_size=max_size_mb * 2**20 if max_size_mb is not None else None,
+        )
+
+    def pipe(
+        self, pipeline: spacy.language.Language, texts: List[str]
+    ) -> Iterator[spacy.tokens.doc.Doc]:
+        """Parses the given texts, only running the pipeline on uncached ones.
+        Parses are produced one at a time (and new ones are stored once all have
+        been produced), so that they don't all need to be kept in memory."""
+        from spacy.tokens import DocBin
+
+        fingerprint = pipeline_fingerprint(pipeline)
+        keys = [hash_key(fingerprint, text) for text in texts]
+        cached = self.store.get_many(set(keys))
+
+        missing = {key: text for key, text in zip(keys, texts) if key not in cached}
+        # parsed in order of first appearance
+        parsed = iter(pipeline.pipe(missing.values()))
+        new_entries: Dict[str, bytes] = {}
+        for key in keys:
+            if key in missing and key not in new_entries:
+                doc = next(parsed)
+                new_entries[key] = DocBin(docs=[doc]).to_bytes()
+                yield doc
+            else:
+                value = cached[key] if key in cached else new_entries[key]
+                yield next(iter(DocBin().from_bytes(value).get_docs(pipeline.vocab)))
+        self.store.put_many(new_entries)
+
+
+class AlignmentCache:
+    """
+    On-disk cache of word alignments, keyed by the alignment model, the extraction
+    method and the (space-joined, tokenized) source and target sentences.
+    """
+
+    def __init__(self, cache_dir: str, max_size_mb: Optional[int] = None) -> None:
+        os.makedirs(cache_dir, exist_ok=True)
+        self.store = SqliteStore(
+            os.path.join(cache_dir, "alignments.sqlite"),
+            max_size=max_size_mb * 2**20 if max_size_mb is not None else None,
+        )
+        self.hits = 0
+        self.lookups = 0
+
+    def align(
+        self, aligner: Aligner, pairs: List[Tuple[str, str]]
+    ) -> List[Dict[int, int]]:
+        """Aligns the given sentence pairs, only running the aligner on uncached ones."""
+        keys = [
+            hash_key(aligner.model_name_or_path, aligner.extraction, src, tgt)
+            for src, tgt in pairs
+        ]
+        cached = self.store.get_many(set(keys))
+
+        alignments: Dict[str, Dict[int, int]] = {}
+        for key, value in cached.items():
+            alignment = {}
+            for pair in value.decode("utf-8").split():
+                src_idx, tgt_idx = pair.split("-")
+                alignment[int(src_idx)] = int(tgt_idx)
+            alignments[key] = alignment
+
+        missing = {key: pair for key, pair in zip(keys, pairs) if key not in alignments}
+        new_entries = {}
+        # the aligner (and its model) is only used for misses
+        if missing:
+            for key, alignment in zip(
+                missing.keys(), aligner.align(list(missing.values()))
+            ):
+                alignments[key] = alignment
+                new_entries[key] = " ".join(
+                    f"{s}-{t}" for s, t in alignment.items()
+                ).encode("utf-8")
+            self.store.put_many(new_entries)
+
+        hits = len(keys) - len(missing)
+        self.hits += hits
+        self.lookups += len(keys)
+        print(
+            f"alignment cache: {hits}/{len(keys)} hits "
+            f"({hits / max(len(keys), 1):.1%}), "
+            f"{self.hits / max(self.lookups, 1):.1%} overall",
+            file=sys.stderr,
+        )
+        return [alignments[key] for key in keys]
@@ -0,0 +1,169 @@
+"""
+Resumable runs: the corpus is tagged in shards of consecutive documents, and the
+tags of every shard are written to a run directory as soon as they are computed,
+along with a manifest of the completed shards. If the run is interrupted (e.g. by
+a crash of one of the models), it can be resumed from the last completed shard.
+
+A run directory contains:
+    manifest.json: the run configuration, a fingerprint of its inputs and the
+        indices of the completed shards
+    shard-{shard:05d}.{set}.npz: tags of the documents of a shard, for every target
+        set (see muda/tagstore.py)
+"""
+
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional, Sequence
+
+from muda.cache import hash_key
+from muda.incremental import TagFn
+from muda.parallel import TaggedDoc, doc_spans
+from muda.tagstore import TagStore, write_tags
+
+MANIFEST_VERSION = 1
+
+
+class RunDir:
+    """Directory where the shards of a run are committed.
+
+    Args:
+        path: directory of the run, created if needed
+        fingerprint: identifies the tagging configuration (language, phenomena,
+            models...), so that a run isn't resumed with a different one
+        tag_names: names of the tags, in the order in which they are returned
+            (see `write_tags`)
+        shard_size: number of documents per shard
+        resume: whether to resume the run already in `path`. Otherwise, finding
+            one is an error, to avoid mixing the tags of different runs.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        fingerprint: str,
+        tag_names: Sequence[str],
+        shard_size: int = 100,
+        resume: bool = False,
+    ) -> None:
+        if shard_size < 1:
+            raise ValueError(f"shard_size must be positive, got {shard_size}")
+        self.path = path
+        self.fingerprint = fingerprint
+        self.tag_names = list(tag_names)
+        self.shard_size = shard_size
+        self.resume = resume
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.path, "manifest.json")
+
+    def shard_path(self, shard: int, tgt_set: int) -> str:
+        return os.path.join(self.path, f"shard-{shard:05d}.{tgt_set}.npz")
+
+    def read_manifest(self) -> Optional[Dict[str, Any]]:
+        if not os.path.exists(self.manifest_path):
+            return None
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            manifest: Dict[str, Any] = json.load(f)
+        return manifest
+
+    def write_manifest(self, manifest: Dict[str, Any]) -> None:
+        # write then rename, so that a crash never leaves a partial manifest
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def start(
+        self, srcs: List[str], tgt_sets: List[List[str]], docids: List[int]
+    ) -> Dict[str, Any]:
+        """Returns the manifest of the run, creating it or checking that the run
+        being resumed has the same configuration and inputs."""
+        num_docs = len(doc_spans(docids))
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "fingerprint": hash_key(
+                self.fingerprint,
+                *srcs,
+                *(tgt for tgts in tgt_sets for tgt in tgts),
+                *map(str, docids),
+            ),
+            "shard_size": self.shard_size,
+            "num_shards": (num_docs + self.shard_size - 1) // self.shard_size,
+            "num_sets": len(tgt_sets),
+            "completed": [],
+        }
+
+        previous = self.read_manifest()
+        if previous is None:
+            os.makedirs(self.path, exist_ok=True)
+            self.write_manifest(manifest)
+            return manifest
+        if not self.resume:
+            raise ValueError(
+                f"{self.path} already contains a run, use --resume to resume it"
+            )
+        for field in ("version", "fingerprint", "shard_size", "num_sets"):
+            if previous.get(field) != manifest[field]:
+                raise ValueError(
+                    f"Can't resume the run in {self.path}: its {field} differs "
+                    "(the inputs or the tagging configuration changed)"
+                )
+        return previous
+
+    def write_shard(self, shard: int, tagged: List[List[TaggedDoc]]) -> None:
+        for k, set_tagged in enumerate(tagged):
+            path = self.shard_path(shard, k)
+            tmp_path = f"{path}.tmp"
+            write_tags(tmp_path, set_tagged, tag_names=self.tag_names)
+            os.replace(tmp_path, path)
+
+    def read_shard(self, shard: int, num_sets: int) -> List[List[TaggedDoc]]:
+        return [list(TagStore(self.shard_path(shard, k))) for k in range(num_sets)]
+
+
+def tag_resumable(
+    run_dir: RunDir,
+    tag_fn: TagFn,
+    srcs: List[str],
+    tgt_sets: List[List[str]],
+    docids: List[int],
+) -> List[List[TaggedDoc]]:
+    """Same as `tag_fn` (e.g. `tag_corpus` with a bound tagger), but tagging the
+    corpus shard by shard and committing every shard to `run_dir`. When resuming,
+    completed shards are read back rather than tagged again.
+
+    Returns:
+        for every target set, the list of tagged documents
+    """
+    manifest = run_dir.start(srcs, tgt_sets, docids)
+    completed = set(manifest["completed"])
+    spans = doc_spans(docids)
+
+    tagged: List[List[TaggedDoc]] = [[] for _ in tgt_sets]
+    for shard in range(manifest["num_shards"]):
+        shard_spans = spans[
+            shard * run_dir.shard_size : (shard + 1) * run_dir.shard_size
+        ]
+        if shard in completed:
+            shard_tagged = run_dir.read_shard(shard, len(tgt_sets))
+        else:
+            start, end = shard_spans[0][0], shard_spans[-1][1]
+            shard_tagged = tag_fn(
+                srcs[start:end],
+                [tgts[start:end] for tgts in tgt_sets],
+                docids[start:end],
+            )
+            run_dir.write_shard(shard, shard_tagged)
+            completed.add(shard)
+            manifest["completed"] = sorted(completed)
+            run_dir.write_manifest(manifest)
+            print(
+                f"checkpoint: committed shard {shard + 1} of {manifest['num_shards']}",
+                file=sys.stderr,
+            )
+        for set_tagged, shard_docs in zip(tagged, shard_tagged):
+            assert len(shard_docs) == len(shard_spans)
+            set_tagged.extend(shard_docs)
+    return tagged
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import sys
+import time
+from typing import Any, Dict, List, Optional, TYPE_CHECKING
+
+from muda.batching import length_batches
+
+if TYPE_CHECKING:
+    import spacy
+    from allennlp.predictors.predictor import Predictor
+
+COREF_MODEL = "https://storage.googleapis.com/allennlp-public-models/coref-spanbert-large-2021.03.10.tar.gz"
+
+
+class CorefResolver:
+    """
+    Coreference resolver for the source (english) sentences.
+
+    The allennlp predictor is loaded on first use and kept for the lifetime of the
+    resolver. Sentences are sent through the predictor's batch interface, batched by
+    length (or in their original order, if not `batch_by_length`) in batches of at
+    most `batch_size` sentences and, if `max_tokens` is set, of at most `max_tokens`
+    (padded) tokens.
+    """
+
+    def __init__(
+        self,
+        model_path: str = COREF_MODEL,
+        batch_size: int = 8,
+        max_tokens: Optional[int] = None,
+        batch_by_length: bool = True,
+    ) -> None:
+        self.model_path = model_path
+        self.batch_size = batch_size
+        self.max_tokens = max_tokens
+        self.batch_by_length = batch_by_length
+        self._predictor: Optional[Predictor] = None
+
+    @property
+    def predictor(self) -> Predictor:
+        if self._predictor is None:
+            from allennlp.predictors.predictor import Predictor
+
+            self._predictor = Predictor.from_path(self.model_path)
+        return self._predictor
+
+    def _predict(self, texts: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """Runs the predictor on a batch of texts, falling back to one text at a time
+        if the batch fails, so that a single bad sentence only loses its own output."""
+        try:
+            outputs: List[Optional[Dict[str, Any]]] = list(
+                self.predictor.predict_batch_json([{"document": t} for t in texts])
+            )
+            return outputs
+        except (IndexError, ValueError):
+            if len(texts) == 1:
+                return [None]
+            return [self._predict([t])[0] for t in texts]
+
+    def antecedents(
+        self, src_pproc: List[spacy.tokens.doc.Doc], docids: List[int]
+    ) -> List[List[bool]]:
+        """Marks, for every token, whether it has an antecedent in its sentence.
+
+        The first sentence of each document is assumed to be resolvable (there is no
+        context that could help), so only the remaining sentences are sent to the model.
+        """
+        antecs = []
+        to_predict = []
+        prev_docid = None
+        for i, (src, docid) in enumerate(zip(src_pproc, docids)):
+            # we check if this is the first sentence of a new document
+            # since in this case there is no context that could help
+            if docid != prev_docid:
+                antecs.append([True] * len(src))
+            else:
+                antecs.append([False] * len(src))
+                to_predict.append(i)
+            prev_docid = docid
+
+        coref_errors = 0
+        start = time.perf_counter()
+        lengths = [len(src_pproc[i]) for i in to_predict]
+        for batch_idx in length_batches(
+            lengths, self.batch_size, self.max_tokens, self.batch_by_length
+        ):
+            batch = [to_predict[b] for b in batch_idx]
+            outputs = self._predict([src_pproc[i].text for i in batch])
+            for i, coref in zip(batch, outputs):
+                has_antec = antecs[i]
+                try:
+                    if coref is None or len(has_antec) != len(coref["document"]):
+                        raise ValueError()
+
+                    for cluster in coref["clusters"]:
+                        for mention in cluster[1:]:
+                            for j in range(mention[0], mention[1] + 1):
+                                has_antec[j] = True
+
+                # sometimes tokenizers are not consistent, or some other error happens in the coreference resolution
+                # in that case we just ignore the coref assuming it has no antencedents (might lead to some false positives)
+                except (IndexError, ValueError):
+                    coref_errors += 1
+                    print("coref error")
+
+        elapsed = time.perf_counter() - start
+        if to_predict:
+            print(
+                f"coref: {len(to_predict)} sentences in {elapsed:.2f}s "
+                f"({len(to_predict) / max(elapsed, 1e-9):.1f} sentences/s, "
+                f"{coref_errors} errors)",
+                file=sys.stderr,
+            )
+        return antecs
@@ -0,0 +1,63 @@
+from typing import Any, Dict, List, Sequence, Tuple
+
+from muda.langs import create_tagger
+from muda.metrics import TagEncoder, count_matches_arrays, metrics_from_counts
+from muda.parallel import TaggedDoc
+from muda.tagger import PHENOMENA
+
+
+class MudaEvaluator:
+    """
+    Evaluates translations of a fixed evaluation set, e.g. periodically during training.
+
+    The tagger (and its models), the source-side preprocessing and the reference tags
+    are computed once when the evaluator is created, so that scoring a set of
+    hypotheses only needs to parse, align and tag the hypotheses themselves.
+
+    Example:
+        evaluator = MudaEvaluator("de", srcs, refs, docids)
+        prec, rec, f1 = evaluator.score(model.translate(srcs))
+    """
+
+    def __init__(
+        self,
+        tgt_lang: str,
+        srcs: List[str],
+        refs: List[str],
+        docids: List[int],
+        phenomena: Sequence[str] = PHENOMENA,
+        **tagger_kwargs: Any,
+    ) -> None:
+        """
+        Args:
+            tgt_lang: target language, used to select the tagger
+            srcs: source sentences of the evaluation set
+            refs: reference translations of `srcs`
+            docids: document id of every sentence
+            phenomena: phenomena to evaluate
+            tagger_kwargs: arguments of the tagger (see `Tagger.__init__`)
+        """
+        self.phenomena = list(phenomena)
+        self.tagger = create_tagger(tgt_lang, **tagger_kwargs)
+        self.source = self.tagger.preprocess_src(srcs, docids, self.phenomena)
+        self.ref_tags = self.tag(refs)
+        self.encoder = TagEncoder(self.phenomena)
+        self.ref_arrays = self.encoder.encode(self.ref_tags)
+
+    def tag(self, tgts: List[str]) -> List[TaggedDoc]:
+        """Tags translations of the evaluation set, one per source sentence."""
+        preproc = self.tagger.preprocess_tgt(self.source, tgts)
+        return [
+            self.tagger.tag(*doc, phenomena=self.phenomena) for doc in zip(*preproc)
+        ]
+
+    def score(
+        self, hyps: List[str]
+    ) -> Tuple[Dict[str, float], Dict[str, float], Dict[str, float]]:
+        """Computes the precision, recall and f1 of each phenomenon for translations of
+        the evaluation set, in the same way as `compute_metrics`."""
+        hyp_arrays = self.encoder.encode(self.tag(hyps))
+        counts = count_matches_arrays(
+            self.ref_arrays, hyp_arrays, list(self.encoder.tag_bits)
+        )
+        return metrics_from_counts(counts)
@@ -0,0 +1,311 @@
+"""
+Columnar token features of parsed sentences.
+
+The phenomenon methods only read a few attributes of every token (its text, part of
+speech, stop word and punctuation flags, tense and normalized form). Reading them
+from spaCy `Token` objects is slow, since every access creates a `Token`, so they
+are extracted once per sentence with `Doc.to_array`, into the arrays of a
+`SentenceFeatures`. These only hold what the phenomena use, so the (much larger)
+spaCy `Doc`s can be released right after parsing.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from functools import lru_cache
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    TYPE_CHECKING,
+    cast,
+)
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import spacy
+
+
+@lru_cache(maxsize=None)
+def pos_id(pos: str) -> int:
+    """spaCy's id of a universal part-of-speech tag (e.g. "VERB")."""
+    from spacy.parts_of_speech import IDS  # type: ignore
+
+    return int(IDS[pos])
+
+
+@lru_cache(maxsize=2**16)
+def string_id(string: str) -> int:
+    """Id of a string (e.g. a normalized word), as a 64-bit hash, so that it doesn't
+    depend on the strings seen before and no table of ids needs to be kept."""
+    digest = hashlib.blake2b(string.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+# columns of the token and word arrays of `SentenceFeatures` (packed, since they
+# are kept for every sentence of the corpus)
+TOKEN_DTYPE = np.dtype(
+    [
+        ("orth", np.uint64),
+        ("morph_bits", np.uint64),
+        ("norm_id", np.int64),
+        ("end", np.int32),
+        ("pos", np.uint16),
+        ("is_stop", np.bool_),
+        ("is_punct", np.bool_),
+    ]
+)
+WORD_DTYPE = np.dtype([("word_id", np.uint64), ("token", np.int32)])
+SYNTAX_DTYPE = np.dtype([("dep_id", np.int64), ("head", np.int32)])
+
+# morphological fields whose values are kept, as bits of `morph_bits`
+MORPH_FIELDS = ("Tense", "Person")
+
+
+class SentenceFeatures:
+    """Features of a parsed sentence, as arrays with one entry per token.
+    Morphological bitmasks are those of the `FeatureExtractor` that built it.
+
+    Since some (stanza) tokens contain spaces, while the alignments index the words
+    of the sentence split at spaces, the features also map every such word to its
+    token.
+
+    Attributes:
+        text: the tokens, separated by spaces
+        tokens: text of every token
+        pos: part-of-speech id of every token (see `pos_id`)
+        is_stop: whether every token is a stop word
+        is_punct: whether every token is punctuation
+        morph_bits: bitmask of the `MORPH_FIELDS` values of every token
+        norm_ids: id of the normalized form of every token
+        dep_ids: id (see `string_id`) of the dependency label of every token, if
+            the sentence was parsed
+        heads: index of the syntactic head of every token, if the sentence was
+            parsed
+        word_ids: id of every word (spaCy's ORTH id of its text)
+        word_tokens: index of the token of every word
+    """
+
+    __slots__ = ("text", "_tokens", "_words", "_syntax")
+
+    def __init__(
+        self,
+        text: str,
+        tokens: np.ndarray,
+        words: Optional[np.ndarray] = None,
+        syntax: Optional[np.ndarray] = None,
+    ) -> None:
+        """
+        Args:
+            text: the tokens, separated by spaces
+            tokens: `TOKEN_DTYPE` array, where `end` is the end offset of each
+                token in `text`
+            words: `WORD_DTYPE` array, if some tokens contain spaces (otherwise
+                words are tokens)
+            syntax: `SYNTAX_DTYPE` array, if the sentence was parsed
+        """
+        self.text = text
+        self._tokens = tokens
+        self._words = words
+        self._syntax = syntax
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+    @property
+    def tokens(self) -> List[str]:
+        ends = self._tokens["end"].tolist()
+        starts = [0] + [end + 1 for end in ends[:-1]]
+        return [self.text[start:end] for start, end in zip(starts, ends)]
+
+    @property
+    def pos(self) -> np.ndarray:
+        return self._tokens["pos"]
+
+    @property
+    def is_stop(self) -> np.ndarray:
+        return self._tokens["is_stop"]
+
+    @property
+    def is_punct(self) -> np.ndarray:
+        return self._tokens["is_punct"]
+
+    @property
+    def morph_bits(self) -> np.ndarray:
+        return self._tokens["morph_bits"]
+
+    @property
+    def norm_ids(self) -> np.ndarray:
+        return self._tokens["norm_id"]
+
+    @property
+    def dep_ids(self) -> np.ndarray:
+        if self._syntax is None:
+            raise ValueError("The sentence has no dependency parse")
+        return self._syntax["dep_id"]
+
+    @property
+    def heads(self) -> np.ndarray:
+        if self._syntax is None:
+            raise ValueError("The sentence has no dependency parse")
+        return self._syntax["head"]
+
+    @property
+    def word_ids(self) -> np.ndarray:
+        if self._words is None:
+            return self._tokens["orth"]
+        return self._words["word_id"]
+
+    @property
+    def word_tokens(self) -> np.ndarray:
+        if self._words is None:
+            return np.arange(len(self._tokens))
+        return self._words["token"]
+
+    def words(self, values: np.ndarray) -> np.ndarray:
+        """Maps the values of every token (e.g. `pos`) to its words."""
+        if self._words is None:
+            return values
+        return cast(np.ndarray, values[self._words["token"]])
+
+
+# cache of the ids of the words of every token (see `_word_ids`), by ORTH id
+_token_words: Dict[int, Tuple[int, ...]] = {}
+
+
+def _word_ids(
+    orths: List[int], strings: spacy.strings.StringStore
+) -> List[Tuple[int, ...]]:
+    """Ids of the words of every token, given their ORTH ids: the token itself,
+    unless it contains spaces."""
+    words: List[Optional[Tuple[int, ...]]] = list(map(_token_words.get, orths))
+    if None not in words:
+        return cast(List[Tuple[int, ...]], words)
+    if len(_token_words) > 2**20:
+        _token_words.clear()
+    for i, orth in enumerate(orths):
+        if words[i] is None:
+            text = strings[orth]
+            # same ids as ORTH (the hash of the string)
+            words[i] = _token_words[orth] = (
+                tuple(strings[word] for word in text.split(" "))
+                if " " in text
+                else (orth,)
+            )
+    return cast(List[Tuple[int, ...]], words)
+
+
+class FeatureExtractor:
+    """Extracts the `SentenceFeatures` of parsed sentences, identifying the
+    normalized forms of their tokens (as given by `normalize`) by `string_id`, and
+    assigning a bit to each value of their `MORPH_FIELDS`."""
+
+    def __init__(self, normalize: Callable[[str], str]) -> None:
+        self.normalize = normalize
+        # caches of the normalized form of every ORTH id, of the morphological
+        # bitmask of every MORPH id and of the `string_id` of every DEP id. Their
+        # values don't depend on the order in which tokens are seen, so they can be
+        # cleared without invalidating extracted features
+        self._orth_norms: Dict[int, int] = {}
+        self._morph_masks: Dict[int, int] = {}
+        self._dep_ids: Dict[int, int] = {}
+        # bit of every "Field=value", bounded by the 64 bits of the masks
+        self._morph_bits: Dict[str, int] = {}
+
+    def norm_id(self, text: str) -> int:
+        """Id of the normalized form of a token."""
+        return string_id(self.normalize(text))
+
+    def morph_mask(self, field: str, values: Iterable[str]) -> int:
+        """Bitmask of a set of values of a morphological field (one of
+        `MORPH_FIELDS`, e.g. `Tense`), as in `SentenceFeatures.morph_bits`."""
+        mask = 0
+        for value in values:
+            key = f"{field}={value}"
+            if key not in self._morph_bits:
+                if len(self._morph_bits) == 64:
+                    raise ValueError(
+                        "Too many distinct morphological values to fit in 64 bits"
+                    )
+                self._morph_bits[key] = len(self._morph_bits)
+            mask |= 1 << self._morph_bits[key]
+        return mask
+
+    def _morph_mask(self, morph: str) -> int:
+        # morphological analyses are "Field=value1,value2|Field=..."
+        mask = 0
+        for feature in morph.split("|"):
+            field, _, values = feature.partition("=")
+            if field in MORPH_FIELDS:
+                mask |= self.morph_mask(field, values.split(","))
+        return mask
+
+    def __call__(self, doc: spacy.tokens.doc.Doc) -> SentenceFeatures:
+        strings = doc.vocab.strings
+        attrs = doc.to_array(["ORTH", "POS", "MORPH", "IS_STOP", "IS_PUNCT"])
+        orths = attrs[:, 0].tolist()
+        morphs = attrs[:, 2].tolist()
+        tokens = [strings[orth] for orth in orths]
+
+        norms: List[Optional[int]] = list(map(self._orth_norms.get, orths))
+        if None in norms:
+            if len(self._orth_norms) > 2**20:
+                self._orth_norms.clear()
+            for i, orth in enumerate(orths):
+                if norms[i] is None:
+                    norms[i] = self._orth_norms[orth] = self.norm_id(tokens[i])
+        masks: List[Optional[int]] = list(map(self._morph_masks.get, morphs))
+        if None in masks:
+            if len(self._morph_masks) > 2**20:
+                self._morph_masks.clear()
+            for i, morph in enumerate(morphs):
+                if masks[i] is None:
+                    masks[i] = self._morph_masks[morph] = self._morph_mask(
+                        strings[morph]
+                    )
+
+        sent_tokens = np.empty(len(orths), dtype=TOKEN_DTYPE)
+        sent_tokens["orth"] = attrs[:, 0]
+        sent_tokens["morph_bits"] = masks
+        sent_tokens["norm_id"] = norms
+        sent_tokens["end"] = np.cumsum([len(token) + 1 for token in tokens]) - 1
+        sent_tokens["pos"] = attrs[:, 1]
+        sent_tokens["is_stop"] = attrs[:, 3]
+        sent_tokens["is_punct"] = attrs[:, 4]
+
+        words = _word_ids(orths, strings)
+        sent_words = None
+        if sum(map(len, words)) != len(words):
+            sent_words = np.empty(sum(map(len, words)), dtype=WORD_DTYPE)
+            sent_words["word_id"] = [
+                word for token_words in words for word in token_words
+            ]
+            sent_words["token"] = np.repeat(
+                np.arange(len(orths)), list(map(len, words))
+            )
+        sent_syntax = None
+        # only parsed when the dependency parser is in the pipeline
+        if doc.has_annotation("DEP"):
+            sent_syntax = np.empty(len(orths), dtype=SYNTAX_DTYPE)
+            syntax = doc.to_array(["HEAD", "DEP"])
+            sent_syntax["dep_id"] = self._dep_string_ids(syntax[:, 1].tolist(), strings)
+            # heads are offsets from the token (negative ones wrapped around)
+            sent_syntax["head"] = syntax[:, 0].astype(np.int64) + np.arange(len(orths))
+        return SentenceFeatures(" ".join(tokens), sent_tokens, sent_words, sent_syntax)
+
+    def _dep_string_ids(
+        self, deps: List[int], strings: spacy.strings.StringStore
+    ) -> List[int]:
+        """`string_id`s of dependency labels, given their DEP ids."""
+        ids: List[Optional[int]] = list(map(self._dep_ids.get, deps))
+        if None in ids:
+            if len(self._dep_ids) > 2**20:
+                self._dep_ids.clear()
+            for i, dep in enumerate(deps):
+                if ids[i] is None:
+                    ids[i] = self._dep_ids[dep] = string_id(strings[dep])
+        return cast(List[int], ids)
@@ -0,0 +1,121 @@
+"""
+Incremental tagging: the tags of every document are cached, keyed by a hash of the
+document's source and target sentences (and of the tagging configuration), so that
+a later run only tags the documents whose input changed, e.g. the hypotheses of a
+new checkpoint that differ from the previous one.
+"""
+
+import json
+import sys
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from muda.cache import SqliteStore, hash_key
+from muda.parallel import TaggedDoc, doc_spans
+from muda.tagger import Tagging
+
+TagFn = Callable[[List[str], List[List[str]], List[int]], List[List[TaggedDoc]]]
+
+
+class TagsCache:
+    """On-disk cache of the tags of individual documents.
+
+    Args:
+        path: SQLite file of the cache
+        fingerprint: identifies the tagging configuration (language, phenomena,
+            models...), since the same input can get different tags otherwise
+        max_size_mb: maximum size of the cache, evicting the least recently used
+            documents when exceeded
+    """
+
+    def __init__(
+        self, path: str, fingerprint: str, max_size_mb: Optional[int] = None
+    ) -> None:
+        self.store = SqliteStore(
+            path, max_size=max_size_mb * 2**20 if max_size_mb is not None else None
+        )
+        self.fingerprint = fingerprint
+
+    def key(self, srcs: Sequence[str], tgts: Sequence[str]) -> str:
+        return hash_key(self.fingerprint, *srcs, *tgts)
+
+    @staticmethod
+    def encode(doc: TaggedDoc) -> bytes:
+        return json.dumps(
+            [[[t.token, t.tags] for t in sent] for sent in doc], ensure_ascii=False
+        ).encode("utf-8")
+
+    @staticmethod
+    def decode(value: bytes) -> TaggedDoc:
+        return [
+            [Tagging(token=token, tags=tags) for token, tags in sent]
+            for sent in json.loads(value.decode("utf-8"))
+        ]
+
+
+def tag_incremental(
+    cache: TagsCache,
+    tag_fn: TagFn,
+    srcs: List[str],
+    tgt_sets: List[List[str]],
+    docids: List[int],
+) -> List[List[TaggedDoc]]:
+    """Same as `tag_fn` (e.g. `tag_corpus` with a bound tagger), but reusing the
+    cached tags of unchanged documents and only tagging the others.
+
+    Returns:
+        for every target set, the list of tagged documents
+    """
+    spans = doc_spans(docids)
+    keys = [[cache.key(srcs[s:e], tgts[s:e]) for s, e in spans] for tgts in tgt_sets]
+    cached = cache.store.get_many({key for set_keys in keys for key in set_keys})
+    tagged: List[List[Optional[TaggedDoc]]] = [
+        [cache.decode(cached[key]) if key in cached else None for key in set_keys]
+        for set_keys in keys
+    ]
+
+    # group the documents by the target sets they need to be tagged for, so that
+    # the source side of every document is preprocessed at most once
+    groups: Dict[Tuple[int, ...], List[int]] = {}
+    pending = set()
+    duplicates = []
+    for d in range(len(spans)):
+        to_tag = []
+        for k in range(len(tgt_sets)):
+            if tagged[k][d] is not None:
+                continue
+            # identical documents (e.g. a hypothesis equal to the reference)
+            # only need to be tagged once
+            if keys[k][d] in pending:
+                duplicates.append((k, d))
+            else:
+                pending.add(keys[k][d])
+                to_tag.append(k)
+        if to_tag:
+            groups.setdefault(tuple(to_tag), []).append(d)
+
+    new_entries = {}
+    for missing, docs in groups.items():
+        lines = [(d, i) for d in docs for i in range(*spans[d])]
+        group_tagged = tag_fn(
+            [srcs[i] for _, i in lines],
+            [[tgt_sets[k][i] for _, i in lines] for k in missing],
+            # the documents of a group are not contiguous in the corpus, so we use
+            # the document index as docid to keep neighbours apart
+            [d for d, _ in lines],
+        )
+        for k, set_tagged in zip(missing, group_tagged):
+            assert len(set_tagged) == len(docs)
+            for d, tagged_doc in zip(docs, set_tagged):
+                tagged[k][d] = tagged_doc
+                new_entries[keys[k][d]] = cache.encode(tagged_doc)
+    cache.store.put_many(new_entries)
+    for k, d in duplicates:
+        tagged[k][d] = cache.decode(new_entries[keys[k][d]])
+
+    num_tagged = sum(len(missing) * len(docs) for missing, docs in groups.items())
+    print(
+        f"incremental: tagged {num_tagged} of {len(spans) * len(tgt_sets)} documents, "
+        "reused the others",
+        file=sys.stderr,
+    )
+    return [[doc for doc in set_tagged if doc is not None] for set_tagged in tagged]
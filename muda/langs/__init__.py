@@ -1,10 +1,14 @@
-from typing import Type, Dict, Any, Callable
+from typing import Type, Dict, Any, Callable, Iterator, Tuple
+import ast
 import importlib
 import os
 
 from muda.tagger import Tagger
 
 TAGGER_REGISTRY: Dict[str, Type[Tagger]] = {}
+# maps every available tagger to the module that registers it, which is only
+# imported when the tagger is created (see `create_tagger`)
+AVAILABLE_TAGGERS: Dict[str, str] = {}
 
 
 def register_tagger(tagger_name: str) -> Callable[[Type[Tagger]], None]:
@@ -23,7 +27,7 @@ def register_tagger(tagger_name: str) -> Callable[[Type[Tagger]], None]:
     return register_tagger_cls
 
 
-def import_taggers(langdir: str, namespace: str) -> None:
+def _tagger_modules(langdir: str) -> Iterator[Tuple[str, str]]:
     for file in os.listdir(langdir):
         path = os.path.join(langdir, file)
         if (
@@ -32,15 +36,36 @@ def import_taggers(langdir: str, namespace: str) -> None:
             and (file.endswith(".py") or os.path.isdir(path))
         ):
             tagger_name = file[: file.find(".py")] if file.endswith(".py") else file
-            importlib.import_module(namespace + "." + tagger_name)
+            yield tagger_name, path
+
+
+def scan_taggers(langdir: str, namespace: str) -> None:
+    """Finds the taggers registered (with `@register_tagger`) by the modules in
+    `langdir`, without importing them."""
+    for module_name, path in _tagger_modules(langdir):
+        if os.path.isdir(path):
+            path = os.path.join(path, "__init__.py")
+        with open(path, "r", encoding="utf-8") as f:
+            tree = ast.parse(f.read(), filename=path)
+        for node in ast.walk(tree):
+            if (
+                isinstance(node, ast.Call)
+                and isinstance(node.func, ast.Name)
+                and node.func.id == "register_tagger"
+                and node.args
+            ):
+                tagger_name = ast.literal_eval(node.args[0]).lower()
+                AVAILABLE_TAGGERS[tagger_name] = namespace + "." + module_name
 
 
 def create_tagger(langcode: str, **kwargs: Any) -> Tagger:
     # standardize tagger name by langcode
     tagger_name = f"{langcode}_tagger"
+    if tagger_name not in TAGGER_REGISTRY:
+        importlib.import_module(AVAILABLE_TAGGERS[tagger_name])
     tagger = TAGGER_REGISTRY[tagger_name](**kwargs)
     return tagger
 
 
 langdir = os.path.dirname(__file__)
-import_taggers(langdir, __name__)
+scan_taggers(langdir, __name__)
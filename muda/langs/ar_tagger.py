@@ -1,5 +1,4 @@
 from typing import Any
-import spacy_stanza  # type: ignore
 
 from muda import Tagger
 
@@ -30,6 +29,4 @@ class ArabicTagger(Tagger):
             "they": ["هم", "هن", "هما"],
             "them": ["هم", "هن", "هما"],
         }
-        self.tgt_pipeline = spacy_stanza.load_pipeline(
-            "ar", processors="tokenize,pos,lemma,depparse"
-        )
+        self.tgt_lang = "ar"
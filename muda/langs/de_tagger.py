@@ -1,5 +1,4 @@
 from typing import Any
-import spacy_stanza  # type: ignore
 
 from muda import Tagger
 
@@ -23,6 +22,4 @@ class GermanTagger(Tagger):
         # self.ambiguous_verbform = ["Pqp", "Imp", "Fut"]
 
         self.stop_words = STOP_WORDS
-        self.tgt_pipeline = spacy_stanza.load_pipeline(
-            "de", processors="tokenize,pos,lemma,depparse"
-        )
+        self.tgt_lang = "de"
@@ -1,6 +1,4 @@
-from typing import Any, List, Dict, Set
-import spacy
-import spacy_stanza  # type: ignore
+from typing import Any
 
 from muda import Tagger
 
@@ -32,47 +30,6 @@ class SpanishTagger(Tagger):
 
         self.stop_words = STOP_WORDS
         # self.tgt_pipeline = spacy.load("es_core_news_sm")
-        self.tgt_pipeline = spacy_stanza.load_pipeline(
-            "es", processors="tokenize,pos,lemma,depparse"
-        )
+        self.tgt_lang = "es"
 
-    def _verb_formality(
-        self,
-        src_sent: spacy.tokens.doc.Doc,
-        tgt_sent: spacy.tokens.doc.Doc,
-        align_sent: Dict[int, int],
-        prev_formality: Set[str],
-    ) -> List[bool]:
-        # TODO: this still needs to be refactored/verified
-        raise NotImplementedError()
-        # tags = [False] * len(tgt_sent)
-        # align = {
-        #     self._normalize(cur_src[s]): self._normalize(cur_tgt[t])
-        #     for s, t in cur_align.items()
-        # }
-        # you_verbs = []
-        # for tok in src_sent:
-        #     if self._normalize(tok.text) == "you" and tok.dep_ == "nsubj":
-        #         you_verbs.append(self._normalize(tok.head.text))
-        # you_verbs = list(map(lambda x: align.get(x), you_verbs))
-
-        # for i, tok in enumerate(tgt_sent):
-        #     if self._normalize(tok.text) in you_verbs:
-        #         person = tok.morph.get("Person")
-        #         if "2" in person:
-        #             if "2" in prev_formality:
-        #                 try:
-        #                     tags[i] = True
-        #                 except IndexError:
-        #                     pass
-        #             else:
-        #                 prev_formality.add("2")
-        #         elif "3" in person:
-        #             if "3" in prev_formality:
-        #                 try:
-        #                     tags[i] = True
-        #                 except IndexError:
-        #                     pass
-        #             else:
-        #                 prev_formality.add("3")
-        # return tags
+    # TODO: implement `_verb_formality` (see `Tagger._verb_formality`)
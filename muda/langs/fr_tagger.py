@@ -1,5 +1,4 @@
 from typing import Any
-import spacy_stanza  # type: ignore
 
 from muda import Tagger
 
@@ -43,6 +42,4 @@ class FrenchTagger(Tagger):
 
         self.stop_words = STOP_WORDS
         # self.tgt_pipeline = spacy.load("fr_core_news_sm")
-        self.tgt_pipeline = spacy_stanza.load_pipeline(
-            "fr", processors="tokenize,pos,lemma,depparse"
-        )
+        self.tgt_lang = "fr"
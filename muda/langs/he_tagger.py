@@ -1,5 +1,4 @@
 from typing import Any
-import spacy_stanza  # type: ignore
 
 from muda import Tagger
 
@@ -16,6 +15,4 @@ class HebrewTagger(Tagger):
 
         self.stop_words = STOP_WORDS
         self.ambiguous_verbform = ["Pqp", "Imp", "Fut"]
-        self.tgt_pipeline = spacy_stanza.load_pipeline(
-            "he", processors="tokenize,pos,lemma,depparse"
-        )
+        self.tgt_lang = "he"
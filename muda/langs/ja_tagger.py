@@ -1,5 +1,4 @@
 from typing import Any
-import spacy_stanza  # type: ignore
 
 from muda import Tagger
 
@@ -36,6 +35,4 @@ class JapaneseTagger(Tagger):
             "i": ["私", "僕", "俺"],
         }
         # self.tgt_pipeline = spacy.load("ja_core_news_sm")
-        self.tgt_pipeline = spacy_stanza.load_pipeline(
-            "ja", processors="tokenize,pos,lemma,depparse"
-        )
+        self.tgt_lang = "ja"
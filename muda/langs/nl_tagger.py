@@ -1,5 +1,4 @@
 from typing import Any
-import spacy_stanza  # type: ignore
 
 from muda import Tagger
 
@@ -20,6 +19,4 @@ class DutchTagger(Tagger):
         self.ambiguous_verbform = ["Past"]
         self.stop_words = STOP_WORDS
         # self.tgt_pipeline = spacy.load("nl_core_news_sm")
-        self.tgt_pipeline = spacy_stanza.load_pipeline(
-            "nl", processors="tokenize,pos,lemma,depparse"
-        )
+        self.tgt_lang = "nl"
@@ -1,5 +1,4 @@
 from typing import Any
-import spacy_stanza  # type: ignore
 
 from muda import Tagger
 
@@ -32,6 +31,4 @@ class PortugueseTagger(Tagger):
         self.ambiguous_verbform = ["Pqp"]
 
         # self.tgt_pipeline = spacy.load("pt_core_news_sm")
-        self.tgt_pipeline = spacy_stanza.load_pipeline(
-            "pt", processors="tokenize,pos,lemma,depparse"
-        )
+        self.tgt_lang = "pt"
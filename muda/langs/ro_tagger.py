@@ -1,5 +1,4 @@
 from typing import Any
-import spacy_stanza  # type: ignore
 
 from muda import Tagger
 
@@ -45,6 +44,4 @@ class RomanianTagger(Tagger):
         self.ambiguous_verbform = ["Past", "Imp", "Fut"]
         self.stop_words = STOP_WORDS
         # self.tgt_pipeline = spacy.load("ro_core_news_sm")
-        self.tgt_pipeline = spacy_stanza.load_pipeline(
-            "ro", processors="tokenize,pos,lemma,depparse"
-        )
+        self.tgt_lang = "ro"
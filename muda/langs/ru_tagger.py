@@ -1,5 +1,4 @@
 from typing import Any
-import spacy_stanza  # type: ignore
 
 from muda import Tagger
 
@@ -19,6 +18,4 @@ class RussianTagger(Tagger):
         self.stop_words = STOP_WORDS
         self.ambiguous_verbform = ["Past"]
         # self.tgt_pipeline = spacy.load("ru_core_web_sm")
-        self.tgt_pipeline = spacy_stanza.load_pipeline(
-            "ru", processors="tokenize,pos,lemma,depparse"
-        )
+        self.tgt_lang = "ru"
@@ -1,5 +1,4 @@
 from typing import Any
-import spacy_stanza  # type: ignore
 
 from muda import Tagger
 
@@ -19,6 +18,4 @@ class TurkishTagger(Tagger):
         self.ambiguous_verbform = ["Pqp"]
 
         self.stop_words = STOP_WORDS
-        self.tgt_pipeline = spacy_stanza.load_pipeline(
-            "tr", processors="tokenize,pos,lemma,depparse"
-        )
+        self.tgt_lang = "tr"
@@ -1,5 +1,4 @@
 from typing import Any
-import spacy_stanza  # type: ignore
 
 from muda import Tagger
 
@@ -20,6 +19,4 @@ class ChineseTagger(Tagger):
             "v_class": {"您"},
         }
         # self.tgt_pipeline = spacy.load("zh_core_web_sm")
-        self.tgt_pipeline = spacy_stanza.load_pipeline(
-            "zh", processors="tokenize,pos,lemma,depparse"
-        )
+        self.tgt_lang = "zh"
@@ -1,5 +1,4 @@
 from typing import Any
-import spacy_stanza  # type: ignore
 
 from muda import Tagger
 
@@ -14,6 +13,4 @@ class TaiwaneseTagger(Tagger):
         from spacy.lang.zh.stop_words import STOP_WORDS
 
         self.stop_words = STOP_WORDS
-        self.tgt_pipeline = spacy_stanza.load_pipeline(
-            "zh", processors="tokenize,pos,lemma,depparse"
-        )
+        self.tgt_lang = "zh"
@@ -1,11 +1,98 @@
 import argparse
+import contextlib
+import functools
 import json
-from typing import Dict, Any, Callable
+from typing import Dict, Any, Callable, List
 
 import os
 
-from muda.langs import TAGGER_REGISTRY, create_tagger
-from muda.metrics import compute_metrics
+import numpy as np
+
+from muda import profiling
+from muda.checkpoint import RunDir, tag_resumable
+from muda.incremental import TagFn, TagsCache, tag_incremental
+from muda.langs import AVAILABLE_TAGGERS, create_tagger
+from muda.metrics import (
+    TagCounts,
+    TagEncoder,
+    count_matches,
+    count_matches_arrays,
+    metrics_from_counts,
+)
+from muda.parallel import WorkerPool, doc_spans, tag_corpus
+from muda.sharding import parse_shard, select_shard, write_shard_info
+from muda.significance import document_stats, paired_bootstrap, print_bootstrap
+from muda.streaming import document_windows, read_documents
+from muda.tagstore import write_dump
+
+
+def add_tagger_args(parser: argparse.ArgumentParser) -> None:
+    """Adds the arguments used to build taggers (see `build_tagger_kwargs`)."""
+    # aligner arguments
+    parser.add_argument(
+        "--awesome-align-model",
+        default="bert-base-multilingual-cased",
+        help="Awesome-align model to use. Default: bert-base-multilingual-cased",
+    )
+    parser.add_argument(
+        "--awesome-align-cachedir",
+        default=None,
+        help="Cache directory to save awesome-align models",
+    )
+    parser.add_argument(
+        "--awesome-align-batch-size",
+        default=32,
+        type=int,
+        help="Number of sentence pairs aligned per batch. Default: 32",
+    )
+    parser.add_argument(
+        "--align-cache",
+        default=None,
+        help="If set, caches alignments in this directory, to be reused across runs",
+    )
+    parser.add_argument(
+        "--align-cache-size",
+        default=1024,
+        type=int,
+        help="Maximum size (in MB) of the alignment cache. Default: 1024",
+    )
+
+    parser.add_argument(
+        "--coref-batch-size",
+        default=8,
+        type=int,
+        help="Number of sentences sent to the coreference model per batch. Default: 8",
+    )
+
+    parser.add_argument(
+        "--batch-tokens",
+        default=None,
+        type=int,
+        help="If set, caps the batches of the alignment and coreference models to "
+        "this number of (padded) tokens. Sentences are always batched by length. "
+        "Default: no cap",
+    )
+
+    parser.add_argument(
+        "--parse-cache",
+        default=None,
+        help="If set, caches parsed sentences in this directory, to be reused across runs",
+    )
+    parser.add_argument(
+        "--parse-cache-size",
+        default=4096,
+        type=int,
+        help="Maximum size (in MB) of the parse cache. Least recently used parses "
+        "are evicted when it is exceeded. Default: 4096",
+    )
+
+    parser.add_argument(
+        "--cohesion-threshold",
+        default=3,
+        type=int,
+        help="Threshold for number of (previous) occurances to be considered lexical cohesion."
+        "Default: 3",
+    )
 
 
 def parse_args() -> Dict[str, Any]:
@@ -23,10 +110,17 @@ def parse_args() -> Dict[str, Any]:
     parser.add_argument(
         "--tgt-lang",
         required=True,
-        choices=[x.replace("_tagger", "") for x in TAGGER_REGISTRY.keys()],
+        choices=[x.replace("_tagger", "") for x in sorted(AVAILABLE_TAGGERS.keys())],
         help="Target language. Used to select the correct tagger.",
     )
     parser.add_argument("--max-ctx-size", type=int, default=None)
+    parser.add_argument(
+        "--workers",
+        default=1,
+        type=int,
+        help="Number of processes to tag with. Documents are split across processes, "
+        "each loading its own models. Default: 1",
+    )
     parser.add_argument(
         "--phenomena",
         nargs="+",
@@ -36,29 +130,103 @@ def parse_args() -> Dict[str, Any]:
     parser.add_argument(
         "--dump-tags",
         required=True,  # This might change when MuDA has other functionalities
-        help="If set, dumps the tags to the specified file.",
+        help="If set, dumps the tags to the specified file. Tags are written as JSON, "
+        "or in a compact columnar format if the file name ends with `.npz` "
+        "(see muda/tagstore.py).",
     )
 
-    # aligner arguments
     parser.add_argument(
-        "--awesome-align-model",
-        default="bert-base-multilingual-cased",
-        help="Awesome-align model to use. Default: bert-base-multilingual-cased",
+        "--stream",
+        action="store_true",
+        help="Process the corpus in windows of documents, writing the tags of each "
+        "document as soon as they are computed (as JSON lines). Memory usage "
+        "depends on the window size rather than on the corpus size.",
     )
     parser.add_argument(
-        "--awesome-align-cachedir",
+        "--window-size",
+        default=100,
+        type=int,
+        help="Number of documents per window in streaming mode. Default: 100",
+    )
+
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Caches the tags of every document next to the --dump-tags file, and "
+        "only tags the documents whose source or target changed since a previous run",
+    )
+    parser.add_argument(
+        "--incremental-cache-size",
+        default=1024,
+        type=int,
+        help="Maximum size (in MB) of the incremental cache. Default: 1024",
+    )
+
+    parser.add_argument(
+        "--bootstrap",
+        default=0,
+        type=int,
+        help="If set, also computes confidence intervals of the metrics of every "
+        "hypothesis set, and p-values of their pairwise differences in F1, with "
+        "this number of paired bootstrap resamples of the documents (e.g. 1000)",
+    )
+    parser.add_argument(
+        "--confidence",
+        default=0.95,
+        type=float,
+        help="Confidence level of the --bootstrap intervals. Default: 0.95",
+    )
+
+    parser.add_argument(
+        "--shard",
         default=None,
-        help="Cache directory to save awesome-align models",
+        help="If set (as i/N, with 0 <= i < N), only tags the i-th of N shards of the "
+        "documents, chosen by docid. Shards can be run on different machines and "
+        "combined with `python -m muda merge` (see muda/sharding.py)",
     )
 
     parser.add_argument(
-        "--cohesion-threshold",
-        default=3,
+        "--run-dir",
+        default=None,
+        help="If set, tags the corpus in shards of documents, committing the tags of "
+        "every shard to this directory as soon as they are computed, so that an "
+        "interrupted run can be resumed with --resume",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Resumes the run in --run-dir, skipping its completed shards",
+    )
+    parser.add_argument(
+        "--shard-size",
+        default=100,
         type=int,
-        help="Threshold for number of (previous) occurances to be considered lexical cohesion."
-        "Default: 3",
+        help="Number of documents per shard of --run-dir. Default: 100",
+    )
+
+    parser.add_argument(
+        "--profile",
+        default=None,
+        help="If set, records the time and number of items of each stage of the "
+        "pipeline, and writes them to this file as a JSON trace "
+        "(in the Chrome trace event format)",
+    )
+    parser.add_argument(
+        "--profile-prometheus",
+        default=None,
+        help="If set, also writes the profiled stages to this file in the "
+        "Prometheus text format (enables profiling)",
+    )
+    parser.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="Also records the memory allocated in each profiled stage, with "
+        "tracemalloc. This slows down the python code, but not the models, so the "
+        "times of stages aren't comparable in such runs (requires python >= 3.9)",
     )
 
+    add_tagger_args(parser)
+
     args = parser.parse_args()
 
     args_dict = vars(args)
@@ -74,7 +242,118 @@ def recursive_map(func: Callable[[Any], Any], obj: Any) -> Any:
         return func(obj)
 
 
+def build_tagger_kwargs(args: Dict[str, Any]) -> Dict[str, Any]:
+    if (
+        args.get("awesome_align_cachedir") is None
+        and os.environ.get("AWESOME_CACHEDIR") is not None
+    ):
+        args["awesome_align_cachedir"] = os.environ.get("AWESOME_CACHEDIR")
+
+    return dict(
+        align_model=args["awesome_align_model"],
+        align_cachedir=args.get("awesome_align_cachedir"),
+        align_batch_size=args.get("awesome_align_batch_size", 32),
+        align_cache=args.get("align_cache"),
+        align_cache_size=args.get("align_cache_size"),
+        coref_batch_size=args.get("coref_batch_size", 8),
+        batch_tokens=args.get("batch_tokens"),
+        parse_cache=args.get("parse_cache"),
+        parse_cache_size=args.get("parse_cache_size"),
+        cohesion_threshold=args["cohesion_threshold"],
+    )
+
+
+def tagging_fingerprint(args: Dict[str, Any], tagger_kwargs: Dict[str, Any]) -> str:
+    """Identifies the configuration the tags depend on: the language, the phenomena
+    and the tagger configuration."""
+    return json.dumps(
+        [
+            args["tgt_lang"],
+            args["phenomena"],
+            tagger_kwargs["align_model"],
+            tagger_kwargs["cohesion_threshold"],
+        ]
+    )
+
+
+def build_tag_fn(
+    args: Dict[str, Any], tagger_kwargs: Dict[str, Any], stack: contextlib.ExitStack
+) -> TagFn:
+    """Returns a function tagging sets of target sentences against their source
+    (see `tag_corpus`), according to the command-line arguments. Worker processes
+    are closed along with `stack`."""
+    tag_fn: TagFn
+    if args.get("workers", 1) > 1:
+        pool = stack.enter_context(
+            WorkerPool(args["tgt_lang"], tagger_kwargs, args["workers"])
+        )
+        tag_fn = functools.partial(pool.tag, phenomena=args["phenomena"])
+    else:
+        tagger = create_tagger(args["tgt_lang"], **tagger_kwargs)
+        tag_fn = functools.partial(tag_corpus, tagger, phenomena=args["phenomena"])
+
+    if args.get("incremental"):
+        cache = TagsCache(
+            f"{args['dump_tags']}.incremental",
+            tagging_fingerprint(args, tagger_kwargs),
+            max_size_mb=args.get("incremental_cache_size"),
+        )
+        tag_fn = functools.partial(tag_incremental, cache, tag_fn)
+
+    if args.get("run_dir"):
+        run_dir = RunDir(
+            args["run_dir"],
+            tagging_fingerprint(args, tagger_kwargs),
+            tag_names=args["phenomena"],
+            shard_size=args.get("shard_size", 100),
+            resume=args.get("resume", False),
+        )
+        tag_fn = functools.partial(tag_resumable, run_dir, tag_fn)
+    elif args.get("resume"):
+        raise ValueError("--resume requires a --run-dir")
+    return tag_fn
+
+
+def hyps_names(hyps: List[str]) -> List[str]:
+    """Names of the hypothesis sets in the output, from their files."""
+    return [f"Hypothesis Set {k}: {path}" for k, path in enumerate(hyps, 1)]
+
+
+def print_metrics(
+    tag_prec: Dict[str, float],
+    tag_rec: Dict[str, float],
+    tag_f1: Dict[str, float],
+    name: str = "Hypothesis Set 1",
+) -> None:
+    print(f"-- {name} --")
+    for tag in tag_f1:
+        print(
+            f"{tag} -- Prec: {tag_prec[tag]:.2f} Rec: {tag_rec[tag]:.2f} F1: {tag_f1[tag]:.2f}"
+        )
+    print()
+
+
 def main(args: Dict[str, Any]) -> None:
+    profiler = None
+    if args.get("profile") or args.get("profile_prometheus"):
+        profiler = profiling.enable(trace_allocations=args.get("profile_memory", False))
+    try:
+        if args.get("stream"):
+            main_stream(args)
+        else:
+            main_corpus(args)
+    finally:
+        if profiler is not None:
+            profiling.disable()
+            profiler.print_summary()
+            if args.get("profile"):
+                profiler.write_trace(args["profile"])
+            if args.get("profile_prometheus"):
+                profiler.write_prometheus(args["profile_prometheus"])
+
+
+def main_corpus(args: Dict[str, Any]) -> None:
+    """Tags (and scores) the whole corpus at once."""
     with open(args["src"], "r", encoding="utf-8") as src_f:
         srcs = [line.strip() for line in src_f]
     with open(args["tgt"], "r", encoding="utf-8") as tgt_f:
@@ -88,49 +367,118 @@ def main(args: Dict[str, Any]) -> None:
             hyps = [line.strip() for line in hyps_f]
         all_hyps.append(hyps)
 
-    if (
-        args.get("awesome_align_cachedir") is None
-        and os.environ.get("AWESOME_CACHEDIR") is not None
-    ):
-        args["awesome_align_cachedir"] = os.environ.get("AWESOME_CACHEDIR")
+    if args.get("shard"):
+        if args.get("bootstrap"):
+            raise ValueError("--bootstrap can't be used with --shard")
+        shard, num_shards = parse_shard(args["shard"])
+        spans = doc_spans(docids)
+        num_docs = len(spans)
+        shard_docs, lines = select_shard(docids, shard, num_shards)
+        srcs = [srcs[i] for i in lines]
+        tgts = [tgts[i] for i in lines]
+        # documents in a shard are not contiguous in the corpus anymore, and two of
+        # them may have the same docid, so we use the document index as docid
+        docids = [d for d in shard_docs for _ in range(*spans[d])]
+        all_hyps = [[hyps[i] for i in lines] for hyps in all_hyps]
 
-    tagger = create_tagger(
-        args["tgt_lang"],
-        align_model=args["awesome_align_model"],
-        align_cachedir=args.get("awesome_align_cachedir"),
-        cohesion_threshold=args["cohesion_threshold"],
-    )
+    # the source side is the same for the reference and all hypotheses,
+    # so they are tagged together
+    with contextlib.ExitStack() as stack:
+        tag_fn = build_tag_fn(args, build_tagger_kwargs(args), stack)
+        tagged_refs, *all_tagged_hyps = tag_fn(srcs, [tgts, *all_hyps], docids)
+
+    all_counts = []
+    if all_tagged_hyps:
+        # compare f1 for each tag, encoding the reference only once
+        encoder = TagEncoder(args["phenomena"])
+        ref_arrays = encoder.encode(tagged_refs)
+        for name, tagged_hyps in zip(hyps_names(args["hyps"]), all_tagged_hyps):
+            with profiling.stage("metrics", items=len(tagged_hyps)):
+                hyp_arrays = encoder.encode(tagged_hyps)
+                counts = count_matches_arrays(
+                    ref_arrays, hyp_arrays, list(encoder.tag_bits)
+                )
+            all_counts.append(counts)
+            print_metrics(*metrics_from_counts(counts), name=name)
+
+        if args.get("bootstrap"):
+            with profiling.stage("bootstrap", items=len(tagged_refs)):
+                stats = document_stats(tagged_refs, all_tagged_hyps, args["phenomena"])
+                print_bootstrap(
+                    paired_bootstrap(
+                        stats,
+                        args["phenomena"],
+                        num_samples=args["bootstrap"],
+                        confidence=args.get("confidence", 0.95),
+                    ),
+                    hyps_names(args["hyps"]),
+                )
 
-    preproc = tagger.preprocess(srcs, tgts, docids)
+    if args["dump_tags"]:
+        with profiling.stage("dump", items=len(tagged_refs)):
+            write_dump(args["dump_tags"], tagged_refs, tag_names=args["phenomena"])
+        if args.get("shard"):
+            write_shard_info(
+                args["dump_tags"],
+                shard,
+                num_shards,
+                num_docs,
+                shard_docs,
+                args["phenomena"],
+                args["hyps"],
+                all_counts,
+            )
 
-    tagged_refs = []
-    for doc in zip(*preproc):
-        tagged_doc = tagger.tag(*doc, phenomena=args["phenomena"])
-        tagged_refs.append(tagged_doc)
 
-    all_tagged_hyps = []
-    for hyps in all_hyps:
-        preproc = tagger.preprocess(srcs, hyps, docids)
-        tagged_hyps = []
-        for doc in zip(*preproc):
-            tagged_doc = tagger.tag(*doc, phenomena=args["phenomena"])
-            tagged_hyps.append(tagged_doc)
-        all_tagged_hyps.append(tagged_hyps)
+def main_stream(args: Dict[str, Any]) -> None:
+    """Streaming version of `main`: the input files are read in windows of
+    complete documents, and the tags of each document are written to the (JSONL)
+    dump as soon as they are computed, so memory doesn't grow with the corpus."""
+    if args.get("workers", 1) > 1:
+        raise ValueError("--stream can't be used with multiple --workers")
+    if args["dump_tags"].endswith(".npz"):
+        raise ValueError("--stream writes JSON lines, and can't dump tags to .npz")
+    if args.get("run_dir") or args.get("shard"):
+        raise ValueError("--stream can't be used with --run-dir or --shard")
 
-    if all_tagged_hyps:
-        # compare f1 for each tag
-        for tagged_hyps in all_tagged_hyps:
-            tag_prec, tag_rec, tag_f1 = compute_metrics(tagged_refs, tagged_hyps)
-            print("-- Hypothesis Set 1 --")
-            for tag in tag_f1:
-                print(
-                    f"{tag} -- Prec: {tag_prec[tag]:.2f} Rec: {tag_rec[tag]:.2f} F1: {tag_f1[tag]:.2f}"
+    all_counts = [TagCounts.empty() for _ in args["hyps"]]
+    all_stats = []
+    docs = read_documents(args["src"], [args["tgt"], *args["hyps"]], args["docids"])
+    with contextlib.ExitStack() as stack:
+        tag_fn = build_tag_fn(args, build_tagger_kwargs(args), stack)
+        f = stack.enter_context(open(args["dump_tags"], "w", encoding="utf-8"))
+        for srcs, tgt_sets, docids in document_windows(docs, args["window_size"]):
+            tagged_refs, *all_tagged_hyps = tag_fn(srcs, tgt_sets, docids)
+            with profiling.stage("dump", items=len(tagged_refs)):
+                for tagged_doc in tagged_refs:
+                    f.write(
+                        json.dumps(recursive_map(lambda t: t._asdict(), tagged_doc))
+                    )
+                    f.write("\n")
+                f.flush()
+
+            for counts, tagged_hyps in zip(all_counts, all_tagged_hyps):
+                with profiling.stage("metrics", items=len(tagged_hyps)):
+                    count_matches(tagged_refs, tagged_hyps, counts)
+            if args.get("bootstrap") and all_tagged_hyps:
+                # per-document counts are small, so they are kept for the whole corpus
+                all_stats.append(
+                    document_stats(tagged_refs, all_tagged_hyps, args["phenomena"])
                 )
-            print()
 
-    if args["dump_tags"]:
-        with open(args["dump_tags"], "w", encoding="utf-8") as f:
-            json.dump(recursive_map(lambda t: t._asdict(), tagged_refs), f, indent=2)
+    for name, counts in zip(hyps_names(args["hyps"]), all_counts):
+        print_metrics(*metrics_from_counts(counts), name=name)
+    if all_stats:
+        with profiling.stage("bootstrap"):
+            print_bootstrap(
+                paired_bootstrap(
+                    np.concatenate(all_stats, axis=1),
+                    args["phenomena"],
+                    num_samples=args["bootstrap"],
+                    confidence=args.get("confidence", 0.95),
+                ),
+                hyps_names(args["hyps"]),
+            )
 
 
 if __name__ == "__main__":
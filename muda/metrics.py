@@ -1,59 +1,285 @@
-from typing import List, Dict, Tuple
+from typing import Iterable, List, Dict, NamedTuple, Optional, Tuple
 
 from collections import defaultdict
 from itertools import chain
 
+import numpy as np
+
 from muda.tagger import Tagger, Tagging
 
 
-def compute_metrics(
-    tagged_refs: List[List[List[Tagging]]], tagged_hyps: List[List[List[Tagging]]]
-) -> Tuple[Dict[str, float], Dict[str, float], Dict[str, float]]:
-    """Computes the accuracy, recall and f1 for each tag based if word tagged in the
-    reference/hypothesis exist and are also tagged in the hypothesis/reference.
+class TagCounts(NamedTuple):
+    """Raw per-tag match and total counts, from which the metrics are computed.
+    Unlike the metrics, counts from different parts of a corpus can be summed."""
 
-    Inspired by the compare-mt's LabelWordBucketer:
-    https://github.com/neulab/compare-mt/blob/master/compare_mt/bucketers.py"""
-    flatten_refs = chain.from_iterable(tagged_refs)
-    flatten_hyps = chain.from_iterable(tagged_hyps)
-
-    tagref_matches: Dict[str, int] = defaultdict(int)
-    tagref_total: Dict[str, int] = defaultdict(int)
-    taghyp_matches: Dict[str, int] = defaultdict(int)
-    taghyp_total: Dict[str, int] = defaultdict(int)
-
-    for tgt_sent, hyp_sent in zip(flatten_refs, flatten_hyps):
-        # get position of words in the reference
-        # and mark the tags that appear in the reference
-        ref_pos = defaultdict(list)
-        for i, tagging in enumerate(tgt_sent):
-            word = Tagger.normalize(tagging.token)
-            ref_pos[word].append(i)
-            for tag in tagging.tags:
-                tagref_total[tag] += 1
-
-        word_count: Dict[str, int] = defaultdict(int)
-        for i, tagging in enumerate(hyp_sent):
-            word = Tagger.normalize(tagging.token)
-            for tag in tagging.tags:
-                taghyp_total[tag] += 1
-
-            if word in ref_pos and word_count[word] < len(ref_pos[word]):
-                # mark intersection of tags in the reference and hypothesis
+    ref_matches: Dict[str, int]
+    ref_total: Dict[str, int]
+    hyp_matches: Dict[str, int]
+    hyp_total: Dict[str, int]
+
+    @classmethod
+    def empty(cls) -> "TagCounts":
+        return cls(
+            defaultdict(int), defaultdict(int), defaultdict(int), defaultdict(int)
+        )
+
+    def update(self, other: "TagCounts") -> None:
+        """Adds the counts of `other` to these counts (in-place)."""
+        for counts, other_counts in zip(self, other):
+            for tag, count in other_counts.items():
+                counts[tag] += count
+
+
+class TagArrays(NamedTuple):
+    """Columnar encoding of tagged documents: the (normalized) word id and the tag
+    bitmask of every token, and the offsets of each sentence in these arrays."""
+
+    word_ids: np.ndarray
+    tag_bits: np.ndarray
+    sent_offsets: np.ndarray
+
+
+class TagEncoder:
+    """Encodes tagged documents as `TagArrays`, sharing the word and tag ids
+    across all encoded documents (so that they can be compared)."""
+
+    def __init__(self, tag_names: Iterable[str] = ()) -> None:
+        self.word_ids: Dict[str, int] = {}
+        # cache of the normalized word id of every raw token
+        self.token_ids: Dict[str, int] = {}
+        self.tag_bits: Dict[str, int] = {}
+        for tag in tag_names:
+            self.tag_bit(tag)
+
+    def tag_bit(self, tag: str) -> int:
+        if tag not in self.tag_bits:
+            if len(self.tag_bits) == 64:
+                raise ValueError("Can't encode more than 64 different tags")
+            self.tag_bits[tag] = len(self.tag_bits)
+        return self.tag_bits[tag]
+
+    def token_id(self, token: str) -> int:
+        if token not in self.token_ids:
+            word = Tagger.normalize(token)
+            self.token_ids[token] = self.word_ids.setdefault(word, len(self.word_ids))
+        return self.token_ids[token]
+
+    def encode(self, tagged_docs: List[List[List[Tagging]]]) -> TagArrays:
+        word_ids = []
+        tag_bits = []
+        sent_offsets = [0]
+        for sent in chain.from_iterable(tagged_docs):
+            for tagging in sent:
+                word_ids.append(self.token_id(tagging.token))
+                bits = 0
                 for tag in tagging.tags:
-                    if tag in tgt_sent[ref_pos[word][word_count[word]]].tags:
-                        tagref_matches[tag] += 1
-                        taghyp_matches[tag] += 1
+                    bits |= 1 << self.tag_bit(tag)
+                tag_bits.append(bits)
+            sent_offsets.append(len(word_ids))
+        return TagArrays(
+            word_ids=np.array(word_ids, dtype=np.int64),
+            tag_bits=np.array(tag_bits, dtype=np.uint64),
+            sent_offsets=np.array(sent_offsets, dtype=np.int64),
+        )
+
+
+def _occurrence_ranks(sent_ids: np.ndarray, word_ids: np.ndarray) -> np.ndarray:
+    """For every token, the number of previous tokens with the same word in the same
+    sentence (i.e. the token is the n-th occurrence of the word in the sentence)."""
+    # lexsort is stable, so tokens of the same group keep their original order
+    order = np.lexsort((word_ids, sent_ids))
+    sorted_sents, sorted_words = sent_ids[order], word_ids[order]
+    new_group = np.ones(len(order), dtype=bool)
+    new_group[1:] = (sorted_sents[1:] != sorted_sents[:-1]) | (
+        sorted_words[1:] != sorted_words[:-1]
+    )
+    group_starts = np.maximum.accumulate(np.where(new_group, np.arange(len(order)), 0))
+    ranks = np.empty(len(order), dtype=np.int64)
+    ranks[order] = np.arange(len(order)) - group_starts
+    return ranks
+
+
+def _sent_ids(sent_offsets: np.ndarray, start: int, end: int) -> np.ndarray:
+    """Sentence index of every token of the sentences in [start, end)."""
+    return np.repeat(np.arange(start, end), np.diff(sent_offsets[start : end + 1]))
+
+
+def _match_sentences(
+    refs: TagArrays, hyps: TagArrays, start: int, end: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Matches the tokens of the sentences in [start, end): the n-th occurrence of a
+    word in a hypothesis sentence is matched with the n-th occurrence of the same
+    word in the reference sentence.
 
-            word_count[word] += 1
+    Returns:
+        the sentence index and tag bits of every reference and hypothesis token, and
+        of every matched pair of tokens (the tags they share)
+    """
+    ref_slice = slice(refs.sent_offsets[start], refs.sent_offsets[end])
+    hyp_slice = slice(hyps.sent_offsets[start], hyps.sent_offsets[end])
+    ref_sents = _sent_ids(refs.sent_offsets, start, end)
+    hyp_sents = _sent_ids(hyps.sent_offsets, start, end)
+    ref_words, hyp_words = refs.word_ids[ref_slice], hyps.word_ids[hyp_slice]
+    ref_bits, hyp_bits = refs.tag_bits[ref_slice], hyps.tag_bits[hyp_slice]
 
+    # pair tokens with the same (sentence, word, occurrence), which are unique
+    # on each side, by sorting them together: pairs end up next to each other
+    sents = np.concatenate([ref_sents, hyp_sents])
+    words = np.concatenate([ref_words, hyp_words])
+    ranks = np.concatenate(
+        [
+            _occurrence_ranks(ref_sents, ref_words),
+            _occurrence_ranks(hyp_sents, hyp_words),
+        ]
+    )
+    bits = np.concatenate([ref_bits, hyp_bits])
+    is_hyp = np.concatenate(
+        [np.zeros(len(ref_words), dtype=bool), np.ones(len(hyp_words), dtype=bool)]
+    )
+    order = np.lexsort((is_hyp, ranks, words, sents))
+    sents, words, ranks, bits = (
+        sents[order],
+        words[order],
+        ranks[order],
+        bits[order],
+    )
+    paired = (
+        (sents[1:] == sents[:-1])
+        & (words[1:] == words[:-1])
+        & (ranks[1:] == ranks[:-1])
+    )
+    matched_bits = bits[:-1][paired] & bits[1:][paired]
+    return ref_sents, ref_bits, hyp_sents, hyp_bits, sents[:-1][paired], matched_bits
+
+
+def count_matches_arrays(
+    refs: TagArrays,
+    hyps: TagArrays,
+    tag_names: List[str],
+    counts: Optional[TagCounts] = None,
+    batch_size: int = 10000,
+) -> TagCounts:
+    """Vectorized version of `count_matches`, working on encoded documents.
+
+    The n-th occurrence of a word in a hypothesis sentence is matched with the n-th
+    occurrence of the same word in the reference sentence, and the tags they share
+    count as matches. Sentences are processed in batches of `batch_size`.
+    """
+    if counts is None:
+        counts = TagCounts.empty()
+    tagref_matches, tagref_total, taghyp_matches, taghyp_total = counts
+    # as in `zip`, extra sentences in the reference or hypothesis are ignored
+    num_sents = min(len(refs.sent_offsets), len(hyps.sent_offsets)) - 1
+    tag_masks = [np.uint64(1 << bit) for bit in range(len(tag_names))]
+
+    for start in range(0, num_sents, batch_size):
+        end = min(start + batch_size, num_sents)
+        _, ref_bits, _, hyp_bits, _, matched_bits = _match_sentences(
+            refs, hyps, start, end
+        )
+        for tag, mask in zip(tag_names, tag_masks):
+            ref_count = int(np.count_nonzero(ref_bits & mask))
+            hyp_count = int(np.count_nonzero(hyp_bits & mask))
+            matches = int(np.count_nonzero(matched_bits & mask))
+            # only tags that appear are added, as in `count_matches`
+            if ref_count:
+                tagref_total[tag] += ref_count
+            if hyp_count:
+                taghyp_total[tag] += hyp_count
+            if matches:
+                tagref_matches[tag] += matches
+                taghyp_matches[tag] += matches
+
+    return counts
+
+
+def count_matches_per_doc(
+    refs: TagArrays,
+    hyps: TagArrays,
+    tag_names: List[str],
+    doc_offsets: np.ndarray,
+    batch_size: int = 10000,
+) -> np.ndarray:
+    """Same counts as `count_matches_arrays`, but for every document separately.
+
+    Args:
+        doc_offsets: (D + 1) offsets of each document in the sentences
+
+    Returns:
+        (D, T, 4) array with, for every document and tag of `tag_names`, the
+        reference matches, reference total, hypothesis matches and hypothesis total
+        (as in `TagCounts`)
+    """
+    num_docs = len(doc_offsets) - 1
+    stats = np.zeros((num_docs, len(tag_names), 4), dtype=np.int64)
+    num_sents = min(len(refs.sent_offsets), len(hyps.sent_offsets)) - 1
+    tag_masks = [np.uint64(1 << bit) for bit in range(len(tag_names))]
+
+    for start in range(0, num_sents, batch_size):
+        end = min(start + batch_size, num_sents)
+        ref_sents, ref_bits, hyp_sents, hyp_bits, matched_sents, matched_bits = (
+            _match_sentences(refs, hyps, start, end)
+        )
+        ref_docs, hyp_docs, matched_docs = (
+            np.searchsorted(doc_offsets, sents, side="right") - 1
+            for sents in (ref_sents, hyp_sents, matched_sents)
+        )
+        for t, mask in enumerate(tag_masks):
+            matches = np.bincount(
+                matched_docs[(matched_bits & mask) != 0], minlength=num_docs
+            )
+            stats[:, t, 0] += matches
+            stats[:, t, 1] += np.bincount(
+                ref_docs[(ref_bits & mask) != 0], minlength=num_docs
+            )
+            stats[:, t, 2] += matches
+            stats[:, t, 3] += np.bincount(
+                hyp_docs[(hyp_bits & mask) != 0], minlength=num_docs
+            )
+    return stats
+
+
+def count_matches(
+    tagged_refs: List[List[List[Tagging]]],
+    tagged_hyps: List[List[List[Tagging]]],
+    counts: Optional[TagCounts] = None,
+) -> TagCounts:
+    """Counts, for each tag, the tagged words in the reference/hypothesis and how many
+    of them are also tagged in the hypothesis/reference. If `counts` is given, the
+    counts are added to it."""
+    encoder = TagEncoder()
+    refs = encoder.encode(tagged_refs)
+    hyps = encoder.encode(tagged_hyps)
+    return count_matches_arrays(refs, hyps, list(encoder.tag_bits), counts)
+
+
+def metrics_from_counts(
+    counts: TagCounts,
+) -> Tuple[Dict[str, float], Dict[str, float], Dict[str, float]]:
+    """Computes the precision, recall and f1 for each tag from the raw counts."""
+    tagref_matches, tagref_total, taghyp_matches, taghyp_total = counts
     prec: Dict[str, float] = defaultdict(float)
     rec: Dict[str, float] = defaultdict(float)
-    prec.update({tag: taghyp_matches[tag] / taghyp_total[tag] for tag in taghyp_total})
-    rec.update({tag: tagref_matches[tag] / tagref_total[tag] for tag in tagref_total})
+    prec.update(
+        {tag: taghyp_matches.get(tag, 0) / taghyp_total[tag] for tag in taghyp_total}
+    )
+    rec.update(
+        {tag: tagref_matches.get(tag, 0) / tagref_total[tag] for tag in tagref_total}
+    )
     all_tags = set(tagref_total.keys()).union(set(taghyp_total.keys()))
     f1 = {
         tag: 2 * prec[tag] * rec[tag] / max(prec[tag] + rec[tag], 1e-20)
         for tag in all_tags
     }
     return prec, rec, f1
+
+
+def compute_metrics(
+    tagged_refs: List[List[List[Tagging]]], tagged_hyps: List[List[List[Tagging]]]
+) -> Tuple[Dict[str, float], Dict[str, float], Dict[str, float]]:
+    """Computes the accuracy, recall and f1 for each tag based if word tagged in the
+    reference/hypothesis exist and are also tagged in the hypothesis/reference.
+
+    Inspired by the compare-mt's LabelWordBucketer:
+    https://github.com/neulab/compare-mt/blob/master/compare_mt/bucketers.py"""
+    return metrics_from_counts(count_matches(tagged_refs, tagged_hyps))
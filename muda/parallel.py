@@ -0,0 +1,198 @@
+import heapq
+import multiprocessing
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from muda import profiling
+from muda.tagger import Tagger, Tagging
+
+TaggedDoc = List[List[Tagging]]
+
+
+def tag_corpus(
+    tagger: Tagger,
+    srcs: List[str],
+    tgt_sets: List[List[str]],
+    docids: List[int],
+    phenomena: List[str],
+) -> List[List[TaggedDoc]]:
+    """Tags several sets of target sentences (e.g. the reference and hypotheses)
+    against the same source sentences, preprocessing the source only once and
+    only running the preprocessing stages needed for `phenomena`.
+
+    Returns:
+        for every target set, the list of tagged documents
+    """
+    source = tagger.preprocess_src(srcs, docids, phenomena)
+    all_tagged = []
+    for tgts in tgt_sets:
+        preproc = tagger.preprocess_tgt(source, tgts)
+        tagged_docs = []
+        for doc in zip(*preproc):
+            tagged_doc = tagger.tag(*doc, phenomena=phenomena)
+            tagged_docs.append(tagged_doc)
+        all_tagged.append(tagged_docs)
+    return all_tagged
+
+
+def doc_spans(docids: Sequence[int]) -> List[Tuple[int, int]]:
+    """Returns the (start, end) line range of every document, following the same
+    document segmentation as `build_docs` (consecutive lines with the same docid)."""
+    spans = []
+    start = 0
+    for i in range(1, len(docids) + 1):
+        if i == len(docids) or docids[i] != docids[start]:
+            spans.append((start, i))
+            start = i
+    return spans
+
+
+def balance_shards(weights: Sequence[int], num_shards: int) -> List[List[int]]:
+    """Splits items into `num_shards` shards with similar total weight, by greedily
+    assigning the heaviest remaining item to the lightest shard.
+
+    Returns:
+        for every (non-empty) shard, the sorted indices of its items
+    """
+    heap = [(0, shard) for shard in range(num_shards)]
+    shards: List[List[int]] = [[] for _ in range(num_shards)]
+    for idx in sorted(range(len(weights)), key=lambda i: -weights[i]):
+        load, shard = heapq.heappop(heap)
+        shards[shard].append(idx)
+        heapq.heappush(heap, (load + weights[idx], shard))
+    return [sorted(shard) for shard in shards if shard]
+
+
+_worker_tagger: Optional[Tagger] = None
+
+
+def _init_worker(
+    langcode: str,
+    tagger_kwargs: Dict[str, Any],
+    threads: int,
+    profile: bool,
+    trace_allocations: bool,
+) -> None:
+    global _worker_tagger
+    import torch
+
+    if profile:
+        profiling.enable(trace_allocations)
+
+    # avoid oversubscribing the cpus with intra-op threads of every worker
+    torch.set_num_threads(threads)
+
+    from muda.langs import create_tagger
+
+    _worker_tagger = create_tagger(langcode, **tagger_kwargs)
+
+
+def _tag_shard(
+    args: Tuple[List[str], List[List[str]], List[int], List[str]],
+) -> Tuple[List[List[TaggedDoc]], Optional[Dict[str, Any]]]:
+    """Tags a shard, also returning the stages profiled while tagging it."""
+    assert _worker_tagger is not None
+    profiler = profiling.get_profiler()
+    if profiler is not None:
+        # only send the stages of this shard back to the main process
+        profiler = profiling.enable(profiler.trace_allocations)
+    tagged = tag_corpus(_worker_tagger, *args)
+    return tagged, profiler.export() if profiler is not None else None
+
+
+class WorkerPool:
+    """Pool of `workers` processes, each with its own tagger, which can tag any number
+    of corpora (see `tag`). The processes are started on first use and kept until
+    the pool is closed, so that the models are only loaded once."""
+
+    def __init__(
+        self, langcode: str, tagger_kwargs: Dict[str, Any], workers: int
+    ) -> None:
+        self.langcode = langcode
+        self.tagger_kwargs = tagger_kwargs
+        self.workers = workers
+        self._pool: Optional[Any] = None
+
+    def __enter__(self) -> "WorkerPool":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool = None
+
+    @property
+    def pool(self) -> Any:
+        if self._pool is None:
+            # avoid oversubscribing the cpus with intra-op threads of every worker
+            threads = max(1, (os.cpu_count() or 1) // self.workers)
+            ctx = multiprocessing.get_context("spawn")
+            profiler = profiling.get_profiler()
+            self._pool = ctx.Pool(
+                self.workers,
+                initializer=_init_worker,
+                initargs=(
+                    self.langcode,
+                    self.tagger_kwargs,
+                    threads,
+                    profiler is not None,
+                    profiler is not None and profiler.trace_allocations,
+                ),
+            )
+        return self._pool
+
+    def tag(
+        self,
+        srcs: List[str],
+        tgt_sets: List[List[str]],
+        docids: List[int],
+        phenomena: List[str],
+    ) -> List[List[TaggedDoc]]:
+        """Same as `tag_corpus`, but splits the documents across the processes.
+        Shards are balanced by number of tokens, and the output is identical to the
+        serial version."""
+        spans = doc_spans(docids)
+        weights = [
+            sum(
+                len(sents[i].split())
+                for sents in [srcs, *tgt_sets]
+                for i in range(s, e)
+            )
+            for s, e in spans
+        ]
+        shards = balance_shards(weights, self.workers)
+
+        tasks = []
+        for shard in shards:
+            lines = [(d, i) for d in shard for i in range(*spans[d])]
+            tasks.append(
+                (
+                    [srcs[i] for _, i in lines],
+                    [[tgts[i] for _, i in lines] for tgts in tgt_sets],
+                    # documents in a shard are not contiguous in the corpus anymore,
+                    # so we use the document index as docid to keep neighbours apart
+                    [d for d, _ in lines],
+                    phenomena,
+                )
+            )
+
+        results = self.pool.map(_tag_shard, tasks, chunksize=1)
+        profiler = profiling.get_profiler()
+        if profiler is not None:
+            for _, shard_stages in results:
+                if shard_stages is not None:
+                    profiler.merge(shard_stages)
+
+        # put the documents back in their original order
+        all_tagged: List[List[Optional[TaggedDoc]]] = [
+            [None] * len(spans) for _ in tgt_sets
+        ]
+        for shard, (shard_tagged, _) in zip(shards, results):
+            for tagged, shard_docs in zip(all_tagged, shard_tagged):
+                assert len(shard_docs) == len(shard)
+                for d, tagged_doc in zip(shard, shard_docs):
+                    tagged[d] = tagged_doc
+        return [[doc for doc in tagged if doc is not None] for tagged in all_tagged]
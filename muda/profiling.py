@@ -0,0 +1,192 @@
+"""
+Lightweight instrumentation of the tagging pipeline.
+
+Code is instrumented with `stage` blocks, which are no-ops unless profiling is
+enabled (with `enable`, or `--profile` in muda/main.py):
+
+    with profiling.stage("preprocess/src_parse", items=len(srcs)):
+        ...
+
+When enabled, each stage records its wall and CPU time and its number of calls and
+processed items. Optionally (`--profile-memory`), it also records the memory it
+allocates: the peak of the memory traced by tracemalloc while it runs, above the
+memory in use when it started. tracemalloc slows down python code but not the
+models (in C++), so allocations are only traced on request, and times from such
+runs shouldn't be compared across stages.
+
+The recorded stages can be written as a JSON trace (in the Chrome trace event
+format, viewable in chrome://tracing or Perfetto, with an extra `stages` summary)
+and in the Prometheus text format.
+"""
+
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Any, ContextManager, Dict, Iterator, List, Optional, TextIO
+
+STAT_FIELDS = ("calls", "items", "wall_s", "cpu_s", "alloc_bytes")
+
+
+class Profiler:
+    """Records per-stage statistics, and the individual stage runs as trace events
+    (up to `max_events`, the statistics being always recorded)."""
+
+    def __init__(self, trace_allocations: bool = False, max_events: int = 100000):
+        self.trace_allocations = trace_allocations
+        self.max_events = max_events
+        self.stats: Dict[str, Dict[str, float]] = {}
+        self.events: List[Dict[str, Any]] = []
+        # peak traced memory of every running stage (outermost first), up to the
+        # start of the stage nested in it, since starting a stage resets the peak
+        self._peaks: List[int] = []
+
+    @contextlib.contextmanager
+    def stage(self, name: str, items: int = 0) -> Iterator[None]:
+        start_ts = time.time()
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        start_mem = 0
+        if self.trace_allocations:
+            start_mem, peak = tracemalloc.get_traced_memory()
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], peak)
+            self._peaks.append(start_mem)
+            tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - start_wall
+            cpu = time.process_time() - start_cpu
+            alloc = 0
+            if self.trace_allocations:
+                peak = max(self._peaks.pop(), tracemalloc.get_traced_memory()[1])
+                alloc = peak - start_mem
+                # the enclosing stage's peak includes this one's
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], peak)
+            self.add(
+                name,
+                {
+                    "calls": 1,
+                    "items": items,
+                    "wall_s": wall,
+                    "cpu_s": cpu,
+                    "alloc_bytes": alloc,
+                },
+            )
+            if len(self.events) < self.max_events:
+                self.events.append(
+                    {
+                        "name": name,
+                        "ph": "X",
+                        "ts": start_ts * 1e6,
+                        "dur": wall * 1e6,
+                        "pid": os.getpid(),
+                        "tid": threading.get_ident(),
+                        "args": {"items": items, "cpu_s": cpu, "alloc_bytes": alloc},
+                    }
+                )
+
+    def add(self, name: str, stats: Dict[str, float]) -> None:
+        """Adds statistics to a stage."""
+        stage_stats = self.stats.setdefault(name, dict.fromkeys(STAT_FIELDS, 0.0))
+        for field in STAT_FIELDS:
+            stage_stats[field] += stats[field]
+
+    def export(self) -> Dict[str, Any]:
+        """Returns the recorded stages, to be merged into another profiler."""
+        return {"stats": self.stats, "events": self.events}
+
+    def merge(self, exported: Dict[str, Any]) -> None:
+        """Merges the stages recorded by another profiler (e.g. of a worker process)."""
+        for name, stats in exported["stats"].items():
+            self.add(name, stats)
+        self.events.extend(exported["events"][: self.max_events - len(self.events)])
+
+    def write_trace(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self.events, "stages": self.stats}, f, indent=2)
+
+    def write_prometheus(self, path: str) -> None:
+        metrics = [
+            ("calls", "muda_stage_calls_total", "counter", "Number of runs"),
+            ("items", "muda_stage_items_total", "counter", "Number of items processed"),
+            ("wall_s", "muda_stage_wall_seconds_total", "counter", "Wall time"),
+            ("cpu_s", "muda_stage_cpu_seconds_total", "counter", "CPU time"),
+        ]
+        if self.trace_allocations:
+            metrics.append(
+                (
+                    "alloc_bytes",
+                    "muda_stage_alloc_bytes_total",
+                    "counter",
+                    "Peak memory allocated by every run",
+                )
+            )
+        with open(path, "w", encoding="utf-8") as f:
+            for field, metric, metric_type, description in metrics:
+                f.write(f"# HELP {metric} {description}, per stage\n")
+                f.write(f"# TYPE {metric} {metric_type}\n")
+                for name, stats in sorted(self.stats.items()):
+                    label = name.replace("\\", "\\\\").replace('"', '\\"')
+                    f.write(f'{metric}{{stage="{label}"}} {stats[field]}\n')
+
+    def print_summary(self, file: TextIO = sys.stderr) -> None:
+        alloc = f" {'alloc (MB)':>10}" if self.trace_allocations else ""
+        print(
+            f"{'stage':<32} {'calls':>8} {'items':>10} {'wall (s)':>10} "
+            f"{'cpu (s)':>10}{alloc}",
+            file=file,
+        )
+        for name, stats in sorted(self.stats.items()):
+            alloc = (
+                f" {stats['alloc_bytes'] / 2**20:>10.1f}"
+                if self.trace_allocations
+                else ""
+            )
+            print(
+                f"{name:<32} {stats['calls']:>8.0f} {stats['items']:>10.0f} "
+                f"{stats['wall_s']:>10.3f} {stats['cpu_s']:>10.3f}{alloc}",
+                file=file,
+            )
+
+
+_profiler: Optional[Profiler] = None
+_disabled_stage = contextlib.nullcontext()
+
+
+def enable(trace_allocations: bool = False) -> Profiler:
+    """Starts recording stages in a new profiler, returning it. If
+    `trace_allocations`, the memory allocated by every stage is also recorded."""
+    global _profiler
+    if trace_allocations:
+        if not hasattr(tracemalloc, "reset_peak"):
+            raise ValueError("Tracing allocations per stage needs python >= 3.9")
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+    _profiler = Profiler(trace_allocations=trace_allocations)
+    return _profiler
+
+
+def disable() -> Optional[Profiler]:
+    """Stops recording stages, returning the profiler that was recording them."""
+    global _profiler
+    profiler, _profiler = _profiler, None
+    if profiler is not None and profiler.trace_allocations:
+        tracemalloc.stop()
+    return profiler
+
+
+def get_profiler() -> Optional[Profiler]:
+    return _profiler
+
+
+def stage(name: str, items: int = 0) -> ContextManager[None]:
+    """Records a stage if profiling is enabled (see `Profiler.stage`)."""
+    if _profiler is None:
+        return _disabled_stage
+    return _profiler.stage(name, items)
@@ -0,0 +1,387 @@
+"""
+Long-running tagging service, which loads the taggers of the configured languages
+once and keeps their models in memory between requests.
+
+The service speaks JSON over HTTP, on a TCP port or a Unix socket:
+    POST /tag: {"lang", "src", "tgt", "docids", "phenomena" (optional)}
+        -> {"tags": tags of the target documents}
+    POST /score: {"lang", "src", "tgt", "hyps", "docids", "phenomena" (optional)}
+        -> {"tags": ..., "metrics": [{"precision", "recall", "f1"} per hypothesis set]}
+    GET /health -> {"langs": served languages}
+where `src`, `tgt` and `docids` are lists with one entry per sentence (as the lines
+of the files given to `muda/main.py`) and `hyps` is a list of such sentence lists.
+Tags have the same structure as the JSON dumps of `muda/main.py`, and metrics are
+those of `compute_metrics`.
+
+Requests are handled concurrently, but each language has a single worker thread
+that owns its tagger. The worker merges the requests that are queued within a
+short time window into a single batch, so that the models run on larger batches.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import queue
+import socketserver
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from muda.langs import AVAILABLE_TAGGERS, create_tagger
+from muda.main import add_tagger_args, build_tagger_kwargs, recursive_map
+from muda.metrics import TagEncoder, count_matches_arrays, metrics_from_counts
+from muda.parallel import TaggedDoc, doc_spans
+from muda.tagger import PHENOMENA, SourceData, Tagger
+
+
+class RequestError(Exception):
+    """Invalid request, reported back to the client."""
+
+
+class Job:
+    """A tagging request queued to a language worker."""
+
+    def __init__(
+        self,
+        srcs: List[str],
+        tgt_sets: List[List[str]],
+        docids: List[Any],
+        phenomena: Sequence[str],
+    ) -> None:
+        self.srcs = srcs
+        self.tgt_sets = tgt_sets
+        self.docids = docids
+        self.phenomena = phenomena
+        self.done = threading.Event()
+        self.result: Optional[List[List[TaggedDoc]]] = None
+        self.error: Optional[BaseException] = None
+
+
+def tag_jobs(tagger: Tagger, jobs: List[Job]) -> List[List[List[TaggedDoc]]]:
+    """Tags several jobs as a single batch, preprocessing all their sentences
+    together (but never mixing documents of different jobs).
+
+    Returns:
+        for every job, the tagged documents of each of its target sets
+    """
+    # (job, line) of every line of the batch, with documents renumbered so that
+    # neighbouring documents of different jobs are kept apart
+    lines: List[Tuple[int, int]] = []
+    docids: List[int] = []
+    num_docs = 0
+    for j, job in enumerate(jobs):
+        for start, end in doc_spans(job.docids):
+            lines.extend((j, i) for i in range(start, end))
+            docids.extend([num_docs] * (end - start))
+            num_docs += 1
+
+    phenomena = list(dict.fromkeys(p for job in jobs for p in job.phenomena))
+    source = tagger.preprocess_src(
+        [jobs[j].srcs[i] for j, i in lines], docids, phenomena
+    )
+
+    results: List[List[List[TaggedDoc]]] = [[[] for _ in job.tgt_sets] for job in jobs]
+    for k in range(max(len(job.tgt_sets) for job in jobs)):
+        # jobs may have a different number of target sets (e.g. hypotheses)
+        subset = [n for n, (j, _) in enumerate(lines) if len(jobs[j].tgt_sets) > k]
+        sub_source = SourceData(
+            docids=[source.docids[n] for n in subset],
+            src_pproc=[source.src_pproc[n] for n in subset],
+            antecs=[source.antecs[n] for n in subset],
+            plan=source.plan,
+        )
+        preproc = tagger.preprocess_tgt(
+            sub_source, [jobs[j].tgt_sets[k][i] for j, i in (lines[n] for n in subset)]
+        )
+        doc_jobs = [
+            lines[n][0]
+            for m, n in enumerate(subset)
+            if m == 0 or docids[n] != docids[subset[m - 1]]
+        ]
+        for j, doc in zip(doc_jobs, zip(*preproc)):
+            results[j][k].append(tagger.tag(*doc, phenomena=jobs[j].phenomena))
+    return results
+
+
+def load_pipelines(tagger: Tagger) -> None:
+    """Loads the pipelines planned for every subset of the tagger's phenomena, since
+    each set of processors is a different pipeline."""
+    names = list(tagger.phenomena)
+    pipelines = set()
+    for n in range(1, len(names) + 1):
+        for subset in itertools.combinations(names, n):
+            plan = tagger.plan(subset)
+            pipelines.add((tagger.src_lang, plan.src_processors))
+            pipelines.add((tagger.tgt_lang, plan.tgt_processors))
+    for lang, processors in sorted(pipelines):
+        tagger.pipeline(lang, processors)
+
+
+class LanguageWorker:
+    """Owns the tagger of a language, tagging the queued jobs in micro-batches of
+    up to `max_batch_size` sentences, collected for at most `max_wait` seconds."""
+
+    def __init__(self, tagger: Tagger, max_batch_size: int, max_wait: float) -> None:
+        self.tagger = tagger
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.queue: "queue.Queue[Job]" = queue.Queue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, job: Job) -> List[List[TaggedDoc]]:
+        """Queues a job, waiting for its result."""
+        self.queue.put(job)
+        job.done.wait()
+        if job.error is not None:
+            raise job.error
+        assert job.result is not None
+        return job.result
+
+    def _next_batch(self) -> List[Job]:
+        jobs = [self.queue.get()]
+        size = len(jobs[0].srcs)
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                job = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            jobs.append(job)
+            size += len(job.srcs)
+        return jobs
+
+    def _run(self) -> None:
+        while True:
+            jobs = self._next_batch()
+            try:
+                results = tag_jobs(self.tagger, jobs)
+            except Exception as e:
+                if len(jobs) == 1:
+                    jobs[0].error = e
+                    jobs[0].done.set()
+                    continue
+                # retry one job at a time, so that a bad request only fails itself
+                for job in jobs:
+                    try:
+                        (job.result,) = tag_jobs(self.tagger, [job])
+                    except Exception as job_e:
+                        job.error = job_e
+                    job.done.set()
+                continue
+            for job, result in zip(jobs, results):
+                job.result = result
+                job.done.set()
+
+
+class TaggingService:
+    """Validates requests and dispatches them to the worker of their language."""
+
+    def __init__(
+        self,
+        langs: Sequence[str],
+        tagger_kwargs: Dict[str, Any],
+        max_batch_size: int = 256,
+        max_wait: float = 0.02,
+        warmup: bool = True,
+    ) -> None:
+        self.workers: Dict[str, LanguageWorker] = {}
+        for lang in langs:
+            start = time.perf_counter()
+            tagger = create_tagger(lang, **tagger_kwargs)
+            if warmup:
+                # models are loaded on first use, so load them before serving
+                load_pipelines(tagger)
+            worker = LanguageWorker(tagger, max_batch_size, max_wait)
+            if warmup:
+                # the first sentence of a document is never sent to the coreference
+                # model, so the document needs a second one
+                sents = ["Hello .", "It is me ."]
+                worker.submit(Job(sents, [sents], [0, 0], PHENOMENA))
+            self.workers[lang] = worker
+            print(
+                f"loaded {lang} tagger in {time.perf_counter() - start:.1f}s",
+                file=sys.stderr,
+            )
+
+    def _job(self, request: Dict[str, Any], tgt_sets: List[Any]) -> Job:
+        lang = request.get("lang")
+        if lang not in self.workers:
+            raise RequestError(f"Language not served: {lang}")
+        srcs, docids = request.get("src"), request.get("docids")
+        if not isinstance(srcs, list) or not srcs:
+            raise RequestError("`src` must be a non-empty list of sentences")
+        if not isinstance(docids, list):
+            raise RequestError("`docids` must be a list of document ids")
+        for sents in [docids, *tgt_sets]:
+            if not isinstance(sents, list) or len(sents) != len(srcs):
+                raise RequestError(
+                    "`tgt`, `hyps` and `docids` must have one entry per sentence"
+                )
+        phenomena = request.get("phenomena", PHENOMENA)
+        unknown = set(phenomena) - set(self.workers[lang].tagger.phenomena)
+        if unknown:
+            raise RequestError(f"Unknown phenomena: {sorted(unknown)}")
+        return Job(srcs, tgt_sets, docids, phenomena)
+
+    def tag(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        job = self._job(request, [request.get("tgt")])
+        (tagged_refs,) = self.workers[request["lang"]].submit(job)
+        return {"tags": recursive_map(lambda t: t._asdict(), tagged_refs)}
+
+    def score(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        hyps = request.get("hyps")
+        if not isinstance(hyps, list):
+            raise RequestError("`hyps` must be a list of hypothesis sets")
+        job = self._job(request, [request.get("tgt"), *hyps])
+        tagged_refs, *all_tagged_hyps = self.workers[request["lang"]].submit(job)
+
+        encoder = TagEncoder(job.phenomena)
+        ref_arrays = encoder.encode(tagged_refs)
+        metrics = []
+        for tagged_hyps in all_tagged_hyps:
+            counts = count_matches_arrays(
+                ref_arrays, encoder.encode(tagged_hyps), list(encoder.tag_bits)
+            )
+            prec, rec, f1 = metrics_from_counts(counts)
+            metrics.append({"precision": prec, "recall": rec, "f1": f1})
+        return {
+            "tags": recursive_map(lambda t: t._asdict(), tagged_refs),
+            "metrics": metrics,
+        }
+
+
+class MudaRequestHandler(BaseHTTPRequestHandler):
+    def __init__(self, *args: Any, service: TaggingService, **kwargs: Any) -> None:
+        self.service = service
+        super().__init__(*args, **kwargs)
+
+    def _send(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        if self.path == "/health":
+            self._send(200, {"langs": sorted(self.service.workers)})
+        else:
+            self._send(404, {"error": f"Unknown endpoint: {self.path}"})
+
+    def do_POST(self) -> None:
+        endpoints = {"/tag": self.service.tag, "/score": self.service.score}
+        if self.path not in endpoints:
+            self._send(404, {"error": f"Unknown endpoint: {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length))
+            if not isinstance(request, dict):
+                raise RequestError("The request must be a JSON object")
+            response = endpoints[self.path](request)
+        except (RequestError, json.JSONDecodeError) as e:
+            self._send(400, {"error": str(e)})
+        except Exception as e:
+            self._send(500, {"error": f"{type(e).__name__}: {e}"})
+        else:
+            self._send(200, response)
+
+    def address_string(self) -> str:
+        # clients of a unix socket have no address
+        return str(self.client_address[0]) if self.client_address else "local"
+
+
+class ThreadingUnixHTTPServer(
+    socketserver.ThreadingMixIn, socketserver.UnixStreamServer
+):
+    daemon_threads = True
+
+
+def serve(
+    service: TaggingService,
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    socket_path: Optional[str] = None,
+) -> None:
+    """Serves requests until interrupted, on a unix socket if `socket_path` is set
+    and on `host:port` otherwise."""
+
+    def handler(*args: Any) -> MudaRequestHandler:
+        return MudaRequestHandler(*args, service=service)
+
+    server: socketserver.BaseServer
+    if socket_path is not None:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = ThreadingUnixHTTPServer(socket_path, handler)
+        print(f"serving on {socket_path}", file=sys.stderr)
+    else:
+        server = ThreadingHTTPServer((host, port), handler)
+        print(f"serving on http://{host}:{port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if socket_path is not None and os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(
+        prog="python -m muda serve",
+        description="Serves tagging and scoring requests, keeping the models loaded",
+    )
+    parser.add_argument(
+        "--langs",
+        nargs="+",
+        required=True,
+        choices=[x.replace("_tagger", "") for x in sorted(AVAILABLE_TAGGERS.keys())],
+        help="Target languages to serve. Their taggers are loaded at startup.",
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Default: 127.0.0.1")
+    parser.add_argument("--port", default=8765, type=int, help="Default: 8765")
+    parser.add_argument(
+        "--socket",
+        default=None,
+        help="If set, listens on this unix socket instead of a TCP port",
+    )
+    parser.add_argument(
+        "--max-batch-size",
+        default=256,
+        type=int,
+        help="Maximum number of sentences tagged together, across requests. "
+        "Default: 256",
+    )
+    parser.add_argument(
+        "--max-wait-ms",
+        default=20,
+        type=float,
+        help="How long to wait for more requests before tagging a batch. Default: 20",
+    )
+    add_tagger_args(parser)
+    return vars(parser.parse_args(argv))
+
+
+def cli(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    service = TaggingService(
+        args["langs"],
+        build_tagger_kwargs(args),
+        max_batch_size=args["max_batch_size"],
+        max_wait=args["max_wait_ms"] / 1000,
+    )
+    serve(service, host=args["host"], port=args["port"], socket_path=args["socket"])
+
+
+if __name__ == "__main__":
+    cli()
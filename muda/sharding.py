@@ -0,0 +1,154 @@
+"""
+Multi-node runs: with `--shard i/N`, a run only tags the documents of the i-th of
+N shards of the corpus (chosen by a hash of their docid, so that every node gets
+the same partition). Next to its partial `--dump-tags` file, each shard writes
+`<dump-tags>.shard.json`, with the indices of its documents in the corpus and the
+raw match and total counts of every hypothesis set. Unlike the metrics, these
+counts can be summed, so
+
+    python -m muda merge shard0.npz shard1.npz ... --dump-tags all.npz
+
+gives the same dump and the same metrics as a single-node run.
+"""
+
+import argparse
+import json
+import sys
+import zlib
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from muda.metrics import TagCounts, metrics_from_counts
+from muda.parallel import TaggedDoc, doc_spans
+from muda.tagstore import read_dump, write_dump
+
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """Parses a shard specification `i/N` (with 0 <= i < N)."""
+    try:
+        shard, num_shards = (int(part) for part in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard '{spec}', expected i/N") from None
+    if not 0 <= shard < num_shards:
+        raise ValueError(f"Invalid shard '{spec}', expected 0 <= i < N")
+    return shard, num_shards
+
+
+def shard_of(docid: int, num_shards: int) -> int:
+    return zlib.crc32(str(docid).encode("utf-8")) % num_shards
+
+
+def select_shard(
+    docids: Sequence[int], shard: int, num_shards: int
+) -> Tuple[List[int], List[int]]:
+    """Returns the indices of the documents of a shard, and of their lines."""
+    docs = []
+    lines: List[int] = []
+    for d, (start, end) in enumerate(doc_spans(docids)):
+        if shard_of(docids[start], num_shards) == shard:
+            docs.append(d)
+            lines.extend(range(start, end))
+    return docs, lines
+
+
+def info_path(dump_path: str) -> str:
+    return f"{dump_path}.shard.json"
+
+
+def write_shard_info(
+    dump_path: str,
+    shard: int,
+    num_shards: int,
+    num_docs: int,
+    docs: List[int],
+    phenomena: List[str],
+    hyps: List[str],
+    all_counts: List[TagCounts],
+) -> None:
+    """Writes the information needed to merge the shard written to `dump_path`."""
+    info = {
+        "shard": shard,
+        "num_shards": num_shards,
+        "num_docs": num_docs,
+        "docs": docs,
+        "phenomena": phenomena,
+        "hyps": hyps,
+        "counts": [counts._asdict() for counts in all_counts],
+    }
+    with open(info_path(dump_path), "w", encoding="utf-8") as f:
+        json.dump(info, f)
+
+
+def merge_shards(
+    dump_paths: List[str], output_path: Optional[str] = None
+) -> Tuple[List[TaggedDoc], List[TagCounts], Dict[str, Any]]:
+    """Merges the outputs of the shards of a run, writing the merged dump to
+    `output_path` if given.
+
+    Returns:
+        the tagged documents of the whole corpus, the counts of every hypothesis
+        set, and the information of the first shard
+    """
+    infos = []
+    for path in dump_paths:
+        with open(info_path(path), "r", encoding="utf-8") as f:
+            infos.append(json.load(f))
+    if not infos:
+        raise ValueError("No shards to merge")
+
+    first = infos[0]
+    for path, info in zip(dump_paths, infos):
+        for field in ("num_shards", "num_docs", "phenomena", "hyps"):
+            if info[field] != first[field]:
+                raise ValueError(f"{path} is from a different run ({field} differs)")
+    shards = sorted(info["shard"] for info in infos)
+    if shards != list(range(first["num_shards"])):
+        raise ValueError(
+            f"Expected each of the {first['num_shards']} shards once, got {shards}"
+        )
+
+    tagged: List[Optional[TaggedDoc]] = [None] * first["num_docs"]
+    all_counts = [TagCounts.empty() for _ in first["hyps"]]
+    for path, info in zip(dump_paths, infos):
+        shard_docs = read_dump(path)
+        assert len(shard_docs) == len(info["docs"])
+        for d, tagged_doc in zip(info["docs"], shard_docs):
+            tagged[d] = tagged_doc
+        for counts, shard_counts in zip(all_counts, info["counts"]):
+            counts.update(TagCounts(**shard_counts))
+    merged = [doc for doc in tagged if doc is not None]
+    if len(merged) != len(tagged):
+        raise ValueError("The shards don't cover all documents of the corpus")
+
+    if output_path is not None:
+        write_dump(output_path, merged, tag_names=first["phenomena"])
+    return merged, all_counts, first
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(
+        prog="python -m muda merge",
+        description="Merges the outputs of the shards of a run (see --shard)",
+    )
+    parser.add_argument(
+        "shards", nargs="+", help="--dump-tags files written by every shard"
+    )
+    parser.add_argument(
+        "--dump-tags",
+        required=True,
+        help="File to write the merged tags to (JSON, or .npz for the columnar format)",
+    )
+    return vars(parser.parse_args(argv))
+
+
+def cli(argv: Optional[Sequence[str]] = None) -> None:
+    # muda.main imports this module
+    from muda.main import hyps_names, print_metrics
+
+    args = parse_args(argv)
+    _, all_counts, info = merge_shards(args["shards"], args["dump_tags"])
+    print(
+        f"merged {len(args['shards'])} shards of {info['num_docs']} documents",
+        file=sys.stderr,
+    )
+    for name, counts in zip(hyps_names(info["hyps"]), all_counts):
+        print_metrics(*metrics_from_counts(counts), name=name)
@@ -0,0 +1,186 @@
+"""
+Paired bootstrap resampling of the tag metrics (Koehn, 2004).
+
+The metrics of a corpus are computed from per-tag match and total counts, which are
+sums over its documents. Keeping these counts for every document (as a
+(systems, documents, tags, 4) array, see `count_matches_per_doc`) is then enough
+to compute the metrics of any resample of the documents, as a weighted sum:
+resamples are drawn as document weights, and all of them are scored at once with
+a matrix product. The same resamples are used for all systems, so that they can be
+compared on the same documents.
+"""
+
+import sys
+from typing import List, NamedTuple, Sequence, TextIO
+
+import numpy as np
+
+from muda.metrics import TagEncoder, count_matches_per_doc
+from muda.parallel import TaggedDoc
+
+METRICS = ("prec", "rec", "f1")
+
+
+class BootstrapResult(NamedTuple):
+    """Metrics of every system (hypothesis set) and tag, as (systems, tags, 3)
+    arrays of (precision, recall, f1), and p-values of the differences in f1 of
+    every pair of systems, as a (systems, systems, tags) array."""
+
+    tags: List[str]
+    metrics: np.ndarray
+    lower: np.ndarray
+    upper: np.ndarray
+    p_values: np.ndarray
+    num_samples: int
+    confidence: float
+
+
+def document_stats(
+    tagged_refs: List[TaggedDoc],
+    all_tagged_hyps: List[List[TaggedDoc]],
+    tag_names: Sequence[str],
+) -> np.ndarray:
+    """Returns the per-document counts of every hypothesis set against the
+    reference, as a (systems, documents, tags, 4) array."""
+    encoder = TagEncoder(tag_names)
+    ref_arrays = encoder.encode(tagged_refs)
+    doc_offsets = np.cumsum([0] + [len(doc) for doc in tagged_refs])
+    return np.stack(
+        [
+            count_matches_per_doc(
+                ref_arrays, encoder.encode(tagged_hyps), list(tag_names), doc_offsets
+            )
+            for tagged_hyps in all_tagged_hyps
+        ]
+    )
+
+
+def metrics_from_stats(stats: np.ndarray) -> np.ndarray:
+    """Vectorized `metrics_from_counts`: computes the precision, recall and f1 from
+    (..., tags, 4) counts, in the order of `TagCounts`."""
+    ref_matches, ref_total, hyp_matches, hyp_total = np.moveaxis(stats, -1, 0)
+    # as in `metrics_from_counts`, metrics of tags that don't appear are 0
+    prec = np.divide(
+        hyp_matches,
+        hyp_total,
+        out=np.zeros(hyp_total.shape, dtype=np.float64),
+        where=hyp_total > 0,
+    )
+    rec = np.divide(
+        ref_matches,
+        ref_total,
+        out=np.zeros(ref_total.shape, dtype=np.float64),
+        where=ref_total > 0,
+    )
+    f1 = 2 * prec * rec / np.maximum(prec + rec, 1e-20)
+    return np.stack([prec, rec, f1], axis=-1)
+
+
+def paired_bootstrap(
+    stats: np.ndarray,
+    tags: Sequence[str],
+    num_samples: int = 1000,
+    confidence: float = 0.95,
+    seed: int = 0,
+    batch_size: int = 100,
+) -> BootstrapResult:
+    """Computes confidence intervals of the metrics of every system, and the
+    significance of their pairwise differences, by resampling the documents.
+
+    Args:
+        stats: (systems, documents, tags, 4) per-document counts
+        tags: names of the tags
+        num_samples: number of resamples
+        confidence: confidence level of the intervals
+        seed: seed of the resampling
+        batch_size: number of resamples scored at once, bounding memory usage to
+            about `batch_size` times the number of documents
+
+    Returns:
+        the metrics on the whole corpus, the percentile confidence intervals, and
+        the p-values of the null hypothesis that a pair of systems has the same
+        f1, estimated from the resampled differences centered on their mean
+    """
+    num_systems, num_docs = stats.shape[:2]
+    if num_docs == 0:
+        raise ValueError("Can't resample an empty corpus")
+    # (documents, systems * tags * 4), so that all systems are scored with a single
+    # matrix product
+    flat_stats = np.moveaxis(stats, 1, 0).reshape(num_docs, -1).astype(np.float64)
+    rng = np.random.default_rng(seed)
+
+    samples = []
+    for start in range(0, num_samples, batch_size):
+        size = min(batch_size, num_samples - start)
+        # the number of times each document is drawn in every resample
+        draws = rng.integers(0, num_docs, (size, num_docs))
+        draws += np.arange(size)[:, None] * num_docs
+        weights = np.bincount(draws.ravel(), minlength=size * num_docs)
+        sample_stats = weights.reshape(size, num_docs).astype(np.float64) @ flat_stats
+        samples.append(
+            metrics_from_stats(
+                np.moveaxis(
+                    sample_stats.reshape(size, num_systems, *stats.shape[2:]), 0, 1
+                )
+            )
+        )
+    # (systems, samples, tags, 3)
+    sample_metrics = np.concatenate(samples, axis=1)
+
+    alpha = (1 - confidence) / 2
+    metrics = metrics_from_stats(stats.sum(axis=1))
+    lower, upper = np.quantile(sample_metrics, [alpha, 1 - alpha], axis=1)
+
+    f1 = sample_metrics[..., 2]
+    deltas = f1[:, None] - f1[None, :]
+    observed = metrics[:, None, :, 2] - metrics[None, :, :, 2]
+    centered = np.abs(deltas - deltas.mean(axis=2, keepdims=True))
+    p_values = (np.sum(centered >= np.abs(observed)[:, :, None], axis=2) + 1) / (
+        num_samples + 1
+    )
+    return BootstrapResult(
+        tags=list(tags),
+        metrics=metrics,
+        lower=lower,
+        upper=upper,
+        p_values=p_values,
+        num_samples=num_samples,
+        confidence=confidence,
+    )
+
+
+def print_bootstrap(
+    result: BootstrapResult, names: Sequence[str], file: TextIO = sys.stdout
+) -> None:
+    """Prints the confidence intervals of every system, and the p-values of every
+    pair of systems."""
+    print(
+        f"-- Bootstrap ({result.num_samples} resamples, "
+        f"{result.confidence:.0%} confidence intervals) --",
+        file=file,
+    )
+    for s, name in enumerate(names):
+        print(name, file=file)
+        for t, tag in enumerate(result.tags):
+            print(
+                f"{tag} -- "
+                + " ".join(
+                    f"{metric.capitalize()}: {result.metrics[s, t, m]:.2f} "
+                    f"[{result.lower[s, t, m]:.2f}, {result.upper[s, t, m]:.2f}]"
+                    for m, metric in enumerate(METRICS)
+                ),
+                file=file,
+            )
+    print(file=file)
+
+    for a in range(len(names)):
+        for b in range(a + 1, len(names)):
+            print(f"-- {names[a]} vs {names[b]} --", file=file)
+            for t, tag in enumerate(result.tags):
+                delta = result.metrics[a, t, 2] - result.metrics[b, t, 2]
+                print(
+                    f"{tag} -- F1 difference: {delta:+.2f} "
+                    f"p-value: {result.p_values[a, b, t]:.3f}",
+                    file=file,
+                )
+            print(file=file)
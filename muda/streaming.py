@@ -0,0 +1,57 @@
+from contextlib import ExitStack
+from itertools import zip_longest
+from typing import Iterator, List, Tuple
+
+# the lines of a document: source sentences, sentences of every target set, docids
+DocLines = Tuple[List[str], List[List[str]], List[int]]
+
+
+def read_documents(
+    src_path: str, tgt_paths: List[str], docids_path: str
+) -> Iterator[DocLines]:
+    """Reads the source, target(s) and docids files in lockstep, yielding one document
+    (consecutive lines with the same docid) at a time."""
+    with ExitStack() as stack:
+        files = [
+            stack.enter_context(open(path, "r", encoding="utf-8"))
+            for path in [src_path, *tgt_paths, docids_path]
+        ]
+        srcs: List[str] = []
+        tgt_sets: List[List[str]] = [[] for _ in tgt_paths]
+        docids: List[int] = []
+        for lineno, lines in enumerate(zip_longest(*files), start=1):
+            if any(line is None for line in lines):
+                raise ValueError(f"input files have different lengths (line {lineno})")
+            src, *tgts, docid_str = lines
+            docid = int(docid_str)
+            if docids and docid != docids[-1]:
+                yield srcs, tgt_sets, docids
+                srcs, tgt_sets, docids = [], [[] for _ in tgt_paths], []
+            srcs.append(src.strip())
+            for tgt_set, tgt in zip(tgt_sets, tgts):
+                tgt_set.append(tgt.strip())
+            docids.append(docid)
+        if docids:
+            yield srcs, tgt_sets, docids
+
+
+def document_windows(docs: Iterator[DocLines], window_size: int) -> Iterator[DocLines]:
+    """Groups documents in windows of (at most) `window_size` complete documents."""
+    window: List[DocLines] = []
+    for doc in docs:
+        window.append(doc)
+        if len(window) == window_size:
+            yield merge_documents(window)
+            window = []
+    if window:
+        yield merge_documents(window)
+
+
+def merge_documents(docs: List[DocLines]) -> DocLines:
+    srcs = [src for doc_srcs, _, _ in docs for src in doc_srcs]
+    tgt_sets = [
+        [tgt for _, doc_tgts, _ in docs for tgt in doc_tgts[i]]
+        for i in range(len(docs[0][1]))
+    ]
+    docids = [docid for _, _, doc_docids in docs for docid in doc_docids]
+    return srcs, tgt_sets, docids
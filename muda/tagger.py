@@ -1,16 +1,38 @@
+from __future__ import annotations
+
 import abc
 import inspect
 import re
-import subprocess
-import tempfile
-from collections import defaultdict
-from typing import Any, Dict, List, Set, Tuple, Optional, NamedTuple
-
-import spacy
-import spacy_stanza  # type: ignore
-from allennlp.predictors.predictor import Predictor
-
-Document = List[spacy.tokens.doc.Doc]
+from collections import Counter
+from functools import lru_cache
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Set,
+    Sequence,
+    Tuple,
+    Optional,
+    NamedTuple,
+    TypeVar,
+    TYPE_CHECKING,
+)
+
+import numpy as np
+
+from muda.aligner import Aligner
+from muda.cache import AlignmentCache, ParseCache
+from muda.coref import CorefResolver
+from muda.features import FeatureExtractor, SentenceFeatures, pos_id, string_id
+from muda.profiling import stage
+
+if TYPE_CHECKING:
+    import spacy
+
+Document = List[SentenceFeatures]
 Alignment = List[Dict[int, int]]
 Antecs = List[List[bool]]
 
@@ -20,6 +42,65 @@ class Tagging(NamedTuple):
     tags: List[str]
 
 
+class Phenomenon(NamedTuple):
+    """A phenomenon method of a tagger, with the inputs it takes, the annotations
+    it needs (see `requires`) and its tag bit."""
+
+    name: str
+    bit: int
+    inputs: Tuple[str, ...]
+    requires: FrozenSet[str]
+    fn: Callable[..., List[List[bool]]]
+
+
+# phenomena that are tagged by default (and registered by every tagger)
+PHENOMENA = ("lexical_cohesion", "formality", "verb_form", "pronouns")
+# inputs that can be passed to phenomenon methods
+PHENOMENON_INPUTS = ("src_doc", "tgt_doc", "antecs_doc", "align_doc")
+# stanza processors needed for each level of annotation
+FULL_PROCESSORS = "tokenize,pos,lemma,depparse"
+POS_PROCESSORS = "tokenize,pos"
+TOKENIZE_PROCESSORS = "tokenize"
+# annotations that preprocessing can produce, on top of the tokenization
+ANNOTATIONS = frozenset(
+    ("src_pos", "src_depparse", "tgt_pos", "tgt_depparse", "alignment", "coref")
+)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+def requires(*annotations: str) -> Callable[[F], F]:
+    """Declares the annotations (from `ANNOTATIONS`) that a phenomenon method needs,
+    so that preprocessing only runs the models required by the requested phenomena.
+    Methods without a declaration are assumed to need every annotation."""
+    unknown = set(annotations) - ANNOTATIONS
+    assert not unknown, f"Unknown annotations: {unknown}"
+
+    def decorator(fn: F) -> F:
+        fn.requires = frozenset(annotations)  # type: ignore
+        return fn
+
+    return decorator
+
+
+class PreprocessPlan(NamedTuple):
+    """Preprocessing stages needed to tag a set of phenomena."""
+
+    src_processors: str
+    tgt_processors: str
+    alignment: bool
+    coref: bool
+
+
+class SourceData(NamedTuple):
+    """Source-side preprocessing, shared by all target sets of a corpus."""
+
+    docids: List[int]
+    src_pproc: List[SentenceFeatures]
+    antecs: List[List[bool]]
+    plan: PreprocessPlan
+
+
 def build_docs(docids, *args):  # type: ignore
     """Builds "document-level" structures based on docids and sentence-level structures."""
     assert all(
@@ -43,43 +124,132 @@ def build_docs(docids, *args):  # type: ignore
     return tuple(zip(*all_docs))
 
 
+@lru_cache(maxsize=2**18)
+def _normalize(word: str) -> str:
+    # words repeat a lot, so we cache the (regex-based) normalization
+    return re.sub(r"^\W+|\W+$", "", word.lower())
+
+
 class Tagger(abc.ABC):
     """
     Abstact class that represent a tagger for a (target) language.
     It implements the core preprocessing and tagging functionality.
-    Subclasses need to override the __init__ to set language-specific parameters and,
-    if applicable, implement the _verb_formality method.
+    Subclasses need to override the __init__ to set language-specific parameters
+    (including `tgt_lang`, the stanza language of the target pipeline) and,
+    if applicable, implement the _verb_formality method, declaring the annotations
+    it needs with `requires`.
     """
 
     def __init__(
         self,
         align_model: str = "bert-base-multilingual-cased",
         align_cachedir: Optional[str] = None,
+        align_batch_size: int = 32,
+        align_cache: Optional[str] = None,
+        align_cache_size: Optional[int] = None,
+        coref_batch_size: int = 8,
+        batch_tokens: Optional[int] = None,
+        parse_cache: Optional[str] = None,
+        parse_cache_size: Optional[int] = None,
         cohesion_threshold: int = 3,
     ) -> None:
-        """Initializes the tagger, loading the necessary models."""
-        self.src_pipeline = spacy_stanza.load_pipeline(
-            "en", processors="tokenize,pos,lemma,depparse"
-        )
-
+        """Initializes the tagger. Models are loaded on first use, since which ones
+        are needed depends on the phenomena being tagged."""
+        self.src_lang = "en"
         # override this in subclasses
-        self.tgt_pipeline: spacy.language.Language
-        self.formality_classes: Dict[str, Set[str]] = {}
+        self.tgt_lang: str
+        self._pipelines: Dict[Tuple[str, str], spacy.language.Language] = {}
+        # token features of the parsed sentences, on which phenomena are tagged
+        self.features = FeatureExtractor(self.normalize)
+
+        self.formality_classes = {}
+        # `_verb_formality` is only called if a subclass implements it
+        self._has_verb_formality = (
+            type(self)._verb_formality is not Tagger._verb_formality
+        )
         self.ambiguous_pronouns: Dict[str, List[str]] = {}
         self.ambiguous_verbform: List[str] = []
 
-        self.align_model = align_model
-        self.align_cachedir = align_cachedir
+        # the alignment model is loaded on first use and kept for the tagger's lifetime
+        self.aligner = Aligner(
+            align_model,
+            cache_dir=align_cachedir,
+            batch_size=align_batch_size,
+            max_tokens=batch_tokens,
+        )
+        self.align_cache = (
+            AlignmentCache(align_cache, max_size_mb=align_cache_size)
+            if align_cache is not None
+            else None
+        )
+        # likewise for the (source) coreference model
+        self.coref = CorefResolver(batch_size=coref_batch_size, max_tokens=batch_tokens)
+
+        self.parse_cache = (
+            ParseCache(parse_cache, max_size_mb=parse_cache_size)
+            if parse_cache is not None
+            else None
+        )
 
         self.cohesion_threshold = cohesion_threshold
 
+        self.phenomena: Dict[str, Phenomenon] = {}
+        for phenomenon in PHENOMENA:
+            self.register_phenomenon(phenomenon)
+
+    def pipeline(self, lang: str, processors: str) -> spacy.language.Language:
+        """Returns the (spacy-stanza) pipeline for a language and set of processors,
+        loading it on first use."""
+        if (lang, processors) not in self._pipelines:
+            import spacy_stanza  # type: ignore
+
+            self._pipelines[lang, processors] = spacy_stanza.load_pipeline(
+                lang, processors=processors
+            )
+        return self._pipelines[lang, processors]
+
+    @property
+    def src_pipeline(self) -> spacy.language.Language:
+        """Full source pipeline"""
+        return self.pipeline(self.src_lang, FULL_PROCESSORS)
+
+    @property
+    def tgt_pipeline(self) -> spacy.language.Language:
+        """Full target pipeline"""
+        return self.pipeline(self.tgt_lang, FULL_PROCESSORS)
+
+    @property
+    def formality_classes(self) -> Dict[str, Set[str]]:
+        """Words of each formality class (e.g. T-V distinction).
+        Should be (re)assigned rather than modified in-place, so that the word index
+        used for tagging is kept up to date."""
+        return self._formality_classes
+
+    @formality_classes.setter
+    def formality_classes(self, formality_classes: Dict[str, Set[str]]) -> None:
+        self._formality_classes = formality_classes
+        self._formality_index = {
+            word: formality
+            for formality, words in formality_classes.items()
+            for word in words
+        }
+        # same index, by id of the normalized form (see `string_id`)
+        self._formality_ids = {
+            string_id(word): formality
+            for word, formality in self._formality_index.items()
+        }
+
     @classmethod
     def normalize(cls, word: str) -> str:
         """default normalization"""
-        return re.sub(r"^\W+|\W+$", "", word.lower())
+        return _normalize(word)
 
     def preprocess(
-        self, srcs: List[str], tgts: List[str], docids: List[int]
+        self,
+        srcs: List[str],
+        tgts: List[str],
+        docids: List[int],
+        phenomena: Sequence[str] = PHENOMENA,
     ) -> Tuple[List[Document], List[Document], List[Antecs], List[Alignment]]:
         """
         Preprocesses a list of source and target sentences, creating a document-level
@@ -89,9 +259,11 @@ class Tagger(abc.ABC):
             srcs: list of source sentences
             tgts: list of target sentences
             docids: list of document ids, mapping each sentence to a document
+            phenomena: phenomena that will be tagged. Only the annotations they need
+                are computed (see `plan`), the others being left empty.
         Returns:
             src_docs: list of source documents, each document is a list of sentences,
-                each sentence is a list of tokens
+                each sentence being the `SentenceFeatures` of its tokens
             tgt_docs: list of target documents, ...
             antecs_docs: list of document antecedent markers, where the antecend marker
                 for every sentence in the document is a list of booleans specifying if
@@ -100,14 +272,103 @@ class Tagger(abc.ABC):
                 sentence in the document is a dictionary mapping source token indices
                 to target token indices
         """
-        src_pproc = list(self.src_pipeline.pipe(srcs))
-        tgt_pproc = list(self.tgt_pipeline.pipe(tgts))
+        return self.preprocess_tgt(self.preprocess_src(srcs, docids, phenomena), tgts)
 
-        # build extra information, such as alignments and coref chains
-        alignments = self._build_alignments(src_pproc, tgt_pproc)
-        antecs = self._build_corefs(src_pproc, docids)
+    def plan(self, phenomena: Sequence[str] = PHENOMENA) -> PreprocessPlan:
+        """Works out the preprocessing stages needed to tag the given phenomena."""
+        needed: Set[str] = set()
+        for phenomenon in phenomena:
+            spec = self.phenomena.get(phenomenon) or self.register_phenomenon(
+                phenomenon
+            )
+            needed |= spec.requires
+
+        def processors(side: str) -> str:
+            if f"{side}_depparse" in needed:
+                return FULL_PROCESSORS
+            if f"{side}_pos" in needed:
+                return POS_PROCESSORS
+            return TOKENIZE_PROCESSORS
+
+        return PreprocessPlan(
+            src_processors=processors("src"),
+            tgt_processors=processors("tgt"),
+            alignment="alignment" in needed,
+            coref="coref" in needed,
+        )
+
+    def preprocess_src(
+        self,
+        srcs: List[str],
+        docids: List[int],
+        phenomena: Sequence[str] = PHENOMENA,
+    ) -> SourceData:
+        """
+        Runs the source-side preprocessing (parsing, coreference resolution and
+        feature extraction).
+        The result only depends on the source sentences, so it can be computed once
+        and shared by every set of target sentences (e.g. references and hypotheses).
+
+        Args:
+            srcs: list of source sentences
+            docids: list of document ids, mapping each sentence to a document
+            phenomena: phenomena that will be tagged (see `preprocess`)
+        Returns:
+            the features of the parsed source sentences, their antecedent markers
+                and the plan
+                for the target-side preprocessing
+        """
+        plan = self.plan(phenomena)
+        with stage("preprocess/src_parse", items=len(srcs)):
+            src_pipeline = self.pipeline(self.src_lang, plan.src_processors)
+            parsed = self._parse(src_pipeline, srcs)
+            if plan.coref:
+                # coreference resolution needs the parsed sentences, which are
+                # otherwise released as soon as their features are extracted
+                parsed = src_docs = list(parsed)
+            src_pproc = [self.features(doc) for doc in parsed]
+        if plan.coref:
+            with stage("preprocess/coref", items=len(srcs)):
+                antecs = self._build_corefs(src_docs, docids)
+        else:
+            antecs = [[] for _ in src_pproc]
+        return SourceData(docids=docids, src_pproc=src_pproc, antecs=antecs, plan=plan)
+
+    def preprocess_tgt(
+        self, source: SourceData, tgts: List[str]
+    ) -> Tuple[List[Document], List[Document], List[Antecs], List[Alignment]]:
+        """
+        Runs the target-side preprocessing (parsing, feature extraction and
+        alignment) on top of a
+        preprocessed source, building the document-level structures (see `preprocess`).
 
-        return build_docs(docids, src_pproc, tgt_pproc, antecs, alignments)  # type: ignore
+        Args:
+            source: output of `preprocess_src` for the corresponding source sentences
+            tgts: list of target sentences
+        """
+        assert len(tgts) == len(source.src_pproc), "source/target length mismatch"
+        plan = source.plan
+        with stage("preprocess/tgt_parse", items=len(tgts)):
+            tgt_pipeline = self.pipeline(self.tgt_lang, plan.tgt_processors)
+            tgt_pproc = [self.features(doc) for doc in self._parse(tgt_pipeline, tgts)]
+        if plan.alignment:
+            with stage("preprocess/alignment", items=len(tgts)):
+                alignments = self._build_alignments(source.src_pproc, tgt_pproc)
+        else:
+            alignments = [{} for _ in tgt_pproc]
+
+        with stage("preprocess/build_docs", items=len(tgts)):
+            return build_docs(source.docids, source.src_pproc, tgt_pproc, source.antecs, alignments)  # type: ignore
+
+    def _parse(
+        self, pipeline: spacy.language.Language, sents: List[str]
+    ) -> Iterable[spacy.tokens.doc.Doc]:
+        """Parses a list of sentences, reusing cached parses if a cache is set.
+        Uncached sentences are parsed lazily, so that their parses can be released
+        as soon as their features are extracted."""
+        if self.parse_cache is not None:
+            return self.parse_cache.pipe(pipeline, sents)
+        return pipeline.pipe(sents)
 
     def tag(
         self,
@@ -115,19 +376,14 @@ class Tagger(abc.ABC):
         tgt_doc: Document,
         antecs_doc: Antecs,
         align_doc: Alignment,
-        phenomena: List[str] = [
-            "lexical_cohesion",
-            "formality",
-            "verb_form",
-            "pronouns",
-        ],
+        phenomena: Sequence[str] = PHENOMENA,
     ) -> List[List[Tagging]]:
         """Tags a src-tgt document pair, returning the tags associated with each token
         in each sentence of the target document.
 
         Args:
-            src_doc: list of source sentences, each sentence is a list of tokens
-            tgt_doc: list of target sentences, each sentence is a list of tokens
+            src_doc: list of source sentences, as `SentenceFeatures`
+            tgt_doc: list of target sentences, as `SentenceFeatures`
             antecs_doc: list of coref chains, each chain is a list of booleans
             align_doc: list of alignments, each alignment is a
                 dictionary mapping source token indices to target token indices
@@ -136,141 +392,105 @@ class Tagger(abc.ABC):
             list of list of list of tags, with the tags for each token in each sentence
                 in the target document
         """
+        doc_bits = self.tag_bits(src_doc, tgt_doc, antecs_doc, align_doc, phenomena)
+        specs = [self.phenomena[phenomenon] for phenomenon in phenomena]
+        return [
+            [
+                Tagging(
+                    token=tok,
+                    tags=(
+                        [spec.name for spec in specs if bits >> spec.bit & 1]
+                        if bits
+                        else []
+                    ),
+                )
+                for tok, bits in zip(tgt.tokens, sent_bits)
+            ]
+            for tgt, sent_bits in zip(tgt_doc, doc_bits)
+        ]
+
+    def tag_bits(
+        self,
+        src_doc: Document,
+        tgt_doc: Document,
+        antecs_doc: Antecs,
+        align_doc: Alignment,
+        phenomena: Sequence[str] = PHENOMENA,
+    ) -> List[List[int]]:
+        """Same as `tag`, but returns the tags of each token as a bitmask, where the
+        bit of each phenomenon is given by `self.phenomena[phenomenon].bit`."""
         kwargs = {
             "src_doc": src_doc,
             "tgt_doc": tgt_doc,
             "antecs_doc": antecs_doc,
             "align_doc": align_doc,
         }
-        tagged_doc = [
-            [Tagging(token=tok.text, tags=[]) for tok in tgt] for tgt in tgt_doc
-        ]
+        doc_bits = [[0] * len(tgt) for tgt in tgt_doc]
         for phenomenon in phenomena:
-            assert hasattr(self, phenomenon), "Phenomenon doesn't exist"
-            phenomenon_fn = getattr(self, phenomenon)
-            # we call it with the arguments it needs
-            tags = phenomenon_fn(
-                **{
-                    k: v
-                    for k, v in kwargs.items()
-                    if k in inspect.signature(phenomenon_fn).parameters
-                }
+            spec = self.phenomena.get(phenomenon) or self.register_phenomenon(
+                phenomenon
             )
-            for i, sent_tags in enumerate(tags):
-                assert len(sent_tags) == len(tagged_doc[i])
+            # we call it with the arguments it needs
+            with stage(f"tag/{phenomenon}", items=len(tgt_doc)):
+                tags = spec.fn(**{k: kwargs[k] for k in spec.inputs})
+            mask = 1 << spec.bit
+            for sent_bits, sent_tags in zip(doc_bits, tags):
+                assert len(sent_tags) == len(sent_bits)
                 for j, tag in enumerate(sent_tags):
                     if tag:
-                        tagged_doc[i][j].tags.append(phenomenon)
-        return tagged_doc
+                        sent_bits[j] |= mask
+        return doc_bits
+
+    def register_phenomenon(self, name: str) -> Phenomenon:
+        """Registers a phenomenon method of the tagger, resolving the inputs it needs
+        and assigning it a bit in the tag bitmasks."""
+        if name in self.phenomena:
+            return self.phenomena[name]
+        assert hasattr(self, name), "Phenomenon doesn't exist"
+        fn = getattr(self, name)
+        parameters = inspect.signature(fn).parameters
+        needed = getattr(fn, "requires", ANNOTATIONS)
+        if name == "formality" and self._has_verb_formality:
+            needed |= getattr(self._verb_formality, "requires", ANNOTATIONS)
+        spec = Phenomenon(
+            name=name,
+            bit=len(self.phenomena),
+            inputs=tuple(k for k in PHENOMENON_INPUTS if k in parameters),
+            requires=needed,
+            fn=fn,
+        )
+        self.phenomena[name] = spec
+        return spec
 
     def _build_corefs(
         self, src_pproc: List[spacy.tokens.doc.Doc], docids: List[int]
     ) -> List[List[bool]]:
         """Builds coreference chains for the source (english) sentences."""
         # this is done in order to know which ambiguous pronoun need context to be resolved
-        # TODO: encapsulate this as part of the tagger?
-        en_coref = Predictor.from_path(
-            "https://storage.googleapis.com/allennlp-public-models/coref-spanbert-large-2021.03.10.tar.gz"
-        )
-        antecs = []
-        coref_errors = 0
-        prev_docid = None
-        for src, docid in zip(src_pproc, docids):
-            # we check if this is the first sentence of a new document
-            # since in this case there is no context that could help
-            if docid != prev_docid:
-                has_antec = [True] * len(src)
-            else:
-                has_antec = [False] * len(src)
-                try:
-                    coref = en_coref.predict(document=src.text)
-                    if len(src) != len(coref["document"]):
-                        raise ValueError()
-
-                    for cluster in coref["clusters"]:
-                        for mention in cluster[1:]:
-                            for i in range(mention[0], mention[1] + 1):
-                                has_antec[i] = True
-
-                # sometimes tokenizers are not consistent, or some other error happens in the coreference resolution
-                # in that case we just ignore the coref assuming it has no antencedents (might lead to some false positives)
-                except (IndexError, ValueError):
-                    coref_errors += 1
-                    print("coref error")
-
-            antecs.append(has_antec)
-            prev_docid = docid
-        return antecs
+        return self.coref.antecedents(src_pproc, docids)
 
     def _build_alignments(
         self,
-        src_pproc: List[spacy.tokens.doc.Doc],
-        tgt_pproc: List[spacy.tokens.doc.Doc],
+        src_pproc: List[SentenceFeatures],
+        tgt_pproc: List[SentenceFeatures],
     ) -> List[Dict[int, int]]:
         """Builds alignments between source and target sentences."""
-        # TODO: refactor this to use HFs rather than subprocess
-        data_inf = tempfile.NamedTemporaryFile(mode="w", encoding="utf-8")
-        for i, (src, tgt) in enumerate(zip(src_pproc, tgt_pproc)):
-            if i:
-                data_inf.write("\n")
-            src_tks = " ".join([x.text for x in src])
-            tgt_tks = " ".join([x.text for x in tgt])
-            if len(src_tks.strip()) > 0 and len(tgt_tks.strip()) > 0:
-                data_inf.write(f"{src_tks.strip()} ||| {tgt_tks.strip()}")
-            elif len(tgt_tks.strip()) > 0:
-                data_inf.write(f"{src_tks.strip()} ||| <blank>")
-            else:
-                data_inf.write("<blank> ||| <blank>")
-        data_inf.flush()
-
-        # we run it using subprocess because it the python library is not very easy to use
-        alignment_outf = tempfile.NamedTemporaryFile(mode="w", encoding="utf-8")
-
-        extra_args = []
-        if self.align_cachedir is not None:
-            extra_args.extend(["--cache_dir", self.align_cachedir])
-
-        command = [
-            "awesome-align",
-            "--output_file",
-            alignment_outf.name,
-            "--model_name_or_path",
-            self.align_model,
-            "--data_file",
-            data_inf.name,
-            "--extraction",
-            "softmax",
-            "--batch_size",
-            "32",
-            *extra_args,
-        ]
-        subproc = subprocess.Popen(
-            command,
-        )
-
-        # TODO: check if subproc exited successfully
-        subproc.wait()
-
-        with open(alignment_outf.name, "r", encoding="utf-8") as alignment_readf:
-            # TODO: refactor this to be more readable
-            alignments = []
-            for alignment_str in alignment_readf.readlines():
-                alignment = {}
-                for pair in alignment_str.strip().split(" "):
-                    src_idx, tgt_idx = pair.split("-")
-                    alignment[int(src_idx)] = int(tgt_idx)
-                alignments.append(alignment)
-
-        # For some reason, sometimes awesome-align outputs an extra alignment,
-        # which is a copy of the last one. In this case, we remove it.
-        if len(alignments) != len(src_pproc):
-            if len(alignments) == len(src_pproc) + 1:
-                alignments = alignments[:-1]
+        pairs = []
+        for src, tgt in zip(src_pproc, tgt_pproc):
+            src_tks = src.text.strip()
+            tgt_tks = tgt.text.strip()
+            if len(src_tks) > 0 and len(tgt_tks) > 0:
+                pairs.append((src_tks, tgt_tks))
+            elif len(tgt_tks) > 0:
+                pairs.append((src_tks, "<blank>"))
             else:
-                raise ValueError("Alignment length mismatch")
+                pairs.append(("<blank>", "<blank>"))
 
-        return alignments
+        if self.align_cache is not None:
+            return self.align_cache.align(self.aligner, pairs)
+        return self.aligner.align(pairs)
 
+    @requires()
     def formality(
         self,
         src_doc: Document,
@@ -281,145 +501,129 @@ class Tagger(abc.ABC):
         that require context to be disambiguated.
 
         Args:
-            src_doc: list of list of spacy tokens
-            tgt_doc: list of list of spacy tokens
+            src_doc: list of source sentence features
+            tgt_doc: list of target sentence features
             align_doc: list of alignment dictionaries, mapping source to target tokens
         Returns:
             list of list of bools indicating if a given token is formal
         """
         doc_tags = []
-        formality_classes = {
-            word: formality
-            for formality, words in self.formality_classes.items()
-            for word in words
-        }
-        formality_words = list(formality_classes.keys())
-        prev_formality = set()
+        formality_ids = self._formality_ids
+        prev_formality: Set[str] = set()
         for src, tgt, align in zip(src_doc, tgt_doc, align_doc):
-            tags = []
-            for word in tgt:
-                norm_word = self.normalize(word.text)
-                if norm_word in formality_words:
+            tags = [False] * len(tgt)
+            norm_ids = tgt.norm_ids.tolist()
+            # most sentences don't have any formality-related word
+            if not formality_ids.keys().isdisjoint(norm_ids):
+                for i, norm_id in enumerate(norm_ids):
+                    formality = formality_ids.get(norm_id)
+                    if formality is None:
+                        continue
                     # if a formality-related word is found, tag it if has appeared before
-                    if formality_classes[norm_word] in prev_formality:
-                        tags.append(True)
+                    if formality in prev_formality:
+                        tags[i] = True
                     # otherwise record that this formality class has appeared
                     else:
-                        tags.append(False)
-                        prev_formality.add(formality_classes[norm_word])
-                else:
-                    tags.append(False)
-
-                # if the subclasses implements a verb formality check, use it
-                try:
-                    verb_tags = self._verb_formality(src, tgt, align, prev_formality)
-                    assert len(tags) == len(verb_tags)
-                    tags = [a or b for a, b in zip(tags, verb_tags)]
-                except NotImplementedError:
-                    pass
+                        prev_formality.add(formality)
+
+            # if the subclasses implements a verb formality check, use it
+            if self._has_verb_formality:
+                verb_tags = self._verb_formality(src, tgt, align, prev_formality)
+                assert len(tags) == len(verb_tags)
+                tags = [a or b for a, b in zip(tags, verb_tags)]
 
             doc_tags.append(tags)
 
         return doc_tags
 
+    @requires("src_depparse", "tgt_pos", "alignment")
     def _verb_formality(
         self,
-        src_sent: spacy.tokens.doc.Doc,
-        tgt_sent: spacy.tokens.doc.Doc,
+        src_sent: SentenceFeatures,
+        tgt_sent: SentenceFeatures,
         align_sent: Dict[int, int],
         prev_formality: Set[str],
     ) -> List[bool]:
         """Checks a (preprocessed) sentence for formality-related verbs forms that
-        require context to be disambiguated. Needs to be implemented by subclasses for language-specific ruls
+        require context to be disambiguated. Implemented by subclasses for
+        language-specific rules: by default (when not overridden), it isn't called.
+
+        The features available depend on the annotations declared with `requires`:
+        with `src_depparse`, `src_sent.dep_ids` and `src_sent.heads` (the subject
+        of a verb is the token whose dep id is `string_id("nsubj")` and whose head
+        is the verb); with `tgt_pos`, the `Person` of every target token, as
+        `tgt_sent.morph_bits & self.features.morph_mask("Person", ["2"])`.
 
         Args:
-            src_sent: list of spacy tokens
-            tgt_doc: list of spacy tokens
-            align: list of alignment dictionaries, mapping source to target tokens
+            src_sent: source sentence features
+            tgt_sent: target sentence features
+            align_sent: alignment of the sentence, mapping source to target words
+            prev_formality: formality classes seen before in the document, to be
+                updated with those of the sentence
         Returns:
-            list of list of bools indicating if a given token is formal
+            list of bools indicating if a given target token is formal
         """
-        raise NotImplementedError("")
+        return [False] * len(tgt_sent)
 
+    @requires("tgt_pos")
     def verb_form(self, tgt_doc: Document) -> List[List[bool]]:
         """TODO: add documentation"""
         doc_tags = []
-        verb_forms = set()
+        verb = pos_id("VERB")
+        ambiguous = self.features.morph_mask("Tense", self.ambiguous_verbform)
+        # bitmask of the ambiguous forms that appeared before
+        verb_forms = 0
         for tgt in tgt_doc:
-            tags = []
-            for tok in tgt:
-                tag = False
-                if tok.pos_ == "VERB":
-                    amb_verb_forms = [
-                        a
-                        for a in tok.morph.get("Tense")
-                        if a in self.ambiguous_verbform
-                    ]
-                    for form in set(amb_verb_forms):
-                        if form in verb_forms:
-                            tag = True  # Set tag to true if ambiguous form appeared before
-                        else:
-                            verb_forms.add(form)  # Add ambiguous form to memory
-
-                tags.append(tag)
+            tags = [False] * len(tgt)
+            amb_verb_forms = tgt.morph_bits & np.uint64(ambiguous)
+            for i in np.flatnonzero((tgt.pos == verb) & (amb_verb_forms != 0)).tolist():
+                forms = int(amb_verb_forms[i])
+                # set tag to true if an ambiguous form appeared before
+                tags[i] = (forms & verb_forms) != 0
+                # add ambiguous forms to memory
+                verb_forms |= forms
 
             doc_tags.append(tags)
 
         return doc_tags
 
+    @requires("alignment")
     def lexical_cohesion(
         self,
         src_doc: Document,
         tgt_doc: Document,
         align_doc: Alignment,
     ) -> List[List[bool]]:
-        """TODO: add documentation"""
+        """Tags target words that are aligned to the same source word as in at least
+        `cohesion_threshold` alignments of previous sentences of the document.
+        Stop words and punctuation are ignored."""
         doc_tags = []
-        cohesion_words: Dict[str, Dict[str, int]] = defaultdict(
-            lambda: defaultdict(lambda: 0)
-        )
+        # number of previous alignments of every pair of (interned) src-tgt words
+        cohesion_counts: Counter[Tuple[int, int]] = Counter()
         for src, tgt, align in zip(src_doc, tgt_doc, align_doc):
             tags = [False] * len(tgt)
-            # get non-stopwords
-            # TODO: check if we still need `tok.text.split(" ")` or why it was added
-            src_lemmas = [
-                t if not tok.is_stop and not tok.is_punct else None
-                for tok in src
-                for t in tok.text.split(" ")
-            ]
-            lemmas_idx, tgt_lemmas = zip(
-                *[
-                    (i, t if not tok.is_stop and not tok.is_punct else None)
-                    for i, tok in enumerate(tgt)
-                    for t in tok.text.split(" ")
-                ]
-            )
-
-            tmp_cohesion_words: Dict[str, Dict[str, int]] = defaultdict(
-                lambda: defaultdict(lambda: 0)
-            )
+            src_ids = src.word_ids.tolist()
+            src_content = src.words(~(src.is_stop | src.is_punct)).tolist()
+            tgt_ids = tgt.word_ids.tolist()
+            tgt_content = tgt.words(~(tgt.is_stop | tgt.is_punct)).tolist()
+            tgt_tokens = tgt.word_tokens.tolist()
+
+            # counts are only updated at the end of the sentence, so that words
+            # aligned in the current sentence are not tagged because of each other
+            aligned = []
             for s, t in align.items():
-                src_lemma = src_lemmas[s]
-                tgt_lemma = tgt_lemmas[t]
-                # for every aligned src-tgt word, check if it has appear more than
-                # `cohesion_threshold` times in previous sentences
-                # and update the temporary cohesion words dictionary
-                if src_lemma is not None and tgt_lemma is not None:
-                    if cohesion_words[src_lemma][tgt_lemma] >= self.cohesion_threshold:
-                        tags[lemmas_idx[t]] = True
-                    tmp_cohesion_words[src_lemma][tgt_lemma] += 1
-
-            # update global cohesion words with the temporary dictionary
-            for src_lemma in tmp_cohesion_words.keys():
-                for tgt_lemma in tmp_cohesion_words[src_lemma].keys():
-                    cohesion_words[src_lemma][tgt_lemma] += tmp_cohesion_words[
-                        src_lemma
-                    ][tgt_lemma]
+                if src_content[s] and tgt_content[t]:
+                    pair = (src_ids[s], tgt_ids[t])
+                    if cohesion_counts[pair] >= self.cohesion_threshold:
+                        tags[tgt_tokens[t]] = True
+                    aligned.append(pair)
+            cohesion_counts.update(aligned)
 
             doc_tags.append(tags)
 
         return doc_tags
 
+    @requires("src_pos", "tgt_pos", "alignment", "coref")
     def pronouns(
         self,
         src_doc: Document,
@@ -429,38 +633,36 @@ class Tagger(abc.ABC):
     ) -> List[List[bool]]:
         """TODO: add documentation"""
         doc_tags = []
+        pron = pos_id("PRON")
+        # ambiguous pronouns by id of their (normalized) form
+        ambiguous_pronouns = {
+            string_id(src_word): {string_id(tgt_word) for tgt_word in tgt_words}
+            for src_word, tgt_words in self.ambiguous_pronouns.items()
+        }
         for src, tgt, align, antecs in zip(src_doc, tgt_doc, align_doc, antecs_doc):
             tags = [False] * len(tgt)
-            if not self.ambiguous_pronouns:
+            # whether every word is a pronoun (and not punctuation)
+            src_pron = src.words((src.pos == pron) & ~src.is_punct)
+            if not ambiguous_pronouns or not src_pron.any():
                 doc_tags.append(tags)
                 continue
 
-            src_text, src_pos = zip(
-                *[
-                    (tok.text, tok.pos_) if not tok.is_punct else (None, None)
-                    for tok in src
-                    for _ in tok.text.split(" ")
-                ]
-            )
-            tgt_idx, tgt_text, tgt_pos = zip(
-                *[
-                    (i, *((tok.text, tok.pos_) if not tok.is_punct else (None, None)))
-                    for i, tok in enumerate(tgt)
-                    for _ in tok.text.split(" ")
-                ]
-            )
+            src_is_pron = src_pron.tolist()
+            src_norms = src.words(src.norm_ids).tolist()
+            tgt_is_pron = tgt.words((tgt.pos == pron) & ~tgt.is_punct).tolist()
+            tgt_norms = tgt.words(tgt.norm_ids).tolist()
+            tgt_idx = tgt.word_tokens.tolist()
 
             for s, r in align.items():
-                if s > len(src_text):
-                    print(f"IndexError{s}: {src_text}")
-                if r > len(tgt_text):
-                    print(f"IndexError{r}: {tgt_text}")
+                if s > len(src_is_pron):
+                    print(f"IndexError{s}: {src.tokens}")
+                if r > len(tgt_is_pron):
+                    print(f"IndexError{r}: {tgt.tokens}")
                 if (
                     not antecs[s]
-                    and src_pos[s] == "PRON"
-                    and tgt_pos[r] == "PRON"
-                    and self.normalize(tgt_text[r])
-                    in self.ambiguous_pronouns.get(self.normalize(src_text[s]), [])
+                    and src_is_pron[s]
+                    and tgt_is_pron[r]
+                    and tgt_norms[r] in ambiguous_pronouns.get(src_norms[s], ())
                 ):
                     tags[tgt_idx[r]] = True
             doc_tags.append(tags)
@@ -0,0 +1,212 @@
+"""
+Compact, columnar storage for tagged documents.
+
+A tag file is an (uncompressed) `.npz` archive with the following arrays:
+    vocab_data: utf-8 bytes of every distinct token, concatenated
+    vocab_offsets: (V + 1) offsets of each token in `vocab_data`
+    token_ids: (N,) vocabulary id of every token in the corpus
+    tag_bits: (N,) bitmask of the tags of every token, bit `i` being `tag_names[i]`
+    tag_names: names of the tags
+    sent_offsets: (S + 1) offsets of each sentence in the token arrays
+    doc_offsets: (D + 1) offsets of each document in `sent_offsets`
+
+Since the arrays are stored uncompressed, `TagStore` memory-maps them directly from
+the archive, and only builds `Tagging` objects for the documents that are accessed.
+"""
+
+import argparse
+import json
+import zipfile
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from muda.tagger import Tagging
+
+TaggedDoc = List[List[Tagging]]
+
+
+def _bits_dtype(num_tags: int) -> Any:
+    for dtype in (np.uint8, np.uint16, np.uint32, np.uint64):
+        if num_tags <= np.dtype(dtype).itemsize * 8:
+            return dtype
+    raise ValueError(f"Too many tags ({num_tags}) to store as a bitmask")
+
+
+def write_tags(
+    path: str,
+    tagged_docs: Sequence[TaggedDoc],
+    tag_names: Optional[Sequence[str]] = None,
+) -> None:
+    """Writes a list of tagged documents to `path` in the columnar format.
+
+    Args:
+        path: output file (`.npz`)
+        tagged_docs: tagged documents, as returned by `Tagger.tag`
+        tag_names: tag names, in the order in which they are restored for each token.
+            Tags not in this list are added in order of appearance.
+    """
+    tag_bit = {tag: i for i, tag in enumerate(tag_names or [])}
+    vocab: Dict[str, int] = {}
+    token_ids = []
+    tag_bits = []
+    sent_offsets = [0]
+    doc_offsets = [0]
+    for doc in tagged_docs:
+        for sent in doc:
+            for tagging in sent:
+                token_ids.append(vocab.setdefault(tagging.token, len(vocab)))
+                bits = 0
+                for tag in tagging.tags:
+                    bits |= 1 << tag_bit.setdefault(tag, len(tag_bit))
+                tag_bits.append(bits)
+            sent_offsets.append(len(token_ids))
+        doc_offsets.append(len(sent_offsets) - 1)
+
+    encoded = [token.encode("utf-8") for token in vocab]
+    vocab_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(token) for token in encoded], out=vocab_offsets[1:])
+
+    with open(path, "wb") as f:
+        np.savez(
+            f,
+            vocab_data=np.frombuffer(b"".join(encoded), dtype=np.uint8),
+            vocab_offsets=vocab_offsets,
+            token_ids=np.array(token_ids, dtype=np.int32),
+            tag_bits=np.array(tag_bits, dtype=_bits_dtype(len(tag_bit))),
+            tag_names=np.array(list(tag_bit), dtype=str),
+            sent_offsets=np.array(sent_offsets, dtype=np.int64),
+            doc_offsets=np.array(doc_offsets, dtype=np.int64),
+        )
+
+
+def _mmap_npz(path: str) -> Dict[str, np.ndarray]:
+    """Memory-maps the arrays of an uncompressed `.npz` archive."""
+    arrays = {}
+    with zipfile.ZipFile(path) as zf, open(path, "rb") as f:
+        for info in zf.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{path} is compressed and can't be memory-mapped")
+            # skip the zip local file header to get to the .npy data
+            f.seek(info.header_offset + 26)
+            name_len = int.from_bytes(f.read(2), "little")
+            extra_len = int.from_bytes(f.read(2), "little")
+            f.seek(name_len + extra_len, 1)
+
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+
+            name = info.filename[: -len(".npy")]
+            if int(np.prod(shape)) == 0:
+                arrays[name] = np.empty(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(
+                    path,
+                    dtype=dtype,
+                    mode="r",
+                    offset=f.tell(),
+                    shape=shape,
+                    order="F" if fortran_order else "C",
+                )
+    return arrays
+
+
+class TagStore:
+    """Read-only, memory-mapped view of a tag file written by `write_tags`.
+
+    Documents are accessed by index, and are returned in the same format as
+    `Tagger.tag` (a list of sentences, each a list of `Tagging`)."""
+
+    def __init__(self, path: str) -> None:
+        arrays = _mmap_npz(path)
+        self.vocab_data = arrays["vocab_data"]
+        self.vocab_offsets = arrays["vocab_offsets"]
+        self.token_ids = arrays["token_ids"]
+        self.tag_bits = arrays["tag_bits"]
+        self.tag_names: List[str] = [str(tag) for tag in arrays["tag_names"]]
+        self.sent_offsets = arrays["sent_offsets"]
+        self.doc_offsets = arrays["doc_offsets"]
+        self._tokens: Dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.doc_offsets) - 1
+
+    def token(self, token_id: int) -> str:
+        """Decodes (and caches) a token from the vocabulary."""
+        if token_id not in self._tokens:
+            start, end = self.vocab_offsets[token_id : token_id + 2]
+            self._tokens[token_id] = bytes(self.vocab_data[start:end]).decode("utf-8")
+        return self._tokens[token_id]
+
+    def tags(self, bits: int) -> List[str]:
+        return [tag for i, tag in enumerate(self.tag_names) if bits >> i & 1]
+
+    def __getitem__(self, idx: int) -> TaggedDoc:
+        if not 0 <= idx < len(self):
+            raise IndexError(idx)
+        sent_start, sent_end = self.doc_offsets[idx : idx + 2]
+        doc = []
+        for s in range(sent_start, sent_end):
+            start, end = self.sent_offsets[s : s + 2]
+            doc.append(
+                [
+                    Tagging(token=self.token(token_id), tags=self.tags(bits))
+                    for token_id, bits in zip(
+                        self.token_ids[start:end].tolist(),
+                        self.tag_bits[start:end].tolist(),
+                    )
+                ]
+            )
+        return doc
+
+    def __iter__(self) -> Iterator[TaggedDoc]:
+        for idx in range(len(self)):
+            yield self[idx]
+
+
+def write_dump(
+    path: str,
+    tagged_docs: Sequence[TaggedDoc],
+    tag_names: Optional[Sequence[str]] = None,
+) -> None:
+    """Writes tagged documents as written by `--dump-tags`: in the columnar format
+    if `path` ends with `.npz` (see `write_tags`), as JSON otherwise."""
+    if path.endswith(".npz"):
+        write_tags(path, tagged_docs, tag_names=tag_names)
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                [[[t._asdict() for t in sent] for sent in doc] for doc in tagged_docs],
+                f,
+                indent=2,
+            )
+
+
+def read_dump(path: str) -> List[TaggedDoc]:
+    """Reads tagged documents written by `write_dump`."""
+    if path.endswith(".npz"):
+        return list(TagStore(path))
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return [
+        [[Tagging(token=t["token"], tags=t["tags"]) for t in sent] for sent in doc]
+        for doc in data
+    ]
+
+
+def convert_json(json_path: str, output_path: str) -> None:
+    """Converts a JSON tag dump (as written by `--dump-tags`) to the columnar format."""
+    write_tags(output_path, read_dump(json_path))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Converts a JSON tag dump to the columnar (.npz) format"
+    )
+    parser.add_argument("json_file", help="JSON tag dump, as written by --dump-tags")
+    parser.add_argument("output_file", help="Output .npz file")
+    args = parser.parse_args()
+    convert_json(args.json_file, args.output_file)
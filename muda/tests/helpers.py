@@ -0,0 +1,43 @@
+from typing import Callable, List, Tuple
+
+from muda.parallel import TaggedDoc, doc_spans
+from muda.tagger import Tagging
+
+
+class FakeTagFn:
+    """Fake `TagFn` (see `muda.incremental`), which tags every token of the target
+    sentences with `tags(src, tgt, token)` and records its calls, without loading
+    any model.
+
+    Args:
+        tags: tags of a token, given its source and target sentences
+        fail_after: number of calls after which it raises a `RuntimeError`, if
+            non-negative
+    """
+
+    def __init__(
+        self, tags: Callable[[str, str, str], List[str]], fail_after: int = -1
+    ) -> None:
+        self.tags = tags
+        self.fail_after = fail_after
+        self.calls: List[Tuple[List[str], List[List[str]], List[int]]] = []
+
+    def __call__(
+        self, srcs: List[str], tgt_sets: List[List[str]], docids: List[int]
+    ) -> List[List[TaggedDoc]]:
+        if len(self.calls) == self.fail_after:
+            raise RuntimeError("crash")
+        self.calls.append((srcs, tgt_sets, docids))
+        return [
+            [
+                [
+                    [
+                        Tagging(token=tok, tags=self.tags(srcs[i], tgts[i], tok))
+                        for tok in tgts[i].split()
+                    ]
+                    for i in range(start, end)
+                ]
+                for start, end in doc_spans(docids)
+            ]
+            for tgts in tgt_sets
+        ]
@@ -0,0 +1,30 @@
+import unittest
+
+from muda.batching import length_batches, padded_tokens
+
+
+class TestLengthBatches(unittest.TestCase):
+    def test_batches_cover_all_items(self) -> None:
+        lengths = [5, 1, 30, 2, 8, 1, 3]
+        batches = length_batches(lengths, max_size=3)
+        self.assertEqual(sorted(i for batch in batches for i in batch), list(range(7)))
+        self.assertTrue(all(len(batch) <= 3 for batch in batches))
+        # batching by length pads less than batching in order
+        in_order = [list(range(i, min(i + 3, 7))) for i in range(0, 7, 3)]
+        self.assertLess(
+            padded_tokens(lengths, batches), padded_tokens(lengths, in_order)
+        )
+
+    def test_token_budget(self) -> None:
+        lengths = [4, 4, 4, 4, 10, 2]
+        batches = length_batches(lengths, max_size=32, max_tokens=12)
+        self.assertEqual(batches, [[5, 0, 1], [2, 3], [4]])
+
+    def test_in_order(self) -> None:
+        lengths = [4, 10, 2, 4, 4]
+        self.assertEqual(
+            length_batches(lengths, max_size=2, by_length=False), [[0, 1], [2, 3], [4]]
+        )
+        # the budget applies to the longest item of the batch, wherever it is
+        batches = length_batches(lengths, max_size=32, max_tokens=12, by_length=False)
+        self.assertEqual(batches, [[0], [1], [2, 3, 4]])
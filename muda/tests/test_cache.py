@@ -0,0 +1,127 @@
+import itertools
+import os
+import tempfile
+import unittest
+from typing import Dict, List, Tuple
+from unittest import mock
+
+import spacy
+
+from muda.aligner import Aligner
+from muda.cache import AlignmentCache, ParseCache, SqliteStore
+
+
+class TestParseCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = ParseCache(self.tmpdir.name)
+        self.nlp = spacy.blank("en")
+        self.texts = ["Hello world !", "Bye", "Hello world !"]
+
+    def tearDown(self) -> None:
+        self.tmpdir.cleanup()
+
+    def parse(self, texts: List[str]) -> Tuple[List[str], List[str]]:
+        """Parses through the cache, returning the texts of the parses and of the
+        sentences the pipeline was run on."""
+        with mock.patch.object(self.nlp, "pipe", wraps=self.nlp.pipe) as pipe:
+            docs = [doc.text for doc in self.cache.pipe(self.nlp, texts)]
+        return docs, [text for call in pipe.call_args_list for text in call[0][0]]
+
+    def test_hits(self) -> None:
+        docs, parsed = self.parse(self.texts)
+        self.assertEqual(docs, self.texts)
+        # duplicates are only parsed once
+        self.assertEqual(parsed, ["Hello world !", "Bye"])
+
+        docs, parsed = self.parse(["Bye", "New", "Hello world !"])
+        self.assertEqual(docs, ["Bye", "New", "Hello world !"])
+        self.assertEqual(parsed, ["New"])
+
+    def test_fingerprint(self) -> None:
+        self.parse(self.texts)
+        # another pipeline doesn't reuse the parses
+        self.nlp.add_pipe("sentencizer")
+        docs, parsed = self.parse(self.texts)
+        self.assertEqual(docs, self.texts)
+        self.assertEqual(parsed, ["Hello world !", "Bye"])
+
+
+class FakeAligner(Aligner):
+    """Aligns every source word to the target word with the same index, recording
+    the pairs it aligned."""
+
+    def __init__(self, extraction: str = "softmax") -> None:
+        super().__init__("fake", extraction=extraction)
+        self.aligned: List[Tuple[str, str]] = []
+
+    def align(self, pairs: List[Tuple[str, str]]) -> List[Dict[int, int]]:
+        self.aligned.extend(pairs)
+        return [
+            {i: i for i in range(min(len(src.split()), len(tgt.split())))}
+            for src, tgt in pairs
+        ]
+
+
+class TestAlignmentCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = AlignmentCache(self.tmpdir.name)
+        self.pairs = [("a b", "A B C"), ("c", "C"), ("a b", "A B C")]
+
+    def tearDown(self) -> None:
+        self.tmpdir.cleanup()
+
+    def test_hits(self) -> None:
+        aligner = FakeAligner()
+        expected = [{0: 0, 1: 1}, {0: 0}, {0: 0, 1: 1}]
+        self.assertEqual(self.cache.align(aligner, self.pairs), expected)
+        self.assertEqual(aligner.aligned, [("a b", "A B C"), ("c", "C")])
+
+        aligner.aligned = []
+        alignments = self.cache.align(aligner, [("d", "D")] + self.pairs)
+        self.assertEqual(alignments, [{0: 0}] + expected)
+        self.assertEqual(aligner.aligned, [("d", "D")])
+        # including the duplicate of the first call
+        self.assertEqual((self.cache.hits, self.cache.lookups), (4, 7))
+
+    def test_no_load_on_hits(self) -> None:
+        self.cache.align(FakeAligner(), self.pairs)
+        aligner = Aligner("fake")
+        # the model is only loaded if some pair isn't cached
+        with mock.patch.object(aligner, "load", side_effect=AssertionError) as load:
+            alignments = self.cache.align(aligner, self.pairs[:2])
+            self.assertEqual(aligner.align([]), [])
+        self.assertEqual(alignments, [{0: 0, 1: 1}, {0: 0}])
+        load.assert_not_called()
+
+    def test_key(self) -> None:
+        self.cache.align(FakeAligner(), self.pairs)
+        # alignments extracted with another method aren't reused
+        aligner = FakeAligner(extraction="entmax")
+        self.cache.align(aligner, self.pairs)
+        self.assertEqual(aligner.aligned, [("a b", "A B C"), ("c", "C")])
+
+
+class TestSqliteStore(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "store.sqlite")
+
+    def tearDown(self) -> None:
+        self.tmpdir.cleanup()
+
+    def test_lru_eviction(self) -> None:
+        store = SqliteStore(self.path, max_size=10)
+        # a distinct access time for every operation
+        with mock.patch("muda.cache.time.time", side_effect=itertools.count()):
+            store.put_many({"a": b"aaaa", "b": b"bbbb"})
+            self.assertEqual(store.get_many(["a"]), {"a": b"aaaa"})
+            # "b" is the least recently used
+            store.put_many({"c": b"cccc"})
+            self.assertEqual(
+                store.get_many(["a", "b", "c"]), {"a": b"aaaa", "c": b"cccc"}
+            )
+            # a value larger than the store evicts everything else
+            store.put_many({"d": b"d" * 10})
+            self.assertEqual(store.get_many(["a", "c", "d"]), {"d": b"d" * 10})
@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+from typing import List
+
+from muda.checkpoint import RunDir, tag_resumable
+from muda.tests.helpers import FakeTagFn
+
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "run")
+        self.tag_fn = FakeTagFn(self.tags)
+
+        self.srcs = ["a b", "c", "d e", "f", "g"]
+        self.refs = ["A B", "C", "D E", "F", "G"]
+        self.hyps = ["A", "C X", "D E", "F", "H"]
+        self.docids = [0, 0, 1, 2, 3]
+
+    def tearDown(self) -> None:
+        self.tmpdir.cleanup()
+
+    def run_dir(self, resume: bool = False) -> RunDir:
+        return RunDir(self.path, "test", ["a", "b"], shard_size=2, resume=resume)
+
+    @staticmethod
+    def tags(src: str, tgt: str, tok: str) -> List[str]:
+        """Tags the tokens of the first half of the alphabet with "a", and every
+        token of a sentence of two or more tokens with "b"."""
+        return [
+            tag
+            for tag, has_tag in (("a", tok <= "M"), ("b", len(tgt.split()) > 1))
+            if has_tag
+        ]
+
+    def srcs_tagged(self) -> List[List[str]]:
+        return [srcs for srcs, _, _ in self.tag_fn.calls]
+
+    def test_resume(self) -> None:
+        tgt_sets = [self.refs, self.hyps]
+        expected = self.tag_fn(self.srcs, tgt_sets, self.docids)
+        self.tag_fn.calls = []
+
+        # crash while tagging the second shard
+        self.tag_fn.fail_after = 1
+        with self.assertRaises(RuntimeError):
+            tag_resumable(self.run_dir(), self.tag_fn, self.srcs, tgt_sets, self.docids)
+        self.assertEqual(self.srcs_tagged(), [["a b", "c", "d e"]])
+
+        # resuming is explicit
+        with self.assertRaises(ValueError):
+            tag_resumable(self.run_dir(), self.tag_fn, self.srcs, tgt_sets, self.docids)
+
+        self.tag_fn.fail_after = -1
+        self.tag_fn.calls = []
+        tagged = tag_resumable(
+            self.run_dir(resume=True), self.tag_fn, self.srcs, tgt_sets, self.docids
+        )
+        self.assertEqual(tagged, expected)
+        # only the second shard was tagged again
+        self.assertEqual(self.srcs_tagged(), [["f", "g"]])
+
+        # the inputs changed, so the run can't be resumed
+        with self.assertRaises(ValueError):
+            tag_resumable(
+                self.run_dir(resume=True),
+                self.tag_fn,
+                self.srcs,
+                [self.refs, self.refs],
+                self.docids,
+            )
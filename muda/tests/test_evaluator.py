@@ -0,0 +1,71 @@
+import unittest
+from typing import Any, Dict, List, Tuple
+from unittest import mock
+
+import spacy
+
+from muda.aligner import Aligner
+from muda.evaluator import MudaEvaluator
+from muda.metrics import compute_metrics
+from muda.tagger import Tagger
+
+
+class TestEvaluator(unittest.TestCase):
+    def setUp(self) -> None:
+        self.srcs = ["you know", "you see it", "you"]
+        self.refs = ["du weißt", "du siehst es", "du"]
+        self.hyps = ["Sie wissen", "du siehst es", "Sie"]
+        self.docids = [0, 0, 1]
+        # blank pipelines (tokenization only) and monotonic alignments, so that no
+        # model is loaded
+        self.parsed: List[Tuple[str, List[str]]] = []
+        pipelines: Dict[str, spacy.language.Language] = {}
+
+        def pipe(lang: str, texts: List[str]) -> List[spacy.tokens.doc.Doc]:
+            self.parsed.append((lang, list(texts)))
+            nlp = pipelines.setdefault(lang, spacy.blank(lang))
+            return list(nlp.pipe(texts))
+
+        patches: List[Any] = [
+            mock.patch.object(
+                Tagger,
+                "_parse",
+                lambda tagger, pipeline, sents: pipe(pipeline, sents),
+            ),
+            mock.patch.object(
+                Tagger, "pipeline", lambda tagger, lang, processors: lang
+            ),
+            mock.patch.object(
+                Aligner,
+                "align",
+                lambda aligner, pairs: [
+                    {i: i for i in range(len(tgt.split()))} for _, tgt in pairs
+                ],
+            ),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        self.evaluator = MudaEvaluator(
+            "de",
+            self.srcs,
+            self.refs,
+            self.docids,
+            phenomena=["formality", "lexical_cohesion"],
+        )
+
+    def test_score(self) -> None:
+        prec, rec, f1 = self.evaluator.score(self.refs)
+        self.assertEqual(f1["formality"], 1.0)
+
+        prec, rec, f1 = self.evaluator.score(self.hyps)
+        expected = compute_metrics(
+            self.evaluator.ref_tags, self.evaluator.tag(self.hyps)
+        )
+        self.assertEqual((prec, rec, f1), expected)
+        self.assertEqual(rec["formality"], 0.0)
+
+        # the source sentences are only parsed once, when the evaluator is created
+        self.assertEqual([lang for lang, _ in self.parsed].count("en"), 1)
+        self.assertEqual(self.parsed[-1], ("de", self.hyps))
@@ -0,0 +1,83 @@
+import unittest
+
+import spacy
+from spacy.tokens import Doc
+
+from muda.features import FeatureExtractor, pos_id, string_id
+from muda.tagger import Tagger
+
+
+class TestFeatures(unittest.TestCase):
+    def setUp(self) -> None:
+        self.extractor = FeatureExtractor(Tagger.normalize)
+        nlp = spacy.blank("en")
+        # stanza tokens can contain spaces
+        self.doc = Doc(
+            nlp.vocab,
+            words=["It", "was", "New York", "!"],
+            pos=["PRON", "VERB", "PROPN", "PUNCT"],
+            morphs=["", "Mood=Ind|Tense=Imp,Past", "", ""],
+        )
+
+    def test_features(self) -> None:
+        features = self.extractor(self.doc)
+        self.assertEqual(len(features), 4)
+        self.assertEqual(features.tokens, ["It", "was", "New York", "!"])
+        self.assertEqual(features.pos[:2].tolist(), [pos_id("PRON"), pos_id("VERB")])
+        self.assertEqual(features.is_punct.tolist(), [False, False, False, True])
+        self.assertEqual(features.is_stop[:2].tolist(), [True, True])
+        self.assertEqual(
+            features.norm_ids.tolist(),
+            [self.extractor.norm_id(tok.text) for tok in self.doc],
+        )
+        self.assertEqual(features.norm_ids[0], string_id("it"))
+
+        masks = features.morph_bits.tolist()
+        self.assertEqual(masks[1], self.extractor.morph_mask("Tense", ["Past", "Imp"]))
+        self.assertEqual(masks[0], 0)
+        self.assertNotEqual(masks[1] & self.extractor.morph_mask("Tense", ["Past"]), 0)
+        self.assertEqual(masks[1] & self.extractor.morph_mask("Tense", ["Fut"]), 0)
+        # the sentence wasn't parsed
+        with self.assertRaises(ValueError):
+            features.heads
+
+    def test_syntax(self) -> None:
+        doc = Doc(
+            self.doc.vocab,
+            words=["You", "know", "it"],
+            pos=["PRON", "VERB", "PRON"],
+            morphs=["Person=2", "Person=2|Tense=Pres", "Person=3"],
+            heads=[1, 1, 1],
+            deps=["nsubj", "ROOT", "obj"],
+        )
+        features = self.extractor(doc)
+        self.assertEqual(features.heads.tolist(), [1, 1, 1])
+        self.assertEqual(
+            features.dep_ids.tolist(),
+            [string_id("nsubj"), string_id("ROOT"), string_id("obj")],
+        )
+        second = self.extractor.morph_mask("Person", ["2"])
+        self.assertEqual(
+            (features.morph_bits & second).astype(bool).tolist(), [True, True, False]
+        )
+        self.assertNotEqual(
+            features.morph_bits[1] & self.extractor.morph_mask("Tense", ["Pres"]), 0
+        )
+
+    def test_words(self) -> None:
+        features = self.extractor(self.doc)
+        strings = self.doc.vocab.strings
+        self.assertEqual(features.word_tokens.tolist(), [0, 1, 2, 2, 3])
+        self.assertEqual(
+            features.word_ids.tolist(),
+            [strings[word] for word in features.text.split(" ")],
+        )
+
+    def test_ids_are_stable(self) -> None:
+        features = self.extractor(self.doc)
+        # another extractor, which has seen other words first
+        extractor = FeatureExtractor(Tagger.normalize)
+        extractor.norm_id("other")
+        self.assertEqual(
+            extractor(self.doc).norm_ids.tolist(), features.norm_ids.tolist()
+        )
@@ -0,0 +1,44 @@
+import os
+import tempfile
+import unittest
+
+from muda.incremental import TagsCache, tag_incremental
+from muda.tests.helpers import FakeTagFn
+
+
+class TestIncremental(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = TagsCache(os.path.join(self.tmpdir.name, "tags.sqlite"), "test")
+        # tags every token with the source sentence it comes from
+        self.tag_fn = FakeTagFn(lambda src, tgt, tok: [src])
+
+        self.srcs = ["a b", "c", "d e", "f"]
+        self.refs = ["A B", "C", "D E", "F"]
+        self.docids = [0, 0, 1, 2]
+
+    def tearDown(self) -> None:
+        self.tmpdir.cleanup()
+
+    def test_only_changed_documents_are_tagged(self) -> None:
+        hyps = ["A X", "C", "D E", "F"]
+        expected = self.tag_fn(self.srcs, [self.refs, hyps], self.docids)
+        self.tag_fn.calls = []
+
+        tagged = tag_incremental(
+            self.cache, self.tag_fn, self.srcs, [self.refs, hyps], self.docids
+        )
+        self.assertEqual(tagged, expected)
+        # documents 1 and 2 are the same in both sets, and cached after the first
+        self.assertEqual(len(self.tag_fn.calls), 2)
+
+        new_hyps = ["A X", "C", "D Y", "F"]
+        self.tag_fn.calls = []
+        tagged = tag_incremental(
+            self.cache, self.tag_fn, self.srcs, [self.refs, new_hyps], self.docids
+        )
+        self.assertEqual(
+            tagged, self.tag_fn(self.srcs, [self.refs, new_hyps], self.docids)
+        )
+        # only the hypothesis of the second document changed
+        self.assertEqual(self.tag_fn.calls[0][:2], (["d e"], [["D Y"]]))
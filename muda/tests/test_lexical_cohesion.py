@@ -0,0 +1,84 @@
+import random
+import unittest
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import spacy
+from spacy.tokens import Doc
+
+from muda.langs import create_tagger
+
+
+def string_cohesion(
+    src_docs: List[Doc],
+    tgt_docs: List[Doc],
+    aligns: List[Dict[int, int]],
+    threshold: int,
+) -> List[List[bool]]:
+    """Lexical cohesion on the text of the words of the spaCy tokens (with the
+    same semantics as `Tagger.lexical_cohesion`)."""
+
+    def words(doc: Doc) -> List[Optional[str]]:
+        return [
+            None if tok.is_stop or tok.is_punct else word
+            for tok in doc
+            for word in tok.text.split(" ")
+        ]
+
+    counts: Counter[Tuple[str, str]] = Counter()
+    doc_tags = []
+    for src, tgt, align in zip(src_docs, tgt_docs, aligns):
+        tgt_tokens = [i for i, tok in enumerate(tgt) for _ in tok.text.split(" ")]
+        src_words, tgt_words = words(src), words(tgt)
+        tags = [False] * len(tgt)
+        aligned = []
+        for s, t in align.items():
+            src_word, tgt_word = src_words[s], tgt_words[t]
+            if src_word is not None and tgt_word is not None:
+                pair = (src_word, tgt_word)
+                tags[tgt_tokens[t]] |= counts[pair] >= threshold
+                aligned.append(pair)
+        counts.update(aligned)
+        doc_tags.append(tags)
+    return doc_tags
+
+
+class TestLexicalCohesion(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tagger = create_tagger("de")
+        self.rng = random.Random(0)
+        self.src_nlp = spacy.blank("en")
+        self.tgt_nlp = spacy.blank("de")
+
+    def random_doc(self, nlp: spacy.language.Language, vocab: List[str]) -> Doc:
+        return Doc(nlp.vocab, words=self.rng.choices(vocab, k=self.rng.randint(1, 8)))
+
+    def test_string_version(self) -> None:
+        # content words, stop words, punctuation and tokens with spaces
+        src_vocab = ["house", "cat", "red", "the", "and", ",", "New York", "car"]
+        tgt_vocab = ["Haus", "Katze", "rot", "die", "und", ",", "New York", "Auto"]
+        src_docs = [self.random_doc(self.src_nlp, src_vocab) for _ in range(40)]
+        tgt_docs = [self.random_doc(self.tgt_nlp, tgt_vocab) for _ in range(40)]
+        aligns = []
+        for src, tgt in zip(src_docs, tgt_docs):
+            num_src = sum(len(tok.text.split(" ")) for tok in src)
+            num_tgt = sum(len(tok.text.split(" ")) for tok in tgt)
+            aligns.append(
+                {
+                    s: self.rng.randrange(num_tgt)
+                    for s in range(num_src)
+                    if self.rng.random() < 0.8
+                }
+            )
+
+        src_features = [self.tagger.features(doc) for doc in src_docs]
+        tgt_features = [self.tagger.features(doc) for doc in tgt_docs]
+        for threshold in range(4):
+            self.tagger.cohesion_threshold = threshold
+            expected = string_cohesion(src_docs, tgt_docs, aligns, threshold)
+            self.assertEqual(
+                self.tagger.lexical_cohesion(src_features, tgt_features, aligns),
+                expected,
+            )
+            if threshold > 0:
+                self.assertTrue(any(any(tags) for tags in expected))
@@ -0,0 +1,42 @@
+import unittest
+
+from muda.metrics import TagEncoder, compute_metrics, count_matches_arrays
+from muda.tagger import Tagging
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self) -> None:
+        self.refs = [
+            [
+                [
+                    Tagging(token="a", tags=["formality"]),
+                    Tagging(token="b", tags=[]),
+                    Tagging(token="A,", tags=["formality", "pronouns"]),
+                ]
+            ]
+        ]
+        self.hyps = [
+            [
+                [
+                    Tagging(token="a", tags=["formality"]),
+                    Tagging(token="a", tags=["pronouns"]),
+                    Tagging(token="c", tags=["formality"]),
+                ]
+            ]
+        ]
+
+    def test_compute_metrics(self) -> None:
+        prec, rec, f1 = compute_metrics(self.refs, self.hyps)
+        self.assertEqual(dict(prec), {"formality": 0.5, "pronouns": 1.0})
+        self.assertEqual(dict(rec), {"formality": 0.5, "pronouns": 1.0})
+        self.assertEqual(f1, {"formality": 0.5, "pronouns": 1.0})
+
+    def test_batches(self) -> None:
+        encoder = TagEncoder()
+        refs = encoder.encode(self.refs * 5)
+        hyps = encoder.encode(self.hyps * 5)
+        tags = list(encoder.tag_bits)
+        self.assertEqual(
+            count_matches_arrays(refs, hyps, tags, batch_size=2),
+            count_matches_arrays(refs, hyps, tags),
+        )
@@ -0,0 +1,53 @@
+import unittest
+from typing import Any, Callable, List, Tuple
+
+from muda.parallel import WorkerPool, balance_shards, doc_spans
+from muda.tests.helpers import FakeTagFn
+
+
+class FakePool:
+    """Runs the tasks of a `WorkerPool` in the current process, with a fake tagger."""
+
+    def __init__(self, tag_fn: FakeTagFn) -> None:
+        self.tag_fn = tag_fn
+
+    def map(
+        self, fn: Callable[..., Any], tasks: List[Tuple[Any, ...]], chunksize: int
+    ) -> List[Any]:
+        return [(self.tag_fn(*task[:3]), None) for task in tasks]
+
+    def terminate(self) -> None:
+        pass
+
+
+class TestParallel(unittest.TestCase):
+    def setUp(self) -> None:
+        self.srcs = ["a b c d", "e", "f", "g h", "i j k", "l"]
+        self.refs = [src.upper() for src in self.srcs]
+        self.docids = [5, 5, 2, 5, 7, 7]
+        # tags every token with the source sentence it comes from
+        self.tag_fn = FakeTagFn(lambda src, tgt, tok: [src])
+
+    def test_doc_spans(self) -> None:
+        self.assertEqual(doc_spans(self.docids), [(0, 2), (2, 3), (3, 4), (4, 6)])
+        self.assertEqual(doc_spans([]), [])
+
+    def test_balance_shards(self) -> None:
+        weights = [5, 1, 1, 3, 2]
+        shards = balance_shards(weights, 2)
+        self.assertEqual(sorted(i for shard in shards for i in shard), list(range(5)))
+        self.assertEqual([sum(weights[i] for i in shard) for shard in shards], [6, 6])
+        self.assertEqual(shards, [sorted(shard) for shard in shards])
+        # empty shards are dropped
+        self.assertEqual(balance_shards([1, 1], 3), [[0], [1]])
+
+    def test_order(self) -> None:
+        hyps = ["A", "E X", "F", "G", "I J K", "L"]
+        expected = self.tag_fn(self.srcs, [self.refs, hyps], self.docids)
+        for workers in (1, 2, 3):
+            self.tag_fn.calls = []
+            with WorkerPool("de", {}, workers) as pool:
+                pool._pool = FakePool(self.tag_fn)
+                tagged = pool.tag(self.srcs, [self.refs, hyps], self.docids, [])
+            self.assertEqual(tagged, expected)
+            self.assertEqual(len(self.tag_fn.calls), workers)
@@ -0,0 +1,72 @@
+import unittest
+from typing import Dict, List, Set
+
+from muda.features import SentenceFeatures
+from muda.langs import create_tagger
+from muda.tagger import (
+    FULL_PROCESSORS,
+    POS_PROCESSORS,
+    TOKENIZE_PROCESSORS,
+    PreprocessPlan,
+    Tagger,
+    requires,
+)
+
+
+class VerbFormalityTagger(Tagger):
+    def __init__(self) -> None:
+        super().__init__()
+        self.tgt_lang = "xx"
+
+    @requires("src_depparse", "tgt_pos", "alignment")
+    def _verb_formality(
+        self,
+        src_sent: SentenceFeatures,
+        tgt_sent: SentenceFeatures,
+        align_sent: Dict[int, int],
+        prev_formality: Set[str],
+    ) -> List[bool]:
+        return [False] * len(tgt_sent)
+
+
+class TestPlan(unittest.TestCase):
+    def setUp(self) -> None:
+        # models are only loaded when preprocessing
+        self.tagger = create_tagger("de")
+
+    def test_plan(self) -> None:
+        # neither coreference nor dependency parsing
+        self.assertEqual(
+            self.tagger.plan(["lexical_cohesion", "verb_form"]),
+            PreprocessPlan(
+                src_processors=TOKENIZE_PROCESSORS,
+                tgt_processors=POS_PROCESSORS,
+                alignment=True,
+                coref=False,
+            ),
+        )
+        # lexicon-based formality only needs the tokens
+        self.assertEqual(
+            self.tagger.plan(["formality"]),
+            PreprocessPlan(
+                src_processors=TOKENIZE_PROCESSORS,
+                tgt_processors=TOKENIZE_PROCESSORS,
+                alignment=False,
+                coref=False,
+            ),
+        )
+        self.assertTrue(self.tagger.plan(["pronouns"]).coref)
+        self.assertEqual(self.tagger.plan([]), self.tagger.plan(["formality"]))
+
+    def test_verb_formality(self) -> None:
+        # the requirements of `_verb_formality` are added to those of formality
+        tagger = VerbFormalityTagger()
+        self.assertEqual(
+            tagger.plan(["formality"]),
+            PreprocessPlan(
+                src_processors=FULL_PROCESSORS,
+                tgt_processors=POS_PROCESSORS,
+                alignment=True,
+                coref=False,
+            ),
+        )
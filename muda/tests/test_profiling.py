@@ -0,0 +1,53 @@
+import os
+import tempfile
+import tracemalloc
+import unittest
+
+from muda import profiling
+
+
+class TestProfiling(unittest.TestCase):
+    def tearDown(self) -> None:
+        profiling.disable()
+
+    def test_stages(self) -> None:
+        profiler = profiling.enable()
+        self.assertFalse(tracemalloc.is_tracing())
+        with profiling.stage("outer", items=3):
+            with profiling.stage("inner"):
+                pass
+        self.assertEqual(profiler.stats["outer"]["items"], 3)
+        self.assertEqual(profiler.stats["inner"]["alloc_bytes"], 0)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "stages.prom")
+            profiler.write_prometheus(path)
+            with open(path, "r", encoding="utf-8") as f:
+                metrics = {
+                    line.split()[2]: line.split()[3]
+                    for line in f
+                    if line.startswith("# TYPE")
+                }
+        # counters have the _total suffix, and allocations aren't recorded
+        self.assertEqual(set(metrics.values()), {"counter"})
+        self.assertTrue(all(metric.endswith("_total") for metric in metrics))
+        self.assertNotIn("muda_stage_alloc_bytes_total", metrics)
+
+    @unittest.skipUnless(hasattr(tracemalloc, "reset_peak"), "needs python >= 3.9")
+    def test_allocations(self) -> None:
+        profiler = profiling.enable(trace_allocations=True)
+        size = 2**22
+        with profiling.stage("outer"):
+            # freed before the end of the stages
+            data = bytearray(size)
+            del data
+            with profiling.stage("inner"):
+                pass
+            with profiling.stage("nested"):
+                data = bytearray(size // 2)
+                del data
+        stats = profiler.stats
+        self.assertGreaterEqual(stats["outer"]["alloc_bytes"], size)
+        self.assertLess(stats["inner"]["alloc_bytes"], size // 4)
+        self.assertGreaterEqual(stats["nested"]["alloc_bytes"], size // 2)
+        self.assertLess(stats["nested"]["alloc_bytes"], size)
@@ -0,0 +1,120 @@
+import unittest
+from typing import Any, List, Tuple
+from unittest import mock
+
+import spacy
+
+from muda.aligner import Aligner
+from muda.coref import CorefResolver
+from muda.langs import create_tagger
+from muda.server import Job, TaggingService, tag_jobs
+from muda.tagger import POS_PROCESSORS, TOKENIZE_PROCESSORS, Tagger
+
+
+def patch_models(test: unittest.TestCase) -> List[Tuple[str, str]]:
+    """Patches the tagger to use blank pipelines (tokenization only), monotonic
+    alignments and no coreference, so that no model is loaded, for the duration of
+    a test. Returns the (language, processors) of the pipelines, as they are loaded."""
+    loaded: List[Tuple[str, str]] = []
+
+    def pipeline(lang: str, processors: str) -> spacy.language.Language:
+        loaded.append((lang, processors))
+        return spacy.blank(lang)
+
+    patches: List[Any] = [
+        mock.patch.object(
+            Tagger,
+            "pipeline",
+            lambda tagger, lang, processors: pipeline(lang, processors),
+        ),
+        mock.patch.object(
+            Aligner,
+            "align",
+            lambda aligner, pairs: [
+                {i: i for i in range(len(tgt.split()))} for _, tgt in pairs
+            ],
+        ),
+        mock.patch.object(
+            CorefResolver,
+            "_predict",
+            lambda resolver, texts: [
+                {"document": text.split(), "clusters": []} for text in texts
+            ],
+        ),
+    ]
+    for patch in patches:
+        patch.start()
+        test.addCleanup(patch.stop)
+    return loaded
+
+
+class TestTagJobs(unittest.TestCase):
+    def setUp(self) -> None:
+        patch_models(self)
+        patch = mock.patch.object(
+            Tagger, "preprocess_src", autospec=True, side_effect=Tagger.preprocess_src
+        )
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.tagger = create_tagger("de")
+
+        # the last document of the first job and the first of the second one have
+        # the same docid, and would be tagged as one document if they were merged
+        self.jobs = [
+            Job(
+                ["you know", "you see", "you"],
+                [["du weißt", "Sie sehen", "du"]],
+                [0, 0, 1],
+                ["formality"],
+            ),
+            Job(
+                ["you", "you see it", "yes"],
+                [["du", "du siehst es", "ja"], ["Sie", "Sie sehen es", "ja"]],
+                [1, 1, 7],
+                ["formality", "lexical_cohesion"],
+            ),
+        ]
+
+    def test_tag_jobs(self) -> None:
+        results = tag_jobs(self.tagger, self.jobs)
+        # the sentences of all jobs are preprocessed together...
+        (call,) = Tagger.preprocess_src.call_args_list  # type: ignore
+        self.assertEqual(call[0][2], [0, 0, 1, 2, 2, 3])
+
+        # ...but the tags are the same as when tagging each job alone
+        for job, result in zip(self.jobs, results):
+            self.assertEqual(len(result), len(job.tgt_sets))
+            self.assertEqual(result, tag_jobs(self.tagger, [job])[0])
+            for tgts, tagged_docs in zip(job.tgt_sets, result):
+                self.assertEqual(
+                    [tag.token for doc in tagged_docs for sent in doc for tag in sent],
+                    " ".join(tgts).split(),
+                )
+
+        # documents are mapped back to their jobs
+        self.assertEqual([len(doc) for doc in results[0][0]], [2, 1])
+        self.assertEqual([len(doc) for doc in results[1][0]], [2, 1])
+        # the first "du" of the second job is the first of its document
+        self.assertEqual(results[0][0][1][0][0].tags, [])
+        self.assertEqual(results[1][0][0][0][0].tags, [])
+        self.assertEqual(results[1][0][0][1][0].tags, ["formality"])
+        self.assertEqual([len(doc) for doc in results[1][1]], [2, 1])
+
+
+class TestWarmup(unittest.TestCase):
+    def test_warmup(self) -> None:
+        loaded = patch_models(self)
+        with mock.patch.object(
+            CorefResolver, "_predict", autospec=True, return_value=[None]
+        ) as predict:
+            TaggingService(["de"], {})
+        # the coreference model is run on the second sentence of the document
+        predict.assert_called_once()
+        # as well as the pipelines of requests for a subset of the phenomena
+        for pipeline in [
+            ("en", TOKENIZE_PROCESSORS),
+            ("en", POS_PROCESSORS),
+            ("de", TOKENIZE_PROCESSORS),
+            ("de", POS_PROCESSORS),
+        ]:
+            self.assertIn(pipeline, loaded)
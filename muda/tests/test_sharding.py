@@ -0,0 +1,126 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from muda.main import main_corpus
+from muda.metrics import count_matches
+from muda.sharding import merge_shards, select_shard, shard_of, write_shard_info
+from muda.tagger import Tagging
+from muda.tagstore import write_dump
+from muda.tests.helpers import FakeTagFn
+
+
+class TestSharding(unittest.TestCase):
+    def setUp(self) -> None:
+        self.docids = [3, 3, 7, 1, 1, 1, 9, 4]
+        refs = [["a", "b"], ["c"], ["d", "e"], ["f"], ["g"], ["h"], ["i"], ["j"]]
+        self.tagged_refs = [
+            [[Tagging(token=tok, tags=["formality"]) for tok in sent] for sent in doc]
+            for doc in ([refs[0], refs[1]], [refs[2]], refs[3:6], [refs[6]], [refs[7]])
+        ]
+        # the hypothesis only has the tags of every other document
+        self.tagged_hyps = [
+            [
+                [Tagging(token=t.token, tags=t.tags if d % 2 else []) for t in sent]
+                for sent in doc
+            ]
+            for d, doc in enumerate(self.tagged_refs)
+        ]
+
+    def test_partition(self) -> None:
+        all_docs = []
+        for shard in range(3):
+            docs, lines = select_shard(self.docids, shard, 3)
+            all_docs.extend(docs)
+            self.assertEqual(len({self.docids[i] for i in lines}), len(docs))
+        self.assertEqual(sorted(all_docs), list(range(5)))
+        # the shard of a document doesn't depend on the rest of the corpus
+        for shard in range(3):
+            self.assertEqual(
+                select_shard([7], shard, 3)[0] == [0],
+                1 in select_shard(self.docids, shard, 3)[0],
+            )
+
+    def test_merge(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            paths = []
+            for shard in range(2):
+                docs, _ = select_shard(self.docids, shard, 2)
+                refs = [self.tagged_refs[d] for d in docs]
+                hyps = [self.tagged_hyps[d] for d in docs]
+                path = os.path.join(tmpdir, f"shard{shard}.npz")
+                write_dump(path, refs)
+                write_shard_info(
+                    path,
+                    shard,
+                    2,
+                    5,
+                    docs,
+                    ["formality"],
+                    ["hyps"],
+                    [count_matches(refs, hyps)],
+                )
+                paths.append(path)
+
+            merged, all_counts, _ = merge_shards(paths)
+            self.assertEqual(merged, self.tagged_refs)
+            expected = count_matches(self.tagged_refs, self.tagged_hyps)
+            self.assertEqual(
+                [dict(counts) for counts in all_counts[0]],
+                [dict(counts) for counts in expected],
+            )
+
+            with self.assertRaises(ValueError):
+                merge_shards(paths[:1])
+
+    def test_repeated_docids(self) -> None:
+        # documents 0 and 2 have the same docid, so they are in the same shard
+        srcs, docids = ["a b", "c", "d", "e f"], [1, 1, 4, 1]
+        self.assertNotEqual(shard_of(1, 2), shard_of(4, 2))
+        tag_fn = FakeTagFn(lambda src, tgt, tok: ["formality"] if src < "d" else [])
+        with tempfile.TemporaryDirectory() as tmpdir:
+            files = {}
+            for name, lines in [
+                ("src", srcs),
+                ("tgt", [src.upper() for src in srcs]),
+                ("hyps", ["A", "C", "D", "E F"]),
+                ("docids", [str(docid) for docid in docids]),
+            ]:
+                files[name] = os.path.join(tmpdir, name)
+                with open(files[name], "w", encoding="utf-8") as f:
+                    f.write("".join(f"{line}\n" for line in lines))
+
+            paths = []
+            for shard in range(2):
+                paths.append(os.path.join(tmpdir, f"shard{shard}.npz"))
+                args = dict(
+                    src=files["src"],
+                    tgt=files["tgt"],
+                    docids=files["docids"],
+                    hyps=[files["hyps"]],
+                    phenomena=["formality"],
+                    dump_tags=paths[-1],
+                    shard=f"{shard}/2",
+                )
+                with mock.patch(
+                    "muda.main.build_tagger_kwargs", return_value={}
+                ), mock.patch("muda.main.build_tag_fn", return_value=tag_fn):
+                    main_corpus(args)
+
+            # the shard of docid 1 is tagged as two separate documents
+            (shard_docids,) = [
+                call_docids
+                for _, _, call_docids in tag_fn.calls
+                if len(call_docids) > 1
+            ]
+            self.assertEqual(len(set(shard_docids)), 2)
+            merged, all_counts, _ = merge_shards(paths)
+            tagged_refs, tagged_hyps = tag_fn(
+                srcs, [[src.upper() for src in srcs], ["A", "C", "D", "E F"]], docids
+            )
+            self.assertEqual(merged, tagged_refs)
+            self.assertEqual(
+                [dict(counts) for counts in all_counts[0]],
+                [dict(counts) for counts in count_matches(tagged_refs, tagged_hyps)],
+            )
@@ -0,0 +1,64 @@
+import unittest
+
+import numpy as np
+
+from muda.metrics import count_matches, metrics_from_counts
+from muda.significance import document_stats, metrics_from_stats, paired_bootstrap
+from muda.tagger import Tagging
+
+
+class TestSignificance(unittest.TestCase):
+    def setUp(self) -> None:
+        rng = np.random.default_rng(0)
+        tags = ["formality", "pronouns"]
+        self.tags = tags
+        self.tagged_refs = [
+            [
+                [
+                    Tagging(token=f"w{i}", tags=[t for t in tags if rng.random() < 0.3])
+                    for i in range(8)
+                ]
+                for _ in range(3)
+            ]
+            for _ in range(50)
+        ]
+        # a good and a bad system, which keep the reference tags with probability
+        # 0.9 and 0.5
+        self.all_tagged_hyps = [
+            [
+                [
+                    [
+                        Tagging(
+                            token=t.token,
+                            tags=[tag for tag in t.tags if rng.random() < keep],
+                        )
+                        for t in sent
+                    ]
+                    for sent in doc
+                ]
+                for doc in self.tagged_refs
+            ]
+            for keep in (0.9, 0.5)
+        ]
+
+    def test_document_stats(self) -> None:
+        stats = document_stats(self.tagged_refs, self.all_tagged_hyps, self.tags)
+        self.assertEqual(stats.shape, (2, 50, 2, 4))
+        metrics = metrics_from_stats(stats.sum(axis=1))
+        for s, tagged_hyps in enumerate(self.all_tagged_hyps):
+            prec, rec, f1 = metrics_from_counts(
+                count_matches(self.tagged_refs, tagged_hyps)
+            )
+            for t, tag in enumerate(self.tags):
+                self.assertAlmostEqual(metrics[s, t, 0], prec[tag])
+                self.assertAlmostEqual(metrics[s, t, 1], rec[tag])
+                self.assertAlmostEqual(metrics[s, t, 2], f1[tag])
+
+    def test_paired_bootstrap(self) -> None:
+        stats = document_stats(self.tagged_refs, self.all_tagged_hyps, self.tags)
+        result = paired_bootstrap(stats, self.tags, num_samples=200)
+        self.assertTrue(np.all(result.lower <= result.metrics))
+        self.assertTrue(np.all(result.metrics <= result.upper))
+        # the systems are clearly different, but not from themselves
+        self.assertTrue(np.all(result.p_values[0, 1] < 0.01))
+        self.assertTrue(np.all(result.p_values[0, 0] == 1))
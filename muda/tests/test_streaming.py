@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+from typing import List
+
+from muda.streaming import document_windows, read_documents
+
+
+class TestStreaming(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.srcs = ["a", "b", "c", "d", "e", "f"]
+        self.docids = [3, 3, 1, 1, 1, 3]
+
+    def tearDown(self) -> None:
+        self.tmpdir.cleanup()
+
+    def write(self, name: str, lines: List[str]) -> str:
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("".join(f"{line}\n" for line in lines))
+        return path
+
+    def test_documents(self) -> None:
+        paths = [
+            self.write("src", self.srcs),
+            self.write("tgt", [src.upper() for src in self.srcs]),
+            self.write("docids", [str(docid) for docid in self.docids]),
+        ]
+        docs = list(read_documents(paths[0], [paths[1]], paths[2]))
+        # a document is a run of lines with the same docid, even if it reappears
+        self.assertEqual(
+            docs,
+            [
+                (["a", "b"], [["A", "B"]], [3, 3]),
+                (["c", "d", "e"], [["C", "D", "E"]], [1, 1, 1]),
+                (["f"], [["F"]], [3]),
+            ],
+        )
+
+        with self.assertRaises(ValueError):
+            list(read_documents(paths[0], [paths[1]], self.write("short", ["1"])))
+
+    def test_windows(self) -> None:
+        docs = iter(
+            [
+                (["a", "b"], [["A", "B"]], [3, 3]),
+                (["c", "d", "e"], [["C", "D", "E"]], [1, 1, 1]),
+                (["f"], [["F"]], [3]),
+            ]
+        )
+        windows = list(document_windows(docs, 2))
+        # windows only contain complete documents, the last one being smaller
+        self.assertEqual(
+            windows,
+            [
+                (
+                    ["a", "b", "c", "d", "e"],
+                    [["A", "B", "C", "D", "E"]],
+                    [3, 3, 1, 1, 1],
+                ),
+                (["f"], [["F"]], [3]),
+            ],
+        )
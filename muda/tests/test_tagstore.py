@@ -0,0 +1,50 @@
+import json
+import os
+import tempfile
+import unittest
+
+from muda.tagger import Tagging
+from muda.tagstore import TagStore, convert_json, write_tags
+
+PHENOMENA = ["lexical_cohesion", "formality", "verb_form", "pronouns"]
+
+
+class TestTagStore(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.tagged_docs = [
+            [
+                [
+                    Tagging(token="Hast", tags=[]),
+                    Tagging(token="du", tags=["formality"]),
+                    Tagging(token="es", tags=["lexical_cohesion", "pronouns"]),
+                ],
+                [],
+            ],
+            [[Tagging(token="Ça", tags=["verb_form"]), Tagging(token="du", tags=[])]],
+        ]
+
+    def tearDown(self) -> None:
+        self.tmpdir.cleanup()
+
+    def test_roundtrip(self) -> None:
+        path = os.path.join(self.tmpdir.name, "tags.npz")
+        write_tags(path, self.tagged_docs, tag_names=PHENOMENA)
+        store = TagStore(path)
+        self.assertEqual(len(store), 2)
+        self.assertEqual(store[1], self.tagged_docs[1])
+        self.assertEqual(list(store), self.tagged_docs)
+
+    def test_convert_json(self) -> None:
+        json_path = os.path.join(self.tmpdir.name, "tags.json")
+        npz_path = os.path.join(self.tmpdir.name, "tags.npz")
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(
+                [
+                    [[t._asdict() for t in sent] for sent in doc]
+                    for doc in self.tagged_docs
+                ],
+                f,
+            )
+        convert_json(json_path, npz_path)
+        self.assertEqual(list(TagStore(npz_path)), self.tagged_docs)